@@ -1,8 +1,10 @@
 import matplotlib.pyplot as plt
 import numpy as np
 
-from experiments.mieze.main_mieze import compute_magnetic_field_mieze
+from experiments.mieze.main_mieze import Mieze
 from experiments.mieze.parameters import HelmholtzSpinFlipper_position_HSF1, WIDTH_CBOX
+from simulation.fields.field_cache import FieldCache
+from simulation.parameters_simulation import default_beam_grid
 
 from utils.helper_functions import read_data_from_file, find_nearest
 
@@ -54,10 +56,20 @@ def find_relative_distance_coilset_sf(iteration_values):
 
     influence_list = list()
 
+    # Only the coil set moves, so that the field of the other elements is computed once, and the field of the coil
+    # set is translated
+    experiment = Mieze(coil_set_distance=iteration_values[0], field_cache=FieldCache())
+    experiment.create_setup()
+    experiment.initialize_computational_space(**default_beam_grid)
+    experiment.calculate_static_b_field()
+    experiment.prepare_translation('CoilSet', offset_min=0, offset_max=iteration_values[-1] - iteration_values[0])
+
     for val in iteration_values:
         data_file = f'/data/test_data_{int(val*100)}.csv'
 
-        compute_magnetic_field_mieze(filename=data_file, coil_set_distance=val)
+        experiment.move_coil_set(val)
+        experiment.calculate_static_b_field()
+        experiment.save_total_data_to_file(filename=data_file)
 
         # Using the existing Plotter class, read values and compute values
         plotter = MyPlotter(data_file=data_file)
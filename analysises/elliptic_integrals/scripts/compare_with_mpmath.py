@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of MIEZE simulation.
+# Copyright (C) 2019, 2020 TUM FRM2 E21 Research Group.
+#
+# This is free software; you can redistribute it and/or modify it
+# under the terms of the MIT License; see LICENSE file for more details.
+
+"""Compare accuracy and speed of the native elliptic integrals with mpmath."""
+
+import mpmath
+import numpy as np
+import time
+
+from utils.elliptic_integrals import ellipe, ellipe_mpmath, ellipk, ellipk_mpmath, ellippi, ellippi_mpmath
+
+
+def reference_values(n, mc):
+    """Compute high precision reference values, using the exact complementary parameter."""
+    with mpmath.workdps(30):
+        m = [1 - mpmath.mpf(item) for item in mc]
+        k = np.array([float(mpmath.ellipk(item)) for item in m])
+        e = np.array([float(mpmath.ellipe(item)) for item in m])
+        p = np.array([float(mpmath.ellippi(n_item, mpmath.pi / 2, m_item)) for n_item, m_item in zip(n, m)])
+    return k, e, p
+
+
+def timeit(function, *args):
+    """Return the run time of the function call in seconds."""
+    start = time.perf_counter()
+    function(*args)
+    return time.perf_counter() - start
+
+
+def compare(number_of_points=2000):
+    """Print the maximal relative error and the run time of both implementations.
+
+    Parameters
+    ----------
+    number_of_points: int, optional
+        Number of sampled parameter values.
+        Defaults to 2000.
+    """
+    mc = np.concatenate((np.linspace(1, 1e-3, number_of_points // 2), np.logspace(-3, -15, number_of_points // 2)))
+    m = 1 - mc
+    n = np.linspace(0, 0.999, len(mc))
+
+    k_ref, e_ref, p_ref = reference_values(n, mc)
+
+    implementations = (
+        ('K(m)', (ellipk, (m, mc)), (ellipk_mpmath, (m,)), k_ref),
+        ('E(m)', (ellipe, (m, mc)), (ellipe_mpmath, (m,)), e_ref),
+        ('Pi(n, m)', (ellippi, (n, m, mc)), (ellippi_mpmath, (n, m)), p_ref),
+    )
+
+    print(f'{"integral":<10}{"native error":>15}{"mpmath error":>15}{"native [s]":>12}{"mpmath [s]":>12}')
+    for name, (native, native_args), (reference, reference_args), exact in implementations:
+        native_error = np.max(np.abs(native(*native_args) / exact - 1))
+        mpmath_error = np.max(np.abs(reference(*reference_args) / exact - 1))
+
+        native_time = timeit(native, *native_args)
+        mpmath_time = timeit(reference, *reference_args)
+
+        print(f'{name:<10}{native_error:>15.2e}{mpmath_error:>15.2e}{native_time:>12.4f}{mpmath_time:>12.4f}')
+
+
+if __name__ == '__main__':
+    compare()
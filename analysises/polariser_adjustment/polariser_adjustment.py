@@ -41,7 +41,9 @@ def check():
     fig, ax = plt.subplots()
     plt.plot(length, computed_values)
     plt.plot(length, b, '*')
-    plt.plot(length, polariser.b_field_fitted(length, power=popt[0], amplitude=popt[1]))
+    # The fitted parameters are used in production with Polariser(model='fitted', power=..., amplitude=...)
+    fitted_polariser = Polariser(position=0, model='fitted', power=popt[0], amplitude=popt[1])
+    plt.plot(length, fitted_polariser.b_field(length))
 
     ax.legend((None, r'Theoretical', None, r'Measured', r'Fitted'), loc=9)
 
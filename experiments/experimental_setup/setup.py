@@ -8,11 +8,23 @@
 
 """General experimental_setup allowing placement of different elements."""
 
-import itertools
 import logging
 import numpy as np
 
-
+from collections import Counter
+from contextlib import contextmanager
+
+from simulation.fields.adaptive import adaptive_samples
+from simulation.fields.envelope import SparseFieldGrid, beam_envelope
+from simulation.fields.evaluation import evaluate_elements
+from simulation.fields.field_cache import element_key, element_state
+from simulation.fields.field_grid import FieldGrid, create_field_file
+from simulation.fields.influence import InfluenceIndex
+from simulation.fields.lazy import LazyFieldGrid
+from simulation.fields.phase_table import RFPhaseTable, common_period
+from simulation.fields.rf import RFField, rf_elements
+from simulation.fields.symmetry import symmetry_group
+from simulation.fields.translation import TranslatedField
 from utils.helper_functions import add_earth_magnetic_field, find_nearest, save_data_to_file, save_metadata_to_file, \
     save_obj
 
@@ -22,10 +34,41 @@ logger = logging.getLogger(__name__)
 
 class Setup:
     """Class that simulates a physical experimental_setup."""
-    def __init__(self, consider_earth_field=False, save_individual_data_sets=False):
+    def __init__(self, consider_earth_field=False, save_individual_data_sets=False, workers=None, pool='process',
+                 field_cache=None, symmetry=True, influence_tolerance=None):
+        """Initialize an empty setup.
+
+        Parameters
+        ----------
+        consider_earth_field: bool, optional
+            Flag indicating whether to add the earth magnetic field.
+            Defaults to False.
+        save_individual_data_sets: bool, optional
+            Flag indicating whether to save the magnetic field of each element to a separate file.
+            Defaults to False.
+        workers: int, optional
+            Number of parallel workers computing the static magnetic field. If None, it is computed serially.
+            Defaults to None.
+        pool: str, optional
+            Either 'process' or 'thread', the kind of workers.
+            Defaults to 'process'.
+        field_cache: FieldCache, optional
+            Persistent cache of the field of the elements, checked before computing them.
+            Defaults to None.
+        symmetry: bool, optional
+            Flag indicating whether to compute the field of elements with mirror symmetries in the fundamental domain
+            of their reflections only.
+            Defaults to True.
+        influence_tolerance: float, optional
+            Largest error of the total field, in G, from skipping each element outside of its influence interval
+            along the beam axis. It is shared evenly among the elements. The current channels are computed per unit
+            current, with their share divided by their present current, and change_currents computes them again
+            when a larger current requires it.
+            Defaults to None, computing each element everywhere.
+        """
         self.elements = []
-        self.b = dict()
-        self.b_static = dict()
+        self.b = None
+        self.b_static = None
         self.b_cartesian = None
 
         self.setup_changed = False
@@ -35,6 +78,9 @@ class Setup:
         self.y_range = None
         self.z_range = None
 
+        # Grid points inside the beam envelope, or None for the full box
+        self.support = None
+
         self.mesh = None
 
         self.start = None
@@ -43,6 +89,33 @@ class Setup:
 
         self.current = None
 
+        # Field per unit current of each current channel, and the field independent of the currents
+        self.response_points = None
+        self.response_matrix = None
+        self.response_background = None
+
+        # Field of each element at the response matrix points (per unit current for the current channels), keyed by
+        # the element state, such that only the changed elements are computed again
+        self._element_fields = dict()
+        self._background_states = list()
+
+        # Influence tolerance of the element fields skipping the points outside of their influence intervals, and the
+        # present currents of the current channels while they are set to unit current
+        self._element_tolerances = dict()
+        self._present_currents = dict()
+
+        # Translated field and reference position of the elements prepared for position sweeps, and the estimated
+        # interpolation error of their last placement
+        self._translations = dict()
+        self.translation_errors = dict()
+
+        # Time dependent field of the RF elements, and the total field tabulated over one RF period
+        self.rf_field = RFField()
+        self.rf_phase_table = None
+
+        # Name and number of x planes per slab of the field file of the static field, if it is computed into one
+        self._field_file = None
+
         self.x_ticks = list()
         self.x_ticks_labels = list()
 
@@ -54,6 +127,16 @@ class Setup:
 
         self.save_individual_data_sets = save_individual_data_sets
 
+        self.workers = workers
+        self.pool = pool
+
+        self.field_cache = field_cache
+
+        self.symmetry = symmetry
+
+        self.influence_tolerance = influence_tolerance
+        self._influence = None
+
     def create_setup(self):
         """Create experiment specific setups."""
         raise NotImplementedError
@@ -68,6 +151,86 @@ class Setup:
         self.elements.append(
             element_class(position=position, **kwargs))
 
+    def replace_element(self, element_name, element_class, position, **kwargs):
+        """Replace the element of the given name by a new one, e.g. at another position.
+
+        Only the field of the new element is computed by the next calculate_static_b_field.
+        """
+        index = [element.name for element in self.elements].index(element_name)
+        self.elements[index] = element_class(position=position, **kwargs)
+        self.setup_changed = True
+        self.rf_phase_table = None
+
+        if element_name in self._translations:
+            self._place_translated_element(self.elements[index])
+
+    def prepare_translation(self, element_name, offset_min, offset_max, order=6):
+        """Compute the field of an element once, such that it can be moved along the beam axis without evaluating it.
+
+        Afterwards, replace_element with an element that only differs in its position takes the field by an index
+        shift for offsets that are multiples of the grid step, and interpolates it otherwise. The estimated
+        interpolation error is stored in translation_errors. Requires the static field to be computed.
+
+        Parameters
+        ----------
+        element_name: str
+            Name of the element to be moved.
+        offset_min: float
+            Smallest offset along x with respect to the present position.
+        offset_max: float
+            Largest offset along x with respect to the present position.
+        order: int, optional
+            Number of interpolation nodes for the other offsets.
+            Defaults to 6.
+        """
+        if self.b_static is None:
+            raise RuntimeError('The static field has to be computed before preparing a translation.')
+
+        element = self.elements[[element.name for element in self.elements].index(element_name)]
+
+        with self._unit_currents([element]):
+            tolerances = self._influence_tolerances([element])
+            translation = TranslatedField(self.b_static,
+                                          lambda points: self._evaluate_elements([element], points, tolerances)[0],
+                                          offset_min, offset_max, order=order)
+
+        self._translations[element_name] = translation, element.position_x, tolerances
+
+    def _place_translated_element(self, element):
+        """Store the field of a moved element from its translated field, for the next compute_response_matrix."""
+        translation, reference_position, tolerances = self._translations[element.name]
+        if not all(np.array_equal(axis, translation_axis) for axis, translation_axis
+                   in zip(self.b_static.axes, (translation.x_range, translation.y_range, translation.z_range))):
+            logger.warning(f'The grid changed since the translation of {element.name} was prepared.')
+            return
+
+        values, error = translation.field(element.position_x - reference_position)
+        self.translation_errors[element.name] = error
+
+        if isinstance(self.b_static, SparseFieldGrid):
+            values = values[self.b_static.support]
+
+        with self._unit_currents([element]):
+            self._element_fields[element_state(element)] = values.reshape(-1, 3)
+            if tolerances is not None:
+                self._element_tolerances[element_state(element)] = tolerances[0]
+
+    @contextmanager
+    def _unit_currents(self, elements):
+        """Set the current of the current channels among the elements to one, restoring them afterwards."""
+        channels = [element for element in elements if element in self.current_channels()]
+        currents = [element.current for element in channels]
+        present_currents = self._present_currents.copy()
+        for element, current in zip(channels, currents):
+            self._present_currents.setdefault(id(element), current)
+            element.change_current(1.)
+        try:
+            yield
+        finally:
+            for element, current in zip(channels, currents):
+                element.change_current(current)
+            self._present_currents = present_currents
+
     def b_x(self, x, rho=0):
         """Compute magnetic field in x direction."""
         field = 0
@@ -92,7 +255,15 @@ class Setup:
         return self.elements[0]
 
     def initialize_computational_space(self, **kwargs):
-        """Initialize the 3d discretized computational space."""
+        """Initialize the 3d discretized computational space.
+
+        A non-uniform grid along the beam axis, e.g. from adaptive_x_range, can be given as x_range instead of
+        x_start, x_end and x_step.
+
+        With envelope, the field is only computed inside the beam envelope instead of the full box: either True for
+        the cone of the beam properties, widened by envelope_margin, or a boolean support array of the grid shape.
+        """
+        x_range = kwargs.pop('x_range', None)
         x_start = kwargs.pop('x_start', 0)
         x_end = kwargs.pop('x_end', 1)
         x_step = kwargs.pop('x_step', 0.1)
@@ -103,70 +274,500 @@ class Setup:
         z_end = kwargs.pop('z_end', 1)
         yz_step = kwargs.pop('yz_step', 0.1)
 
-        self.x_range = np.arange(x_start, x_end + x_step, x_step)
+        envelope = kwargs.pop('envelope', None)
+        envelope_margin = kwargs.pop('envelope_margin', 0.)
+
+        if x_range is None:
+            self.x_range = np.arange(x_start, x_end + x_step, x_step)
+        else:
+            self.x_range = np.asarray(x_range, dtype=float)
         self.y_range = np.arange(y_start, y_end + yz_step, yz_step)
         self.z_range = np.arange(z_start, z_end + yz_step, yz_step)
 
+        if envelope is None or envelope is False:
+            self.support = None
+        elif envelope is True:
+            self.support = beam_envelope(self.x_range, self.y_range, self.z_range, margin=envelope_margin)
+        else:
+            self.support = np.asarray(envelope, dtype=bool)
+
+    def _empty_static_grid(self):
+        """Return the grid of the computational space, sparse if it is restricted to the beam envelope."""
+        if self.support is None:
+            return FieldGrid(self.x_range, self.y_range, self.z_range)
+
+        grid = SparseFieldGrid(self.x_range, self.y_range, self.z_range, support=self.support)
+        logger.info(f'The beam envelope holds {100 * grid.fill_fraction:.1f}% of the grid points.')
+        return grid
+
+    def adaptive_x_range(self, x_start, x_end, rtol=1e-3, atol=1e-3, max_angle=0.05, lines=((0., 0.),), **kwargs):
+        """Sample the static field along the beam axis, dense only where it varies quickly.
+
+        Parameters
+        ----------
+        x_start: float
+            First position.
+        x_end: float
+            Last position.
+        rtol: float, optional
+            Interpolation error target relative to the field magnitude.
+            Defaults to 1e-3.
+        atol: float, optional
+            Absolute interpolation error target, in G.
+            Defaults to 1e-3.
+        max_angle: float, optional
+            Largest change of the field direction between neighbouring positions, in rad.
+            Defaults to 0.05.
+        lines: tuple, optional
+            The (y, z) positions of the lines along x on which the field is checked.
+            Defaults to the beam axis.
+        kwargs:
+            Further options of simulation.fields.adaptive.adaptive_samples.
+
+        Returns
+        -------
+        out: ndarray
+            The non-uniform positions along x, to be passed as x_range to initialize_computational_space.
+        """
+        lines = np.asarray(lines, dtype=float).reshape(-1, 2)
+
+        def field_function(x):
+            points = np.column_stack((np.repeat(x, len(lines)), np.tile(lines, (len(x), 1))))
+            b_fields = evaluate_elements(self.elements, points, workers=self.workers, pool=self.pool,
+                                         symmetry=self.symmetry, influence=self._influence_index())
+            return np.sum(b_fields, axis=0).reshape(len(x), len(lines), 3)
+
+        x_range, _ = adaptive_samples(field_function, x_start, x_end, rtol=rtol, atol=atol, max_angle=max_angle,
+                                      **kwargs)
+        return x_range
+
+    def lazy_field(self, x_step, yz_step, origin=(0., 0., 0.), t=0., block_shape=(16, 4, 4), max_size=2 ** 28):
+        """Return the field on an unbounded grid, computed only in the blocks of grid points that are looked up.
+
+        The result can be passed as b_map to NeutronBeam.load_magnetic_field instead of a precomputed grid, such
+        that neutrons leaving the computational space do not miss field values.
+
+        Parameters
+        ----------
+        x_step: float
+            Grid step along the beam axis.
+        yz_step: float
+            Grid step along y and z.
+        origin: tuple, optional
+            A grid position.
+            Defaults to (0, 0, 0).
+        t: float, optional
+            Time of the RF field.
+            Defaults to 0.
+        block_shape: tuple, optional
+            Number of grid points of one block along x, y and z.
+            Defaults to (16, 4, 4).
+        max_size: int, optional
+            Maximal size of the cached blocks in bytes.
+            Defaults to 2 ** 28.
+
+        Returns
+        -------
+        out: LazyFieldGrid
+        """
+        return LazyFieldGrid(lambda points: self.b_field_at(points, t), (x_step, yz_step, yz_step), origin=origin,
+                             block_shape=block_shape, max_size=max_size)
+
     def calculate_static_b_field(self, point=None):
-        """Calculate the magnetic field."""
+        """Calculate the magnetic field.
+
+        On the grid, the field is computed through the response matrix, such that later changes of the element
+        currents with change_currents do not require a new computation.
+        """
         if point:
 
             return self.b_field_point(point)
         else:
-            # logger.error(f'{self.x_range}, {self.y_range}, {self.z_range}')
-            positions = list(itertools.product(self.x_range, self.y_range, self.z_range))
-            logger.error(f'{len(positions)} calculations')
-            logger.info('calculate')
+            self._field_file = None
+            self.b_static = self._empty_static_grid()
+            logger.info(f'{len(self.b_static)} calculations')
 
-            self.b_static = dict()
+            self.compute_response_matrix(self.b_static.points())
 
-            if self.elements:
-                i = 0
+            if self.save_individual_data_sets:
                 for element in self.elements:
-                    result = list()
-                    # with Pool(4) as p:
-                    #     result = p.map(element.b_field, positions)
-                    for value in positions:
-                        result.append(element.b_field(value))
+                    file_name = f'../../data/elements_magnetic_fields/data_magnetic_field_{element.name}'
+                    element_b_field = self.b_static.copy()
+                    element_b_field.flat[:] = self._element_b_field(element)
+                    save_data_to_file(element_b_field, file_name=file_name)
 
-                    b = dict(zip(positions, result))
+            self.b_static.flat[:] = self.b_field_from_currents()
 
-                    print(f'calculation for element {element.name} finished')
+    def calculate_static_b_field_to_file(self, file_name, max_slab_size=2 ** 27):
+        """Calculate the magnetic field on the grid into a memory-mapped field file, one slab of x planes at a time.
 
-                    if self.save_individual_data_sets:
+        The peak memory is bounded by the fields of the elements on one slab, whatever the size of the grid, besides
+        the support of a grid restricted to the beam envelope. The resulting b_static reads its values from the file,
+        and is sparse for a restricted grid. No response matrix is kept, such that changing the currents requires a
+        new calculation.
 
-                        file_name = f'../../data/elements_magnetic_fields/data_magnetic_field_{element.name}'
-                        save_data_to_file(b, file_name=file_name)
+        Parameters
+        ----------
+        file_name: str
+            Path of the field file, which can be opened again with simulation.fields.field_grid.open_field_file.
+        max_slab_size: int, optional
+            Maximal size in bytes of the element fields computed at once.
+            Defaults to 2 ** 27.
+        """
+        self.update_metadata()
+        self.b_static = create_field_file(file_name, self.x_range, self.y_range, self.z_range,
+                                          metadata=self.meta_data, support=self.support)
+        logger.info(f'{len(self.b_static)} calculations into {file_name}')
+
+        self.response_points = None
+        self.response_matrix = None
+        self.response_background = None
+        self._element_fields = dict()
+        self._element_tolerances = dict()
+        self._background_states = list()
+        self.rf_phase_table = None
+        self.b = None
+
+        plane_size = len(self.y_range) * len(self.z_range) * 3 * 8 * max(len(self.elements), 1)
+        self._field_file = file_name, max(1, max_slab_size // plane_size)
+
+        for selection, points in self._grid_slabs(self.b_static):
+            b_field = np.zeros(points.shape)
+            for element_b_field in self._evaluate_elements(self.elements, points):
+                b_field += element_b_field
+
+            self.b_static.values[selection] = b_field.reshape(self.b_static.values[selection].shape)
+            self.b_static.flush()
+
+    def _grid_slabs(self, grid):
+        """Yield the slabs of x planes of a grid in a field file, as the selection of their values and their points.
+
+        For a sparse grid, only the supported points are yielded, and the selection is over the compact values.
+        """
+        slab_planes = self._field_file[1]
+        support = getattr(grid, 'support', None)
+        compact_start = 0
 
-                    if i == 0:
-                        self.b_static = b.copy()
-                        i += 1
-                    else:
-                        for k in self.b_static.keys():
-                            self.b_static[k] += b[k]
+        for start in range(0, len(grid.x_range), slab_planes):
+            mesh = np.meshgrid(grid.x_range[start:start + slab_planes], grid.y_range, grid.z_range, indexing='ij')
+            points = np.column_stack([item.ravel() for item in mesh])
+
+            if support is None:
+                yield slice(start, start + slab_planes), points
             else:
-                # If no elements are given, return a result consisting of zeroes.
-                result = [0, 0, 0] * len(positions)
+                points = points[support[start:start + slab_planes].ravel()]
+                yield slice(compact_start, compact_start + len(points)), points
+                compact_start += len(points)
+
+    def symmetry_group(self):
+        """Return the mirror reflections of the total static field, as a mapping to the signs of the components."""
+        return symmetry_group(self.elements)
+
+    def current_channels(self):
+        """Return the elements with a field proportional to their current, each being one current channel."""
+        return [element for element in self.elements if hasattr(element, 'change_current')]
+
+    def channel_currents(self):
+        """Return the current vector of the current channels."""
+        return np.array([element.current for element in self.current_channels()], dtype=float)
+
+    def compute_response_matrix(self, points):
+        """Compute the field of each current channel per unit current, and the field independent of the currents.
 
-                self.b_static = dict(zip(positions, result))
+        The field is linear in the currents, so that for any current vector I it is given by B = B0 + G @ I.
+        The field of each element is kept, such that on the same points only the elements whose parameters changed
+        since the last call are computed again.
+
+        Parameters
+        ----------
+        points: ndarray
+            Array of shape (N, 3) containing the (x, y, z) positions.
+
+        Returns
+        -------
+        out: ndarray
+            The response matrix G of shape (N, 3, number of channels).
+        """
+        points = np.atleast_2d(np.asarray(points, dtype=float))
+        if self.response_points is None or not np.array_equal(points, self.response_points):
+            self.response_points = points
+            self.response_background = None
+            self._element_fields = dict()
+            self._element_tolerances = dict()
+        channels = self.current_channels()
+
+        with self._unit_currents(self.elements):
+            states = [element_state(element) for element in self.elements]
+            changed = [index for index, state in enumerate(states) if state not in self._element_fields]
+            logger.info(f'Computing the field of {len(changed)} of {len(self.elements)} elements.')
+
+            if changed:
+                changed_elements = [self.elements[index] for index in changed]
+                tolerances = self._influence_tolerances(changed_elements)
+                b_fields = self._evaluate_elements(changed_elements, self.response_points, tolerances)
+                for position, (index, b_field) in enumerate(zip(changed, b_fields)):
+                    self._element_fields[states[index]] = b_field
+                    if tolerances is not None:
+                        self._element_tolerances[states[index]] = tolerances[position]
+
+        self.response_matrix = np.zeros(self.response_points.shape + (len(channels),))
+        for element, state in zip(self.elements, states):
+            if element in channels:
+                self.response_matrix[:, :, channels.index(element)] = self._element_fields[state]
+
+        self._update_response_background([state for element, state in zip(self.elements, states)
+                                          if element not in channels])
+
+        # Forget the fields of the replaced elements
+        self._element_fields = {state: self._element_fields[state] for state in states}
+        self._element_tolerances = {state: tolerance for state, tolerance in self._element_tolerances.items()
+                                    if state in self._element_fields}
+
+        self.setup_changed = False
+        self.rf_phase_table = None
+
+        return self.response_matrix
+
+    def _update_response_background(self, background_states):
+        """Update the field independent of the currents, subtracting the removed and adding the new elements."""
+        if self.response_background is None:
+            self.response_background = np.zeros(self.response_points.shape)
+            self._background_states = list()
+
+        new_states = Counter(background_states)
+        old_states = Counter(self._background_states)
+
+        for state, count in (old_states - new_states).items():
+            self.response_background -= count * self._element_fields[state]
+        for state, count in (new_states - old_states).items():
+            self.response_background += count * self._element_fields[state]
+
+        self._background_states = background_states
+
+    def _influence_index(self):
+        """Return the index of the influence intervals for the share of the tolerance of each element, if any."""
+        if self.influence_tolerance is None:
+            return None
+
+        tolerance = self.influence_tolerance / max(len(self.elements), 1)
+        if self._influence is None or self._influence.tolerance != tolerance:
+            self._influence = InfluenceIndex(tolerance)
+        return self._influence
+
+    def _influence_tolerances(self, elements):
+        """Return the influence tolerance of each element, if any, bounding the error at the present currents.
+
+        The current channels set to unit current by _unit_currents get their share of the tolerance divided by their
+        present current.
+        """
+        influence = self._influence_index()
+        if influence is None:
+            return None
+
+        tolerances = list()
+        for element in elements:
+            current = abs(self._present_currents.get(id(element), 1.))
+            tolerances.append(influence.tolerance / current if current else np.inf)
+        return tolerances
+
+    def _evaluate_elements(self, elements, points, tolerances=None):
+        """Compute the field of each element on the points, taking the fields found in the field cache.
+
+        The influence tolerances default to the ones of _influence_tolerances.
+        """
+        influence = self._influence_index()
+        if influence is not None and tolerances is None:
+            tolerances = self._influence_tolerances(elements)
+
+        if self.field_cache is None:
+            return evaluate_elements(elements, points, workers=self.workers, pool=self.pool, symmetry=self.symmetry,
+                                     influence=influence, tolerances=tolerances)
+
+        # Fields skipping the points outside of the influence intervals are only valid for the same tolerance
+        keys = [element_key(element, points, tolerance=None if tolerances is None else tolerances[index])
+                for index, element in enumerate(elements)]
+        b_fields = [self.field_cache.get(key) for key in keys]
+
+        missing = [index for index, b_field in enumerate(b_fields) if b_field is None]
+        logger.info(f'{len(keys) - len(missing)} of {len(keys)} element fields found in the field cache.')
+
+        if missing:
+            computed_b_fields = evaluate_elements([elements[index] for index in missing], points,
+                                                  workers=self.workers, pool=self.pool, symmetry=self.symmetry,
+                                                  influence=influence,
+                                                  tolerances=None if tolerances is None else
+                                                  [tolerances[index] for index in missing])
+            for index, b_field in zip(missing, computed_b_fields):
+                self.field_cache.put(keys[index], b_field)
+                b_fields[index] = b_field
+
+        return b_fields
+
+    def _element_b_field(self, element):
+        """Return the field of a single element at the response matrix points, for its current."""
+        channels = self.current_channels()
+        if element in channels:
+            return self.response_matrix[:, :, channels.index(element)] * element.current
+        return self._element_fields[element_state(element)]
+
+    def _current_vector(self, currents):
+        """Convert the currents, given per channel or as a mapping from element names, to an array."""
+        if currents is None:
+            return self.channel_currents()
+
+        if isinstance(currents, dict):
+            vector = self.channel_currents()
+            names = [element.name for element in self.current_channels()]
+            for name, current in currents.items():
+                vector[names.index(name)] = current
+            return vector
+
+        return np.asarray(currents, dtype=float)
+
+    def b_field_from_currents(self, currents=None):
+        """Compute the field at the response matrix points from the current vector, without evaluating the elements.
+
+        Parameters
+        ----------
+        currents: ndarray, dict, optional
+            Current per channel, of shape (number of channels,), or a batch of current vectors of shape
+            (number of sets, number of channels). Alternatively a mapping from the element names to their currents.
+            Defaults to the present element currents.
+
+        Returns
+        -------
+        out: ndarray
+            The magnetic field of shape (N, 3), or (number of sets, N, 3) for a batch of current vectors.
+        """
+        if self.response_matrix is None:
+            raise RuntimeError('The response matrix has not been computed yet.')
+
+        currents = self._current_vector(currents)
+        return self.response_background + np.einsum('pcj,...j->...pc', self.response_matrix, currents)
+
+    def change_currents(self, currents):
+        """Change the currents of the elements and update the static field from the response matrix.
+
+        Parameters
+        ----------
+        currents: ndarray, dict
+            Current per channel, or a mapping from the element names to their currents.
+        """
+        currents = self._current_vector(currents)
+        for element, current in zip(self.current_channels(), currents):
+            element.change_current(current)
+
+        if self.response_matrix is not None and self._forget_coarse_channel_fields():
+            self.compute_response_matrix(self.response_points)
+
+        if self.response_matrix is not None and self.b_static is not None:
+            self.b_static.flat[:] = self.b_field_from_currents(currents)
+
+        self.rf_phase_table = None
+
+    def _forget_coarse_channel_fields(self):
+        """Forget the fields of the current channels whose influence tolerance is too large for their present current.
+
+        Returns
+        -------
+        out: bool
+            Whether any field was forgotten.
+        """
+        channels = self.current_channels()
+        with self._unit_currents(channels):
+            tolerances = self._influence_tolerances(channels)
+            if tolerances is None:
+                return False
+            states = [element_state(element) for element in channels]
+
+        coarse = [state for state, tolerance in zip(states, tolerances)
+                  if self._element_tolerances.get(state, 0.) > tolerance]
+        for state in coarse:
+            logger.info('Computing a current channel again, for the influence tolerance of its larger current.')
+            self._element_fields.pop(state, None)
+            self._element_tolerances.pop(state, None)
+        return bool(coarse)
 
     def calculate_varying_magnetic_field(self, t_j):
-        """Calculate the varying RF magnetic field at each grid position."""
-        for position in self.b_static.keys():
-            self.b[position] = self.b_static[position] + self.compute_rf_field(position, t_j)
+        """Calculate the static plus the RF magnetic field at each grid position.
 
-    @staticmethod
-    def compute_rf_field(position, t_j, mock=False):
+        If the RF phase table is prepared, the field is interpolated from it. For a static field in a field file,
+        the field is calculated slab by slab into a second field file, of the same name with the suffix .varying.
+        """
+        if self._field_file is not None:
+            self._calculate_varying_magnetic_field_to_file(t_j)
+            return
+
+        if self.rf_phase_table is not None:
+            self.b = self.b_static.copy()
+            self.b.flat[:] = self.rf_phase_table.b_field(t_j)
+            return
+
+        self.b = self.b_static.copy()
+        if rf_elements(self.elements):
+            self.b.flat[:] += self.compute_rf_field(self.response_points, t_j)
+
+    def _calculate_varying_magnetic_field_to_file(self, t_j):
+        """Calculate the static plus the RF magnetic field slab by slab, for a static field in a field file."""
+        if not self.rf_elements():
+            # Without RF elements, the static field is read from its file
+            self.b = self.b_static
+            return
+
+        if self.b is None or self.b is self.b_static:
+            self.b = create_field_file(f'{self._field_file[0]}.varying', *self.b_static.axes, metadata=self.meta_data,
+                                       support=getattr(self.b_static, 'support', None))
+
+        for selection, points in self._grid_slabs(self.b_static):
+            rf_field = self.compute_rf_field(points, t_j).reshape(self.b.values[selection].shape)
+            self.b.values[selection] = self.b_static.values[selection] + rf_field
+        self.b.flush()
+
+    def prepare_rf_phase_table(self, tolerance=1e-6, max_size=2 ** 30):
+        """Tabulate the total field on the grid over one common period of the RF elements.
+
+        Afterwards calculate_varying_magnetic_field interpolates the field in the phase, instead of evaluating the RF
+        field. The table is discarded whenever the static field, the currents or the elements change.
+
+        Parameters
+        ----------
+        tolerance: float, optional
+            Interpolation error target, relative to the variation of the field over the period.
+            Defaults to 1e-6.
+        max_size: int, optional
+            Maximal size of the table in bytes.
+            Defaults to 2 ** 30.
+        """
+        if self.response_matrix is None:
+            raise RuntimeError('The static field has to be computed before preparing the RF phase table.')
+
+        period = common_period([element.frequency for element in self.rf_elements()])
+        b_static = self.b_field_from_currents()
+
+        self.rf_phase_table = RFPhaseTable.build(
+            lambda times: b_static + self.compute_rf_field(self.response_points, times),
+            period, tolerance=tolerance, max_size=max_size)
+
+    def rf_elements(self):
+        """Return the elements contributing a time dependent field."""
+        return rf_elements(self.elements)
+
+    def compute_rf_field(self, position, t_j, mock=False):
         """Compute the RF magnetic field for the required position.
 
         Parameters
         ----------
         position: ndarray
-        t_j: float
-            Time stamp.
+            A position, or an (N, 3) array of positions.
+        t_j: float, ndarray
+            Time stamp, or an array of time stamps.
         mock: bool, optional
             Flag indicating whether to mock a value or not.
 
+        Returns
+        -------
+        out: ndarray
+            The RF field of the shape of the positions, with a leading time axis for an array of time stamps.
         """
         if mock:
             # Mock a magnetic field for testing purposes.
@@ -175,10 +776,37 @@ class Setup:
             else:
                 varying_magnetic_field = np.array(position)
         else:
-            varying_magnetic_field = np.array([0, 0, 0])
+            position = np.asarray(position, dtype=float)
+            varying_magnetic_field = self.rf_field.b_field(self.elements, position.reshape(-1, 3), t_j)
+            varying_magnetic_field = varying_magnetic_field.reshape(np.shape(t_j) + position.shape)
 
         return varying_magnetic_field
 
+    def b_field_at(self, points, times):
+        """Compute the total magnetic field B(r, t) = B_static(r) + sum_k A_k(r) f_k(t) only at the requested points.
+
+        Parameters
+        ----------
+        points: ndarray
+            Array of shape (N, 3) containing the (x, y, z) positions.
+        times: float, ndarray
+            Time, or array of shape (T,) of times.
+
+        Returns
+        -------
+        out: ndarray
+            The magnetic field of shape (N, 3), or (T, N, 3) for an array of times.
+        """
+        points = np.atleast_2d(np.asarray(points, dtype=float))
+
+        if self.response_points is not None and np.array_equal(points, self.response_points):
+            b_static = self.b_field_from_currents()
+        else:
+            b_static = np.sum(evaluate_elements(self.elements, points, workers=self.workers, pool=self.pool,
+                                                symmetry=self.symmetry, influence=self._influence_index()), axis=0)
+
+        return b_static + self.compute_rf_field(points, times)
+
     def b_field_point(self, r: '(x, y, z)'):
         """Compute magnetic field."""
 
@@ -193,9 +821,7 @@ class Setup:
 
     def get_b_vec(self):
         """Returns the magnetic field as a vector."""
-        bx = [self.b_static[x, 0, 0][0] for x in self.x_range]
-        by = [self.b_static[x, 0, 0][1] for x in self.x_range]
-        bz = [self.b_static[x, 0, 0][2] for x in self.x_range]
+        bx, by, bz = self.b_static.line(y=0, z=0).T
         return bx, by, bz
 
     def _get_plane_position(self, component, plane_position):
@@ -224,8 +850,9 @@ class Setup:
             return b[:, :, plane_idx]
 
     def _get_b_field_values(self):
-        return np.array([[[self.b_static[(x, y, z)] for z in self.z_range]
-                        for y in self.y_range] for x in self.x_range])
+        if isinstance(self.b_static, SparseFieldGrid):
+            return self.b_static.dense().values
+        return self.b_static.values
 
     def get_magnetic_field_value(self, component, plane_position):
         """Return the magnetic field value at a given plane."""
@@ -14,6 +14,7 @@ from experiments.mieze.parameters import (
     CONSIDER_EARTH_FIELD, PARAMETERS_COIL_SET, ELEMENTS_POSITIONS_ABSOLUTE, ELEMENTS_POSITIONS_RELATIVE,
     PARAMETERS_HELMHOLTZCOILS, PARAMETERS_SPIN_FLIPPER, PARAMETERS_POLARISER
 )
+from simulation.fields.field_cache import FieldCache
 from simulation.parameters_simulation import default_beam_grid
 
 from simulation.elements.coils import Coil
@@ -31,7 +32,10 @@ class Mieze(Setup):
         consider_earth_field = kwargs.get('consider_earth_field', CONSIDER_EARTH_FIELD)
         save_individual_data_sets = kwargs.get('save_individual_data_sets', False)
 
-        super(Mieze, self).__init__(consider_earth_field, save_individual_data_sets)
+        super(Mieze, self).__init__(consider_earth_field, save_individual_data_sets,
+                                    workers=kwargs.get('workers'), pool=kwargs.get('pool', 'process'),
+                                    field_cache=kwargs.get('field_cache'), symmetry=kwargs.get('symmetry', True),
+                                    influence_tolerance=kwargs.get('influence_tolerance'))
 
         self.spin_flipper_distance = kwargs.get('spin_flipper_distance')
         self.coil_set_distance = kwargs.get('coil_set_distance')
@@ -63,13 +67,32 @@ class Mieze(Setup):
 
         self.update_metadata()
 
+    def move_coil_set(self, coil_set_distance):
+        """Place the coil set at another distance, keeping all other elements.
+
+        Parameters
+        ----------
+        coil_set_distance: float
+            Distance between the CoilSet and the Helmholtz Coils/Spin Flipper.
+        """
+        self.coil_set_distance = coil_set_distance
+
+        self.replace_element('CoilSet',
+                             element_class=CoilSet,
+                             current=PARAMETERS_COIL_SET["current"],  # [A]
+                             name='CoilSet',
+                             position=PARAMETERS_COIL_SET['position'] + self.coil_set_distance)
+
+        self.update_metadata()
+
 
 def compute_magnetic_field_mieze(grid_size=default_beam_grid,
                                  coil_set_distance=ELEMENTS_POSITIONS_RELATIVE["coil_set_distance"],
                                  spin_flipper_distance=ELEMENTS_POSITIONS_RELATIVE["spin_flipper_distance"],
                                  filename='data/data_magnetic_field',
                                  save_individual_data_sets=True,
-                                 point_value=None):
+                                 point_value=None,
+                                 use_field_cache=True):
     """Compute the magnetic field for the MIEZE experimental_setup.
 
     Parameters
@@ -87,12 +110,16 @@ def compute_magnetic_field_mieze(grid_size=default_beam_grid,
     point_value: ndarray or None
         If an ndarray, it computes the magnetic value of the MIEZE setup for only the given point.
         If None, it computes the magnetic field for the entire computational grid.
+    use_field_cache: bool, optional
+        Flag indicating whether to take the element fields from the persistent field cache, and store them there.
+        Defaults to True.
     """
 
     # Initialize an object from the MIEZE class
     experiment = Mieze(spin_flipper_distance=spin_flipper_distance,
                        coil_set_distance=coil_set_distance,
-                       save_individual_data_sets=save_individual_data_sets)
+                       save_individual_data_sets=save_individual_data_sets,
+                       field_cache=FieldCache() if use_field_cache else None)
 
     # Create the components of the beamline with their parameters
     experiment.create_setup()
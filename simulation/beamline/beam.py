@@ -13,9 +13,10 @@ import numpy as np
 import os
 import random
 
+from simulation.fields.field_grid import as_field_grid, load_field_grid
 from simulation.particles.neutron import Neutron
 
-from utils.helper_functions import get_phi, find_nearest, load_obj, rotate
+from utils.helper_functions import get_phi, rotate
 
 from simulation.beamline.beamline_properties import angular_distribution_in_radians, speed_std
 
@@ -50,6 +51,9 @@ class NeutronBeam:
 
         self.x_step = None
 
+        # Steps of a non-uniform grid along the beam axis, or None for a uniform grid
+        self.x_steps = None
+
         self.y_start = None
         self.y_end = None
 
@@ -62,8 +66,10 @@ class NeutronBeam:
     def initialize_computational_space(self, **kwargs):
         """Initialize the 3d discretized computational space.
 
-        It should be identical (or at least similar) to the computed magnetic field values.
+        It should be identical (or at least similar) to the computed magnetic field values. A non-uniform grid along
+        the beam axis can be given as x_range, in which case the neutrons advance from one grid position to the next.
         """
+        x_range = kwargs.pop('x_range', None)
         self.x_start = kwargs.pop('x_start', 0)
         self.x_end = kwargs.pop('x_end', 1)
         self.x_step = kwargs.pop('x_step', 0.1)
@@ -75,7 +81,14 @@ class NeutronBeam:
 
         yz_step = kwargs.pop('yz_step', 0.1)
 
-        self.x_range = np.arange(self.x_start, self.x_end + self.x_step, self.x_step)
+        if x_range is None:
+            self.x_range = np.arange(self.x_start, self.x_end + self.x_step, self.x_step)
+            self.x_steps = None
+        else:
+            self.x_range = np.asarray(x_range, dtype=float)
+            self.x_start, self.x_end = self.x_range[0], self.x_range[-1]
+            self.x_steps = np.diff(self.x_range)
+            self.x_step = self.x_steps.min()
         self.y_range = np.arange(self.y_start, self.y_end + yz_step, yz_step)
         self.z_range = np.arange(self.z_start, self.z_end + yz_step, yz_step)
 
@@ -146,9 +159,16 @@ class NeutronBeam:
 
             created_neutrons += 1
 
-    def _time_in_field(self, speed):
-        """Compute the time spent in the field."""
-        return self.x_step / speed
+    def _cell_step(self, position_x):
+        """Return the length of the grid cell starting at or before the position along the beam axis."""
+        if self.x_steps is None:
+            return self.x_step
+        index = np.clip(np.searchsorted(self.x_range, position_x, side='right') - 1, 0, len(self.x_steps) - 1)
+        return self.x_steps[index]
+
+    def _time_in_field(self, speed, position_x=None):
+        """Compute the time spent in the field, i.e. in the grid cell of the position on a non-uniform grid."""
+        return self._cell_step(position_x) / speed
 
     def _omega(self, b):
         return b * self.gamma
@@ -193,7 +213,7 @@ class NeutronBeam:
 
             self.check_neutron_in_beam(neutron)
 
-            time_increment = self._time_in_field(speed=neutron.speed)
+            time_increment = self._time_in_field(speed=neutron.speed, position_x=neutron.position[0])
 
             neutron.update_position(time_increment)
             neutron.update_position_yz(time_increment)
@@ -215,7 +235,7 @@ class NeutronBeam:
 
             for neutron in neutron_list:
                 # Check whether the neutron is in the cell, defined from the left edge
-                if position_x < neutron.position[0] < position_x + self.x_step:
+                if position_x < neutron.position[0] < position_x + self._cell_step(position_x):
                     if neutrons_in_cell == 0:
                         self.polarisation[position_x, 0, 0] = neutron.polarisation
                     else:
@@ -246,26 +266,22 @@ class NeutronBeam:
         return magnetic_field
 
     def load_magnetic_field(self, data_file_at_time_instance=f'../../data/data_magnetic_field', b_map=None):
-        """Load the magnetic field data."""
-        # print(b_map)
-        if b_map:
-            self.b_map = b_map
+        """Load the magnetic field data, as FieldGrid or as legacy dictionary keyed by positions."""
+        if b_map is not None:
+            self.b_map = as_field_grid(b_map)
         elif data_file_at_time_instance:
-            self.b_map = load_obj(data_file_at_time_instance)
+            self.b_map = load_field_grid(data_file_at_time_instance)
 
     def get_magnetic_field_value_at_neutron_position(self, neutron_position):
-        """Returns the magnetic field at the location of the magnetic field.
+        """Returns the magnetic field at the grid point closest to the neutron position.
 
         Handles the case when the magnetic field does not contain a value at the required point.
         """
-        try:
-            # print(f'Total magnetic field: {self.b_map}')
-            return self.b_map[(find_nearest(self.x_range, neutron_position[0], index=False),
-                               find_nearest(self.y_range, neutron_position[1], index=False),
-                               find_nearest(self.z_range, neutron_position[2], index=False))]
-        except KeyError:
+        magnetic_field = self.b_map.value_at(neutron_position)
+        if np.isnan(magnetic_field).any():
             raise Exception(f'Could not find the magnetic field at the neutron position: {neutron_position}\n'
                             f'It is most probable that the magnetic field needs to be reevaluated.')
+        return magnetic_field
 
     def check_neutron_in_beam(self, neutron):
         """Check if neutron is in the calculated beam profile (y,z plane)"""
@@ -278,6 +294,9 @@ class NeutronBeam:
         elif not x_condition:
             print("Removed neutron because it reached the end outside beamline direction.")
             self.neutrons.remove(neutron)
+        elif hasattr(self.b_map, 'contains') and not self.b_map.contains(neutron.position):
+            print("Removed neutron because it left the beam envelope of the magnetic field.")
+            self.neutrons.remove(neutron)
 
     def get_pol(self):
         """Get the average polarisation for the beam."""
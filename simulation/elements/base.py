@@ -10,10 +10,16 @@
 
 from abc import abstractmethod
 
+import numpy as np
+
 
 class BasicElement(object):
     """Class implementing a basic experiment element."""
 
+    # Signs of the field components under the reflection y -> -y or z -> -z, for elements centred on the beam axis,
+    # see simulation/fields/symmetry.py. Elements without declared parities are evaluated on the whole grid.
+    mirror_parities = dict()
+
     def __init__(self, position, name):
         """Any physical element is supposed to have a position.
 
@@ -30,8 +36,44 @@ class BasicElement(object):
         else:
             self.position_x = position
             self.position_y = 0
-            self.position_y = 0
+            self.position_z = 0
 
     @abstractmethod
     def b_field(self, r: '(x, y, z)'):
         raise NotImplementedError
+
+    def b_field_batch(self, points):
+        """Compute the magnetic field for an (N, 3) array of positions.
+
+        Elements with a vectorized implementation override this method, otherwise each point is evaluated in turn.
+
+        Parameters
+        ----------
+        points: ndarray
+            Array of shape (N, 3) containing the (x, y, z) positions.
+
+        Returns
+        -------
+        out: ndarray
+            Array of shape (N, 3) containing the magnetic field vectors.
+        """
+        points = np.atleast_2d(np.asarray(points, dtype=float))
+        return np.array([self.b_field(point) for point in points], dtype=float).reshape(-1, 3)
+
+    def evaluation_cost(self, points):
+        """Estimate the relative cost of computing the field at each of the points.
+
+        The unit is the cost of one closed form term of a vectorized kernel. The fallback evaluates the points one
+        by one in Python, which is about a hundred times more expensive.
+
+        Parameters
+        ----------
+        points: ndarray
+            Array of shape (N, 3) containing the (x, y, z) positions.
+
+        Returns
+        -------
+        out: ndarray
+            Array of shape (N,) containing the cost of each point.
+        """
+        return np.full(len(points), 100.)
@@ -15,10 +15,11 @@ The part of the experimental_setup that actually does the MIEZE condition is the
     coils.
 """
 
-from numpy import array
+from numpy import array, asarray, column_stack, zeros_like
 
+from simulation.elements import coil_templates
 from simulation.elements.base import BasicElement
-from simulation.elements.coils import Coil
+from simulation.elements.coils import Coil, EVALUATION_KEYWORDS
 
 from experiments.mieze.parameters import (
     COIL_SET_CURRENT, DISTANCE_BETWEEN_INNER_COILS, LENGTH_COIL_INNER, LENGTH_COIL_OUTER, N_WINDINGS_COIL_INNER,
@@ -29,11 +30,16 @@ from experiments.mieze.parameters import (
 class CoilSet(BasicElement):
     """Class that implements a coil with more realistic experimental parameters."""
 
+    mirror_parities = {'y': (1, -1, 1), 'z': (1, 1, -1)}
+
     def __init__(self, name, position, **kwargs):
         super(CoilSet, self).__init__(position, name)
 
         self.coil_type = kwargs.get('coil_type', Coil)
 
+        # Options on how to evaluate the field, passed on to each coil
+        self.coil_options = {key: value for key, value in kwargs.items() if key in EVALUATION_KEYWORDS}
+
         self.middle = self.position_x
 
         self.current = kwargs.get('current', COIL_SET_CURRENT)
@@ -51,6 +57,15 @@ class CoilSet(BasicElement):
         """Return metadata for the given class."""
         return {"position": self.position_x, "coil_type": self.coil_type.name}
 
+    def change_current(self, current):
+        """Change the current of the coil set, the outer coils carrying the opposite current."""
+        self.current = current
+        for element in self.elements:
+            if element in (self.coil_inner_1, self.coil_inner_2):
+                element.change_current(current)
+            else:
+                element.change_current(-current)
+
     def _create_coil_set(self):
         """Create the two coil pairs."""
         self._create_coil_inner_set()
@@ -83,7 +98,8 @@ class CoilSet(BasicElement):
                                            radial_layers=RADIAL_LAYERS,
                                            windings=N_WINDINGS_COIL_INNER,
                                            wire_d=WIRE_D,
-                                           wire_spacing=WIRE_SPACING)
+                                           wire_spacing=WIRE_SPACING,
+                                           **self.coil_options)
         self.coil_inner_2 = self.coil_type(current=self.current,
                                            length=LENGTH_COIL_INNER,
                                            name='I2',
@@ -93,7 +109,8 @@ class CoilSet(BasicElement):
                                            r_max=RADIUS_COIL_INNER_MAX,
                                            windings=N_WINDINGS_COIL_INNER,
                                            wire_d=WIRE_D,
-                                           wire_spacing=WIRE_SPACING)
+                                           wire_spacing=WIRE_SPACING,
+                                           **self.coil_options)
 
         self.elements.append(self.coil_inner_1)
         self.elements.append(self.coil_inner_2)
@@ -110,7 +127,8 @@ class CoilSet(BasicElement):
                                       r_max=RADIUS_COIL_OUTER_MAX,
                                       windings=N_WINDINGS_COIL_OUTER,
                                       wire_d=WIRE_D,
-                                      wire_spacing=WIRE_SPACING)
+                                      wire_spacing=WIRE_SPACING,
+                                      **self.coil_options)
 
         coil_outer_2 = self.coil_type(current=outer_current,
                                       length=LENGTH_COIL_OUTER,
@@ -120,7 +138,8 @@ class CoilSet(BasicElement):
                                       r_max=RADIUS_COIL_OUTER_MAX,
                                       windings=N_WINDINGS_COIL_OUTER,
                                       wire_d=WIRE_D,
-                                      wire_spacing=WIRE_SPACING)
+                                      wire_spacing=WIRE_SPACING,
+                                      **self.coil_options)
 
         self.elements.append(coil_outer_1)
         self.elements.append(coil_outer_2)
@@ -144,9 +163,26 @@ class CoilSet(BasicElement):
             b_field += element.b_field([x, y, z])
         return b_field
 
+    def b_field_batch(self, points):
+        """Compute the magnetic field for an (N, 3) array of positions.
+
+        The coil pairs have identical geometry, so each pair is evaluated once through its geometry template.
+        """
+        return coil_templates.b_field_batch(self.elements, points)
+
+    def b_field_on_axis(self, x_positions):
+        """Compute the magnetic field along the beam axis, i.e. for y = z = 0."""
+        x_positions = asarray(x_positions, dtype=float).ravel()
+        return self.b_field_batch(column_stack((x_positions, zeros_like(x_positions), zeros_like(x_positions))))
+
+    def evaluation_cost(self, points):
+        """Estimate the relative cost of computing the field at each of the points, summed over the coils."""
+        return sum(element.evaluation_cost(points) for element in self.elements)
+
+    def build_field_table(self, x_start, x_end, rho_max, tolerance=1e-6):
+        """Tabulate the field of the coils on an (x, rho) grid, with one table per coil geometry."""
+        coil_templates.build_field_tables(self.elements, x_start, x_end, rho_max, tolerance)
+
     def compute_b_field(self, x_positions):
         """Compute the magnetic field for the array of positions."""
-        b_values = list()
-        for x in x_positions:
-            b_values.append(self.b_field([x, 0, 0]))
-        return b_values
+        return list(self.b_field_on_axis(x_positions))
@@ -0,0 +1,236 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of MIEZE simulation.
+# Copyright (C) 2019, 2020 TUM FRM2 E21 Research Group.
+#
+# This is free software; you can redistribute it and/or modify it
+# under the terms of the MIT License; see LICENSE file for more details.
+
+"""Geometry templates, so that coils with identical geometry are only evaluated once.
+
+The coil pairs of a setup (the inner and outer coils of a coil set, the two coils of a Helmholtz pair) have identical
+geometry and only differ in position and current. Their field is the unit-current field of the common geometry,
+shifted to the coil position and scaled by the coil current. Since all coils are mirror symmetric with respect to
+their centre, the unit-current field only has to be computed for the absolute axial distance to the coil centre.
+
+The template of a geometry collects the relative positions of all its coils, evaluates each distinct (|x|, rho)
+position once and keeps the last results, such that scans of the currents do not evaluate the kernel again.
+"""
+
+import logging
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from simulation.elements.coils import Coil
+from simulation.elements.field_table import AxisymmetricFieldTable
+from utils.physics_constants import factor_T_to_G
+
+# Create a custom logger
+logger = logging.getLogger(__name__)
+
+# Relative positions closer than this distance (in m) are considered the same point
+_position_resolution = 1e-12
+
+# Number of evaluated point sets kept per template
+_max_cached_results = 8
+
+_templates = dict()
+_templates_lock = threading.Lock()
+
+
+class CoilTemplate:
+    """Class that implements the unit-current field of one coil geometry."""
+
+    def __init__(self, coil):
+        """Use the given coil as the representative of its geometry.
+
+        Parameters
+        ----------
+        coil: Coil
+            Any coil of the geometry. Only its geometry and evaluation options are used.
+        """
+        self.coil = coil
+        self.key = coil.geometry_key()
+        self._results = OrderedDict()
+        self._lock = threading.Lock()
+
+    def unit_current_b_field_x_rho(self, x, rho, field_table=None):
+        """Compute the field per unit current, evaluating each distinct position only once.
+
+        Parameters
+        ----------
+        x: ndarray
+            Positions on the x axis, relative to the coil centre.
+        rho: ndarray
+            Distances to the beam axis.
+        field_table: AxisymmetricFieldTable, optional
+            Table of the geometry to interpolate from, within its domain.
+
+        Returns
+        -------
+        out: tuple of ndarray
+            The axial and radial field per unit current.
+        """
+        # The field is evaluated at the rounded positions, such that the result of each point does not depend on
+        # the other points evaluated with it
+        quantised = np.round(np.column_stack((np.abs(x), rho)) / _position_resolution)
+        unique_positions, inverse = np.unique(quantised, axis=0, return_inverse=True)
+        inverse = inverse.ravel()
+
+        unique_distance, unique_rho = (unique_positions * _position_resolution).T
+
+        cache_key = (id(field_table), hash(unique_distance.tobytes()), hash(unique_rho.tobytes()))
+        with self._lock:
+            cached = self._results.get(cache_key)
+            if cached is not None:
+                self._results.move_to_end(cache_key)
+
+        if (cached is not None and cached[0] is field_table and np.array_equal(cached[1], unique_distance)
+                and np.array_equal(cached[2], unique_rho)):
+            b_x, b_rho = cached[3:]
+        else:
+            b_x, b_rho = self._evaluate(unique_distance, unique_rho, field_table)
+
+            with self._lock:
+                self._results[cache_key] = field_table, unique_distance, unique_rho, b_x, b_rho
+                self._results.move_to_end(cache_key)
+                if len(self._results) > _max_cached_results:
+                    self._results.popitem(last=False)
+
+        # The radial component is antisymmetric with respect to the coil centre
+        return b_x[inverse], np.where(x < 0, -1., 1.) * b_rho[inverse]
+
+    def _evaluate(self, distance, rho, field_table):
+        """Evaluate the field per unit current at the given distinct positions."""
+        if field_table is None:
+            return self.coil.unit_current_b_field_x_rho(distance, rho)
+
+        b_x = np.empty_like(distance)
+        b_rho = np.empty_like(distance)
+
+        tabulated = field_table.contains(distance, rho)
+        b_x[tabulated], b_rho[tabulated] = field_table.interpolate(distance[tabulated], rho[tabulated])
+
+        if not tabulated.all():
+            b_x[~tabulated], b_rho[~tabulated] = self.coil.unit_current_b_field_x_rho(distance[~tabulated],
+                                                                                      rho[~tabulated])
+
+        return b_x, b_rho
+
+
+def get_template(coil):
+    """Return the template of the coil geometry, creating it on first use."""
+    key = coil.geometry_key()
+    with _templates_lock:
+        if key not in _templates:
+            logger.debug(f'Creating the geometry template of {coil.name}.')
+            _templates[key] = CoilTemplate(coil)
+        return _templates[key]
+
+
+def clear_templates():
+    """Remove all geometry templates and their cached results."""
+    _templates.clear()
+
+
+def group_by_geometry(elements):
+    """Split the elements into groups of coils sharing a geometry and field table, and the remaining elements.
+
+    Returns
+    -------
+    out: tuple
+        A dictionary mapping the group key to the list of coils, and the list of other elements.
+    """
+    groups = dict()
+    others = list()
+
+    for element in elements:
+        if isinstance(element, Coil):
+            groups.setdefault((element.geometry_key(), id(element.field_table)), []).append(element)
+        else:
+            others.append(element)
+
+    return groups, others
+
+
+def build_field_tables(elements, x_start, x_end, rho_max, tolerance=1e-6):
+    """Tabulate the field of the coils on an (x, rho) grid, building one shared table per geometry.
+
+    Parameters
+    ----------
+    elements: list
+        The elements, of which only the coils are tabulated.
+    x_start: float
+        Lower edge of the tabulated domain along the beam axis.
+    x_end: float
+        Upper edge of the tabulated domain along the beam axis.
+    rho_max: float
+        Largest tabulated distance to the beam axis.
+    tolerance: float, optional
+        Relative interpolation error target.
+        Defaults to 1e-6.
+    """
+    groups = dict()
+    for element in elements:
+        if isinstance(element, Coil):
+            groups.setdefault(element.geometry_key(), []).append(element)
+
+    for coils in groups.values():
+        distance_min, distance_max = zip(*(coil.distance_range(x_start, x_end) for coil in coils))
+
+        table = AxisymmetricFieldTable.build(get_template(coils[0]).coil.unit_current_b_field_x_rho,
+                                             x_min=min(distance_min),
+                                             x_max=max(distance_max),
+                                             rho_max=rho_max,
+                                             tolerance=tolerance)
+        for coil in coils:
+            coil.use_field_table(table)
+
+
+def b_field_batch(elements, points):
+    """Compute the total magnetic field of the elements for an (N, 3) array of positions.
+
+    Coils with the same geometry are evaluated through their common template. Other elements are evaluated on
+    their own.
+
+    Parameters
+    ----------
+    elements: list
+        The elements contributing to the field.
+    points: ndarray
+        Array of shape (N, 3) containing the (x, y, z) positions.
+
+    Returns
+    -------
+    out: ndarray
+        Array of shape (N, 3) containing the total magnetic field vectors.
+    """
+    points = np.atleast_2d(np.asarray(points, dtype=float))
+    x, y, z = points.T
+    rho = np.sqrt(y ** 2 + z ** 2)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        cos_phi = np.where(rho == 0, 0., y / rho)
+        sin_phi = np.where(rho == 0, 1., z / rho)
+
+    groups, others = group_by_geometry(elements)
+
+    b_field = np.zeros_like(points)
+
+    for coils in groups.values():
+        template = get_template(coils[0])
+
+        relative_x = np.concatenate([coil._rectify_x_position(x) for coil in coils])
+        b_x, b_rho = template.unit_current_b_field_x_rho(relative_x, np.tile(rho, len(coils)),
+                                                         field_table=coils[0].field_table)
+
+        for coil, coil_b_x, coil_b_rho in zip(coils, np.split(b_x, len(coils)), np.split(b_rho, len(coils))):
+            field = coil.current * np.column_stack((coil_b_x, coil_b_rho * cos_phi, coil_b_rho * sin_phi))
+            b_field += factor_T_to_G * coil._rotate_field(field)
+
+    for element in others:
+        b_field += element.b_field_batch(points)
+
+    return b_field
@@ -8,24 +8,71 @@
 
 """Individual magnetic elements (coils) for the experimental_setup."""
 
+import copy
 import json
 import logging
-import mpmath
 import numpy as np
-import warnings
+
+from math import comb
 
 from simulation.elements.base import BasicElement
+from simulation.elements.field_table import AxisymmetricFieldTable
 
-from utils.helper_functions import get_phi, adjust_field, sanitize_output
+from utils.elliptic_integrals import get_backend
+from utils.helper_functions import adjust_field, sanitize_array, sanitize_output
 from utils.physics_constants import MU_0, pi, factor_T_to_G
 
-# Set the warning filter to errors such that one can catch them as they were errors
-# This is used to handle divisions by numerical 0
-warnings.filterwarnings('error')
-
 # Create a custom logger
 logger = logging.getLogger(__name__)
 
+# Maximal number of (shell, point) pairs evaluated at once
+_max_block_elements = 2 ** 18
+
+# Keyword arguments controlling how the field of a coil is evaluated, passed on by composite elements
+EVALUATION_KEYWORDS = ('elliptic_backend', 'field_evaluation', 'fidelity_tolerance', 'paraxial_order',
+                       'paraxial_tolerance', 'quadrature_order')
+
+# Distances beyond which the simpler models of a coil geometry are within its fidelity tolerance, by geometry key
+_fidelity_distances = dict()
+
+
+def _solenoid_end_taylor_coefficients(u, radius, order):
+    """Compute the Taylor coefficients of f(u) = u / sqrt(u^2 + R^2) with respect to u.
+
+    The on-axis field of a thin solenoid is the difference of f at both ends. The coefficients are obtained with
+    power series arithmetic: q(h) = (u + h)^2 + R^2 is a polynomial in h, q^(-1/2) follows from the recurrence for
+    powers of series and the result is multiplied by (u + h).
+
+    Parameters
+    ----------
+    u: ndarray
+        Axial distances to the solenoid end.
+    radius: ndarray, float
+        Solenoid radius, broadcastable to u.
+    order: int
+        Highest order of the coefficients.
+
+    Returns
+    -------
+    out: ndarray
+        Array of shape (order + 1,) + u.shape, containing f^(n)(u) / n!.
+    """
+    q = (u ** 2 + radius ** 2, 2 * u, np.ones_like(u))
+    alpha = -0.5
+
+    y = [q[0] ** alpha]
+    for k in range(1, order + 1):
+        y_k = 0
+        for j in range(1, min(k, 2) + 1):
+            y_k = y_k + ((alpha + 1) * j - k) * q[j] * y[k - j]
+        y.append(y_k / (k * q[0]))
+
+    coefficients = [u * y[0]]
+    for k in range(1, order + 1):
+        coefficients.append(u * y[k] + y[k - 1])
+
+    return np.array(coefficients)
+
 
 class BaseCoil(BasicElement):
     """Class that implements basic method and attributes for a coil."""
@@ -50,6 +97,18 @@ class BaseCoil(BasicElement):
                 The inner (min) radius value for the coil.
             r_max: float
                 The outer (max) radius value for the coil.
+            elliptic_backend: str
+                Implementation of the elliptic integrals, either 'native' (default) or 'mpmath' as reference.
+            field_evaluation: str
+                Either 'exact' (default) for the full kernel, or 'paraxial' for the expansion around the beam axis.
+            paraxial_order: int
+                Number of terms of the paraxial expansion. Defaults to 8.
+            paraxial_tolerance: float
+                Relative truncation error above which the paraxial expansion falls back to the exact kernel.
+                Defaults to 1e-8.
+            fidelity_tolerance: float
+                Relative error up to which the field is computed with a simpler model far from the coil, a single
+                thin solenoid or a magnetic dipole. Defaults to None, always using the full model.
         """
         super(BaseCoil, self).__init__(position, name)
 
@@ -73,6 +132,9 @@ class BaseCoil(BasicElement):
         r_min = kwargs.get('r_min', None)
         r_max = kwargs.get('r_max', None)
 
+        self.r_min = r_min
+        self.r_max = r_max
+
         if r_eff:
             self.r = r_eff
         elif r_min and r_max:
@@ -88,14 +150,25 @@ class BaseCoil(BasicElement):
         self.angle_y = kwargs.get('angle_y', 0)
         self.angle_z = kwargs.get('angle_z', 0)
 
+        self.elliptic_backend = kwargs.get('elliptic_backend', 'native')
+        get_backend(self.elliptic_backend)
+
+        self.field_evaluation = kwargs.get('field_evaluation', 'exact')
+        self.paraxial_order = kwargs.get('paraxial_order', 8)
+        self.paraxial_tolerance = kwargs.get('paraxial_tolerance', 1e-8)
+
+        self.fidelity_tolerance = kwargs.get('fidelity_tolerance', None)
+
+        if self.field_evaluation not in ('exact', 'paraxial'):
+            raise ValueError(f'Unknown field evaluation: {self.field_evaluation}.')
+
     def __repr__(self):
         return json.dumps(self, default=lambda o: o.__dict__,
                           sort_keys=True, indent=4)
 
     def _rectify_x_position(self, position_x):
         """Shift" the coil to the computational "0"."""
-        position_x -= self.position_x
-        return position_x
+        return position_x - self.position_x
 
     def compute_effective_radius(self, r_min, r_max):
         """Compute the effective radius from the other physical parameters."""
@@ -109,20 +182,17 @@ class BaseCoil(BasicElement):
 
         self.r = 1 / (inverse_r_sum / num_layers)
 
-    @staticmethod
-    def _k(m):
+    def _k(self, m, mc=None):
         """Compute the elliptical function of first kind."""
-        return float(mpmath.ellipk(m))
+        return get_backend(self.elliptic_backend)[0](m, mc)
 
-    @staticmethod
-    def _e(m):
+    def _e(self, m, mc=None):
         """Compute the elliptical function of second kind."""
-        return float(mpmath.ellipe(m))
+        return get_backend(self.elliptic_backend)[1](m, mc)
 
-    @staticmethod
-    def _p(n, m):
+    def _p(self, n, m, mc=None, nc=None):
         """Compute the elliptical function third kind"""
-        return float(mpmath.ellippi(n, np.pi / 2, m))
+        return get_backend(self.elliptic_backend)[2](n, m, mc, nc)
 
     @staticmethod
     def _rotate(vector, phi, axis):
@@ -156,6 +226,11 @@ class BaseCoil(BasicElement):
     def change_current(self, current):
         """Change the assigned current value."""
         self.current = current
+        self._update_prefactor()
+
+    def _update_prefactor(self):
+        """Compute the prefactor of the field from the coil parameters and the current."""
+        self.prefactor = MU_0
 
     def zeta(self, x, s):
         """Compute zeta function."""
@@ -169,6 +244,71 @@ class BaseCoil(BasicElement):
         """Compute m function."""
         return 4.0 * self.r * rho / self.beta(rho, x, s) ** 2
 
+    def _sum_elements(self, rho, x, s, radius=None, length=None):
+        """Compute the summations for the x and rho directions at once.
+
+        Both directions share the same elliptic integrals K(m), E(m) and Pi(n, m), so these are evaluated only once
+        per boundary value s.
+
+        Parameters
+        ----------
+        rho: ndarray
+            Radial positions.
+        x: ndarray
+            Positions on the x axis, relative to the coil centre.
+        s: [-1, 1]
+            Boundary values for the elliptical functions.
+        radius: ndarray, float, optional
+            Radius of the solenoid, broadcastable to x. Defaults to the coil radius.
+        length: ndarray, float, optional
+            Length of the solenoid, broadcastable to x. Defaults to the coil length.
+
+        Returns
+        -------
+        out: tuple of ndarray
+            The summation elements for the x and the rho direction.
+        """
+        radius = self.r if radius is None else radius
+        length = self.length if length is None else length
+
+        zeta = x - s * length / 2.0
+        beta = np.sqrt((rho + radius) ** 2 + zeta ** 2)
+        m = 4.0 * radius * rho / beta ** 2
+        n = 4.0 * radius * rho / (rho + radius) ** 2
+
+        # Computed directly, 1 - m and 1 - n loose all precision close to the windings
+        mc = ((rho - radius) ** 2 + zeta ** 2) / beta ** 2
+        nc = ((rho - radius) / (rho + radius)) ** 2
+
+        k = self._k(m, mc)
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            sum_x = zeta / beta * ((rho - radius) / (rho + radius) * self._p(n, m, mc, nc) - k)
+            sum_rho = np.where(rho == 0, 0., beta / (2 * rho) * ((2 - m) * k - 2 * self._e(m, mc)))
+
+        return sum_x, sum_rho
+
+    def shells(self):
+        """Return the thin solenoid shells the coil is made of.
+
+        Returns
+        -------
+        out: tuple of ndarray
+            The x offsets of the shell centres with respect to the coil position, the shell radii, the shell lengths
+            and the prefactor of each shell.
+        """
+        return np.zeros(1), np.array([self.r]), np.array([self.length]), np.array([self.prefactor])
+
+    def _rotate_field(self, field):
+        """Apply the coil rotation to an (N, 3) array of field vectors."""
+        if self.angle_y != 0:
+            field = self._rotate(field.T, self.angle_y, np.array([0, 1, 0])).T
+
+        if self.angle_z != 0:
+            field = self._rotate(field.T, self.angle_z, np.array([0, 0, 1])).T
+
+        return field
+
     def b_field(self, r: '(x, y, z)'):
         """Compute magnetic field at position r."""
         raise NotImplementedError
@@ -178,13 +318,30 @@ class Coil(BaseCoil):
     """Class that implements an ideal circular coil."""
 
     name = 'Coil'
+    mirror_parities = {'y': (1, -1, 1), 'z': (1, 1, -1)}
 
     def __init__(self, name, position, **kwargs):
         """Simulate physical geometry of a simplified coil."""
 
         super(Coil, self).__init__(position, name, **kwargs)
 
-        self.prefactor *= self.windings * self.current / (2 * pi * self.length)
+        self.field_table = None
+
+        self._update_prefactor()
+
+    def _update_prefactor(self):
+        """Compute the prefactor of the field from the coil parameters and the current."""
+        self.prefactor = MU_0 * self.windings * self.current / (2 * pi * self.length)
+
+    def geometry_key(self):
+        """Return a hashable key identifying the geometry and the evaluation options of the coil.
+
+        Coils with the same key have the same field per unit current, relative to their position.
+        """
+        return (type(self).__name__, self.length, self.r, self.r_min, self.r_max, self.windings, self.wire_d,
+                self.wire_spacing, self.radial_layers, getattr(self, 'quadrature_order', None),
+                self.elliptic_backend, self.field_evaluation, self.paraxial_order, self.paraxial_tolerance,
+                self.fidelity_tolerance)
 
     @sanitize_output
     def b_field_rho(self, x, rho):
@@ -216,7 +373,7 @@ class Coil(BaseCoil):
         -------
         out: float
         """
-        return self.beta(rho, x, s) / rho \
+        return self.beta(rho, x, s) / (2 * rho) \
             * ((2 - self.m(rho, x, s)) * self._k(self.m(rho, x, s)) - 2 * self._e(self.m(rho, x, s)))
 
     @sanitize_output
@@ -253,292 +410,700 @@ class Coil(BaseCoil):
         return self.zeta(x, s) / self.beta(rho, x, s) \
             * ((rho - self.r) / (rho + self.r) * self._p(n, self.m(rho, x, s)) - self._k(self.m(rho, x, s)))
 
-    def b_field(self, r: '(x, y, z)'):
-        """Compute the magnetic field given the position in cartesian coordinates."""
-        x, y, z = r
-        r = np.sqrt(z ** 2 + y ** 2)
+    def _shell_blocks(self, number_of_points, number_of_shells):
+        """Yield slices of points such that the (shell, point) arrays have a bounded size."""
+        block_size = max(1, _max_block_elements // number_of_shells)
+        for start in range(0, number_of_points, block_size):
+            yield slice(start, start + block_size)
 
-        phi = get_phi(y, z)
-        # print(f'y:{z}\ny:{y}\nr:{r}')
-        field = np.array((self.b_field_x(x, r),
-                          self.b_field_rho(x, r) * np.cos(phi),
-                          self.b_field_rho(x, r) * np.sin(phi))
-                         )
+    def _b_field_x_on_axis(self, x, shells=None):
+        """Compute the magnetic field on the beam axis with the closed form expression of a finite solenoid.
 
-        if self.angle_y != 0:
-            field = self._rotate(field, self.angle_y, np.array([0, 1, 0]))
+        Parameters
+        ----------
+        x: ndarray
+            Positions on the x axis, relative to the coil centre.
+        shells: tuple, optional
+            The shells to sum over, as returned by shells.
+            Defaults to the shells of the coil.
+        """
+        offsets, radii, lengths, prefactors = (item[:, np.newaxis] for item in shells or self.shells())
 
-        if self.angle_z != 0:
-            field = self._rotate(field, self.angle_z, np.array([0, 0, 1]))
+        b_x = np.empty_like(x)
+        for block in self._shell_blocks(len(x), len(offsets)):
+            x_block = x[np.newaxis, block] - offsets
+            zeta_lower = x_block + lengths / 2
+            zeta_upper = x_block - lengths / 2
 
-        return factor_T_to_G * field
+            b_x[block] = pi * np.sum(prefactors * (zeta_lower / np.hypot(zeta_lower, radii)
+                                                   - zeta_upper / np.hypot(zeta_upper, radii)), axis=0)
+        return b_x
 
+    def _b_field_x_rho_off_axis(self, x, rho, shells=None):
+        """Compute the magnetic field in the x and rho directions with the elliptic integrals.
 
-class RealCoil(Coil):
-    """Class that implements a coil with more realistic experimental parameters."""
+        Parameters
+        ----------
+        x: ndarray
+            Positions on the x axis, relative to the coil centre.
+        rho: ndarray
+            Positions in the radial direction.
+        shells: tuple, optional
+            The shells to sum over, as returned by shells.
+            Defaults to the shells of the coil.
+        """
+        offsets, radii, lengths, prefactors = (item[:, np.newaxis] for item in shells or self.shells())
 
-    def b_field_rho(self, x, rho):
-        """Compute the magnetic field in rho (radial) direction.
+        b_x = np.empty_like(x)
+        b_rho = np.empty_like(x)
+        for block in self._shell_blocks(len(x), len(offsets)):
+            x_block = x[np.newaxis, block] - offsets
+            rho_block = rho[np.newaxis, block]
+
+            sum_x_upper, sum_rho_upper = self._sum_elements(rho_block, x_block, 1, radii, lengths)
+            sum_x_lower, sum_rho_lower = self._sum_elements(rho_block, x_block, -1, radii, lengths)
+
+            # Non finite sums on the windings are sanitized below
+            with np.errstate(invalid='ignore'):
+                b_x[block] = np.sum(prefactors * (sum_x_upper - sum_x_lower), axis=0)
+                b_rho[block] = np.sum(prefactors * (sum_rho_upper - sum_rho_lower), axis=0)
 
+        return sanitize_array(b_x), sanitize_array(b_rho)
+
+    def on_axis_taylor_coefficients(self, x, order):
+        """Compute the Taylor coefficients of the on-axis field, i.e. the x derivatives B^(n)(x) / n!.
 
         Parameters
         ----------
-        x: float
-            Value on the x axis, along the coil.
-        rho: float
-            Radius value.
+        x: ndarray
+            Positions on the x axis, relative to the coil centre.
+        order: int
+            Highest order of the coefficients.
+
+        Returns
+        -------
+        out: ndarray
+            Array of shape (order + 1, N), in T / m^n.
         """
-        if rho == 0:
-            return 0
+        offsets, radii, lengths, prefactors = (item[:, np.newaxis] for item in self.shells())
 
-        x = self._rectify_x_position(x)
+        coefficients = np.empty((order + 1, len(x)))
+        for block in self._shell_blocks(len(x), len(offsets) * (order + 1)):
+            x_block = x[np.newaxis, block] - offsets
 
-        return self.prefactor * (self.sum_element_rho(rho, x, s=1) - self.sum_element_rho(rho, x, s=-1))
+            lower = _solenoid_end_taylor_coefficients(x_block + lengths / 2, radii, order)
+            upper = _solenoid_end_taylor_coefficients(x_block - lengths / 2, radii, order)
 
-    def sum_element_rho(self, rho, x, s):
-        """Compute the summation for the rho direction."""
-        return self.beta(rho, x, s) \
-            / rho * ((2 - self.m(rho, x, s)) * self._k(self.m(rho, x, s)) - 2 * self._e(self.m(rho, x, s)))
+            coefficients[:, block] = pi * np.sum(prefactors * (lower - upper), axis=1)
+        return coefficients
+
+    def _b_field_x_rho_paraxial(self, x, rho):
+        """Compute the magnetic field from the paraxial expansion of the on-axis field.
 
-    def b_field_beam(self, x, r, rho=0):
-        """Compute the magnetic field in the x direction.
+        For an axisymmetric field with on-axis Taylor coefficients a_n, the field off axis is
 
-        # N = turns of winding, I = current (A), R = radius (m), l = length (m)
-        # x für mich y
+            B_x = sum_k (-1)^k binom(2k, k) (rho / 2)^(2k) a_2k
+            B_rho = sum_k (-1)^(k + 1) binom(2k + 1, k) (rho / 2)^(2k + 1) a_(2k + 1)
 
+        The coefficients are computed once per distinct x position, such that grids with many points in the cross
+        section reduce to a 1D problem. The last terms of both series estimate the truncation error, and points
+        exceeding the tolerance are evaluated with the exact kernel instead.
+
+        Parameters
+        ----------
+        x: ndarray
+            Positions on the x axis, relative to the coil centre.
+        rho: ndarray
+            Positions in the radial direction.
         """
-        x -= self.position_x
+        unique_x, inverse = np.unique(x, return_inverse=True)
+        coefficients = self.on_axis_taylor_coefficients(unique_x, 2 * self.paraxial_order + 1)[:, inverse]
 
-        rho = abs(rho)  # symmetric
-        n = 4.0 * r * rho / (rho + r) ** 2
+        half_rho = rho / 2
+        b_x = np.zeros_like(x)
+        b_rho = np.zeros_like(x)
 
-        return self.prefactor * (-self.sum_element_x(n, rho, x, s=-1) + self.sum_element_x(n, rho, x, s=1))
+        for k in range(self.paraxial_order + 1):
+            binomial_x = comb(2 * k, k)
+            binomial_rho = comb(2 * k + 1, k)
 
-    def sum_element_x(self, n, rho, x, s):
-        """Compute the summation for the x direction.
+            term_x = (-1) ** k * binomial_x * half_rho ** (2 * k) * coefficients[2 * k]
+            term_rho = (-1) ** (k + 1) * binomial_rho * half_rho ** (2 * k + 1) * coefficients[2 * k + 1]
+
+            b_x += term_x
+            b_rho += term_rho
+
+        truncation_error = np.abs(term_x) + np.abs(term_rho)
+        exceeded = ~(truncation_error <= self.paraxial_tolerance * np.hypot(b_x, b_rho))
+
+        if exceeded.any():
+            b_x[exceeded], b_rho[exceeded] = self._b_field_x_rho_off_axis(x[exceeded], rho[exceeded])
+
+        return b_x, b_rho
+
+    def equivalent_solenoid(self):
+        """Return the single thin solenoid with the length, the ampere-turns and the dipole moment of the shells.
+
+        Returns
+        -------
+        out: tuple of ndarray
+            The shell, as returned by shells.
+        """
+        _, radii, lengths, prefactors = self.shells()
+        ampere_turns = np.sum(prefactors * lengths)
+        radius = np.sqrt(np.sum(prefactors * lengths * radii ** 2) / ampere_turns) if ampere_turns else self.r
+        return np.zeros(1), np.array([radius]), np.array([self.length]), np.array([ampere_turns / self.length])
+
+    def _b_field_x_rho_solenoid(self, x, rho):
+        """Compute the magnetic field of the equivalent single thin solenoid, replacing the shells.
 
         Parameters
         ----------
-        n: int
-            Winding number
-        rho: float
-            Radius value.
-        x: float
-            Position on the x axis along the coil.
-        s: [-1, 1]
-            Boundary values for hte elliptical functions
+        x: ndarray
+            Positions on the x axis, relative to the coil centre.
+        rho: ndarray
+            Positions in the radial direction.
         """
-        return self.zeta(x, s) / self.beta(rho, x, s) \
-            * ((rho - self.r) / (rho + self.r) * self._p(n, self.m(rho, x, s)) - self._k(self.m(rho, x, s)))\
-               
+        shells = self.equivalent_solenoid()
+        on_axis = rho == 0
 
-    def b_field(self, r: '(x, y, z)'):
-        """Compute the magnetic field given the position in cartesian coordinates."""
-        self.iteration += 1
-        x, y, z = r
-
-        field = np.array([0., 0., 0.])
-        r = np.sqrt(y ** 2 + z ** 2)
-        phi = get_phi(y, z)
-
-        x_positions = np.arange(-(self.windings * self.wire_d / 2 - self.wire_d / 2),
-                                self.windings * self.wire_d / 2,
-                                self.wire_d)
-
-        rs = np.arange(self.r, self.r + self.wire_d * (self.windings - 0.5), self.wire_d)
-
-        for x0 in x_positions:
-            for R in rs:
-                print(f'iteration:{self.iteration} with x:{x0} and r:{R}')
-                # logger.error(f'{field}\n{field_add}')
-                field_add = np.array([self.b_field_beam(x + x0, R, r),
-                                      self.b_field_rho(x + x0, R) * np.cos(phi),
-                                      self.b_field_rho(x + x0, R) * np.sin(phi)])
-                # logger.error(f'{field}\n{field_add}')
-                field += field_add
-                # field = np.add(field, field_add, out=field, casting='unsafe')
+        b_x = np.empty_like(x)
+        b_rho = np.zeros_like(x)
 
-        if self.angle_y != 0:
-            field = self._rotate(field, self.angle_y, np.array([0, 1, 0]))
+        b_x[on_axis] = self._b_field_x_on_axis(x[on_axis], shells)
+        b_x[~on_axis], b_rho[~on_axis] = self._b_field_x_rho_off_axis(x[~on_axis], rho[~on_axis], shells)
 
-        if self.angle_z != 0:
-            field = self._rotate(field, self.angle_z, np.array([0, 0, 1]))
+        return b_x, b_rho
 
-        return factor_T_to_G * field
+    def dipole_coefficient(self):
+        """Return mu_0 / (4 pi) times the magnetic dipole moment of the shells, in T m^3."""
+        _, radii, lengths, prefactors = self.shells()
+        return np.sum(pi * prefactors * lengths * radii ** 2) / 2
 
+    def _b_field_x_rho_dipole(self, x, rho):
+        """Compute the magnetic field of the magnetic dipole of the coil, its far field.
 
-class RectangularCoil(BaseCoil):
-    """Class that implements a rectangular coil."""
+        Parameters
+        ----------
+        x: ndarray
+            Positions on the x axis, relative to the coil centre.
+        rho: ndarray
+            Positions in the radial direction.
+        """
+        distance = np.hypot(x, rho)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            b_x = self.dipole_coefficient() * (3 * x ** 2 - distance ** 2) / distance ** 5
+            b_rho = self.dipole_coefficient() * 3 * x * rho / distance ** 5
+        return b_x, b_rho
 
-    def __init__(self, position, name, **kwargs):
-        """Simulate physical geometry of the coil."""
+    def fidelity_distances(self):
+        """Return the distances to the coil centre beyond which the simpler models are within the fidelity tolerance.
 
-        super(RectangularCoil, self).__init__(position, name, **kwargs)
+        The distances are found once per geometry, by comparing the models with the full model on rays from the
+        coil centre at geometrically growing distances, relative to the field magnitude. The error of the simpler
+        models decreases with the distance, while far away the full model itself looses precision by cancellation.
+        Hence the distance is the first one from which the error stays within the tolerance over a factor of two.
+        For a coil without several shells, the single solenoid is the full model.
 
-        self.x, self.y, self.z = None, None, None
+        Returns
+        -------
+        out: tuple
+            The distances for the single thin solenoid and for the magnetic dipole, inf if never within.
+        """
+        key = self.geometry_key()
+        if key in _fidelity_distances:
+            return _fidelity_distances[key]
+
+        # The relative errors do not depend on the current
+        unit_coil = copy.copy(self)
+        unit_coil.change_current(1.)
+
+        size = max(self.r_max or self.r, self.length / 2)
+        distances = size * 2 ** (np.arange(1, 37) / 4)
+        angles = np.linspace(0, pi / 2, 4)
+        ray_distances, ray_angles = (item.ravel() for item in np.meshgrid(distances, angles, indexing='ij'))
+        x, rho = ray_distances * np.cos(ray_angles), ray_distances * np.sin(ray_angles)
+
+        reference = unit_coil._b_field_x_rho_full(x, rho)
+
+        def threshold(b_x, b_rho):
+            error = np.hypot(b_x - reference[0], b_rho - reference[1]) / np.hypot(*reference)
+            within = (error <= self.fidelity_tolerance).reshape(len(distances), -1).all(axis=1)
+            for index in range(len(distances) - 4):
+                if within[index:index + 5].all():
+                    return distances[index]
+            return np.inf
+
+        if len(self.shells()[0]) == 1:
+            solenoid_distance = 0.
+        else:
+            solenoid_distance = threshold(*unit_coil._b_field_x_rho_solenoid(x, rho))
+        dipole_distance = max(threshold(*unit_coil._b_field_x_rho_dipole(x, rho)), solenoid_distance)
 
-        self.width = kwargs.get('width', None)
-        self.height = kwargs.get('height', None)
-        self.length = kwargs.get('length', None)
+        logger.info(f'Fidelity distances of {self.name} for {self.fidelity_tolerance}: solenoid {solenoid_distance}, '
+                    f'dipole {dipole_distance}')
+        _fidelity_distances[key] = solenoid_distance, dipole_distance
+        return _fidelity_distances[key]
 
-        self.prefactor *= 1 / (4 * np.pi) * self.windings * self.current / self.length
+    def _b_field_x_rho_relative(self, x, rho):
+        """Compute the magnetic field in the x and rho directions, without using the field table.
 
-    def check_physical_coil_overlap(self):
-        """Deal with division by 0.
+        With a fidelity tolerance, the points far from the coil use the single thin solenoid or the dipole model.
 
-        If the magnetic field has to be numerically computed at the position of the coil, this implies a division by
-        0 leading to numerical errors. This function is used to handle such cases by setting the magnetic field to 0.
+        Parameters
+        ----------
+        x: ndarray
+            Positions on the x axis, relative to the coil centre.
+        rho: ndarray
+            Positions in the radial direction.
         """
-        numerical_error_acceptance = min(self.width, self.height) * 1e-2
-        # print(f'{self.y} {self.width}')
-        if abs(self.y - self.width) < numerical_error_acceptance \
-                or abs(self.y + self.width) < numerical_error_acceptance:
-            return True
+        if self.fidelity_tolerance is None:
+            return self._b_field_x_rho_full(x, rho)
 
-        if abs(self.x - self.height).all() < numerical_error_acceptance\
-                or abs(self.x + self.height) < numerical_error_acceptance:
-            return True
+        solenoid_distance, dipole_distance = self.fidelity_distances()
+        distance = np.hypot(x, rho)
 
-    @staticmethod
-    def _change_coordinates(x, y, z):
-        """Fix coordinates for the equations.
+        dipole = distance >= dipole_distance
+        solenoid = ~dipole & (distance >= solenoid_distance) & (solenoid_distance > 0)
+        full = ~dipole & ~solenoid
 
-         The equations taken from the paper have axes pointing differently compared to the experimental_setup."""
-        return np.array([-z, x, -y])
+        b_x = np.empty_like(x)
+        b_rho = np.empty_like(x)
+        for model, selection in ((self._b_field_x_rho_full, full), (self._b_field_x_rho_solenoid, solenoid),
+                                 (self._b_field_x_rho_dipole, dipole)):
+            if selection.any():
+                b_x[selection], b_rho[selection] = model(x[selection], rho[selection])
 
-    def b_field(self, r: '(x, y, z)'):
-        """Compute the magnetic field.
+        return b_x, b_rho
+
+    def _b_field_x_rho_full(self, x, rho):
+        """Compute the magnetic field in the x and rho directions with the full model of the coil.
+
+        Parameters
+        ----------
+        x: ndarray
+            Positions on the x axis, relative to the coil centre.
+        rho: ndarray
+            Positions in the radial direction.
+        """
+        on_axis = rho == 0
+
+        if on_axis.all():
+            return self._b_field_x_on_axis(x), np.zeros_like(x)
+
+        if self.field_evaluation == 'paraxial':
+            return self._b_field_x_rho_paraxial(x, rho)
+
+        b_x = np.empty_like(x)
+        b_rho = np.zeros_like(x)
+
+        b_x[on_axis] = self._b_field_x_on_axis(x[on_axis])
+        b_x[~on_axis], b_rho[~on_axis] = self._b_field_x_rho_off_axis(x[~on_axis], rho[~on_axis])
+
+        return b_x, b_rho
+
+    def b_field_x_rho(self, x, rho):
+        """Compute the magnetic field in the x and rho directions for arrays of positions.
+
+        The contributions of all shells of the coil are evaluated as one array operation, in blocks of points such
+        that the memory usage stays bounded. Points on the beam axis use the closed form expression. In the paraxial
+        mode, all points use the expansion around the beam axis. Points within the domain of the field table, if
+        any, are interpolated from it.
+
+        Parameters
+        ----------
+        x: ndarray
+            Positions on the x axis.
+        rho: ndarray
+            Positions in the radial direction (assuming symmetry).
 
         Returns
         -------
-        magnetic field in cartesian coordinates
+        out: tuple of ndarray
+            Magnetic field values in the x and the radial direction.
         """
-        x, y, z = r
+        x = self._rectify_x_position(np.asarray(x, dtype=float))
+        rho = np.abs(np.asarray(rho, dtype=float))
+        x, rho = np.broadcast_arrays(x, rho)
+        shape = x.shape
+        x, rho = x.ravel(), rho.ravel()
 
-        x = self._rectify_x_position(x)
+        if self.field_table is None:
+            b_x, b_rho = self._b_field_x_rho_relative(x, rho)
+            return b_x.reshape(shape), b_rho.reshape(shape)
 
-        self.x, self.y, self.z = self._change_coordinates(x, y, z)
+        # The table covers the distance to the coil centre, the radial component being antisymmetric
+        distance = np.abs(x)
+        tabulated = self.field_table.contains(distance, rho)
 
-        field = self.check_physical_coil_overlap()
-        if field:
-            return np.array([0, 0, 0])
+        b_x = np.empty_like(x)
+        b_rho = np.empty_like(x)
 
-        field = self.prefactor * np.array([self.sum_element_x, self.sum_element_y, self.sum_element_z])
+        b_x[tabulated], b_rho[tabulated] = self.field_table.interpolate(distance[tabulated], rho[tabulated])
+        b_x[tabulated] *= self.current
+        b_rho[tabulated] *= np.where(x[tabulated] < 0, -self.current, self.current)
 
-        field = adjust_field(field)
+        if not tabulated.all():
+            b_x[~tabulated], b_rho[~tabulated] = self._b_field_x_rho_relative(x[~tabulated], rho[~tabulated])
 
-        return factor_T_to_G * self._change_coordinates(*self.sanitize_output(field))
+        return b_x.reshape(shape), b_rho.reshape(shape)
 
-    @staticmethod
-    def sanitize_output(field):
-        """Sanitize magnetic field..
+    def unit_current_b_field_x_rho(self, x, rho):
+        """Compute the magnetic field per unit current, without using the field table.
+
+        Parameters
+        ----------
+        x: ndarray
+            Positions on the x axis, relative to the coil centre.
+        rho: ndarray
+            Positions in the radial direction.
+        """
+        # Evaluate a copy, such that the coil itself can be evaluated concurrently
+        unit_coil = copy.copy(self)
+        unit_coil.change_current(1.)
+        return unit_coil._b_field_x_rho_relative(np.asarray(x, dtype=float), np.abs(np.asarray(rho, dtype=float)))
+
+    def build_field_table(self, x_start, x_end, rho_max, tolerance=1e-6):
+        """Tabulate the field on an (x, rho) grid, which is then used for all points within its domain.
 
-        Remove possible numerical singularities.
+        The resolution is refined until the relative interpolation error is below the tolerance. The table is stored
+        per unit current and as a function of the distance to the coil centre, using the mirror symmetry of the
+        coil, so it can be reused with use_field_table by other coils of the same geometry.
 
         Parameters
         ----------
-        field: np.array
-            3D vector
+        x_start: float
+            Lower edge of the tabulated domain along the beam axis.
+        x_end: float
+            Upper edge of the tabulated domain along the beam axis.
+        rho_max: float
+            Largest tabulated distance to the beam axis.
+        tolerance: float, optional
+            Relative interpolation error target.
+            Defaults to 1e-6.
+
+        Returns
+        -------
+        out: AxisymmetricFieldTable
         """
+        distance_min, distance_max = self.distance_range(x_start, x_end)
+        table = AxisymmetricFieldTable.build(self.unit_current_b_field_x_rho,
+                                             x_min=distance_min,
+                                             x_max=distance_max,
+                                             rho_max=rho_max,
+                                             tolerance=tolerance)
+        self.use_field_table(table)
+        return table
+
+    def distance_range(self, x_start, x_end):
+        """Return the smallest and largest distance to the coil centre of the positions between x_start and x_end."""
+        start, end = sorted((self._rectify_x_position(x_start), self._rectify_x_position(x_end)))
+        if start <= 0 <= end:
+            return 0., max(-start, end)
+        return min(abs(start), abs(end)), max(abs(start), abs(end))
+
+    def use_field_table(self, table):
+        """Use the given field table, or None to always evaluate the field directly."""
+        self.field_table = table
+
+    def b_field_on_axis(self, x_positions):
+        """Compute the magnetic field along the beam axis, i.e. for y = z = 0.
 
-        if any(np.isinf(field)) or any(np.isnan(field)):
-            return np.array([0, 0, 0])
-        if any(field) > 1e6 or any(field) < -1e6:
-            return np.array([0, 0, 0])
+        Parameters
+        ----------
+        x_positions: ndarray
+            Positions on the x axis.
 
-        return field
+        Returns
+        -------
+        out: ndarray
+            Array of shape (N, 3) containing the magnetic field vectors.
+        """
+        x = self._rectify_x_position(np.asarray(x_positions, dtype=float).ravel())
+        b_x = self._b_field_x_on_axis(x)
 
-    @property
-    def sum_element_z(self):
-        """Compute the summation for the z direction.
+        field = np.column_stack((b_x, np.zeros_like(b_x), np.zeros_like(b_x)))
+
+        return factor_T_to_G * self._rotate_field(field)
+
+    def b_field_batch(self, points):
+        """Compute the magnetic field for an (N, 3) array of positions in cartesian coordinates.
+
+        Parameters
+        ----------
+        points: ndarray
+            Array of shape (N, 3) containing the (x, y, z) positions.
 
         Returns
         -------
-        out: float
+        out: ndarray
+            Array of shape (N, 3) containing the magnetic field vectors.
+        """
+        x, y, z = np.atleast_2d(np.asarray(points, dtype=float)).T
+        rho = np.sqrt(y ** 2 + z ** 2)
+
+        b_x, b_rho = self.b_field_x_rho(x, rho)
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            cos_phi = np.where(rho == 0, 0., y / rho)
+            sin_phi = np.where(rho == 0, 1., z / rho)
+
+        field = np.column_stack((b_x, b_rho * cos_phi, b_rho * sin_phi))
+
+        return factor_T_to_G * self._rotate_field(field)
+
+    def b_field(self, r: '(x, y, z)'):
+        """Compute the magnetic field given the position in cartesian coordinates."""
+        return self.b_field_batch([r])[0]
+
+    def evaluation_cost(self, points):
+        """Estimate the relative cost of computing the field at each of the points.
+
+        Each shell costs one unit on the beam axis, and about ten units elsewhere where the elliptic integrals are
+        evaluated. The dipole model costs one unit.
         """
-        _eta = 0
-        for alpha in np.arange(1, 5):
-            # Python indexing starts from 0, so whenever alpha is used as an array index it has to be subtracted by 1
-            alpha_index = alpha - 1
+        points = np.atleast_2d(np.asarray(points, dtype=float))
+        on_axis = (points[:, 1] == 0) & (points[:, 2] == 0)
+        cost = len(self.shells()[0]) * np.where(on_axis, 1., 10.)
+
+        if self.fidelity_tolerance is not None:
+            distance = np.hypot(self._rectify_x_position(points[:, 0]), np.hypot(points[:, 1], points[:, 2]))
+            cost = np.where(distance >= self.fidelity_distances()[1], 1., cost)
+        return cost
+
+
+class RealCoil(Coil):
+    """Class that implements a coil with more realistic experimental parameters.
+
+    The winding pack has a rectangular cross-section, spanning the coil length along x and the radii from r_min to
+    r_max. It is split into a lattice of thin solenoid shells, with one shell segment per axial winding position and
+    radial layer, which all carry the same share of the ampere-turns.
+
+    Alternatively, a Gauss-Legendre quadrature of the given order is used in the radial direction. Since the solenoid
+    kernel already integrates the current density exactly along x, this reaches the same accuracy with far fewer
+    shells.
+    """
+
+    name = 'RealCoil'
 
-            try:
-                t1 = ((-1) ** alpha) * self.d[alpha_index] / \
-                     (self.r_values[alpha_index] * (self.r_values[alpha_index]
-                                                    + (-1) ** (alpha + 1) * self.c[alpha_index]))
-            except RuntimeWarning:
-                t1 = 0
+    def __init__(self, name, position, **kwargs):
+        """Simulate physical geometry of a coil with a finite winding pack.
 
-            try:
-                t2 = self.c[alpha_index] \
-                     / (self.r_values[alpha_index] * (self.r_values[alpha_index] + self.d[alpha_index]))
-            except RuntimeWarning:
-                t2 = 0
+        Parameters
+        ----------
+        Keyword Arguments:
+            quadrature_order: int, optional
+                Number of Gauss-Legendre nodes in the radial direction.
+                If None, the lattice of winding positions is used instead.
+                Defaults to None.
+        """
+        super(RealCoil, self).__init__(name, position, **kwargs)
 
-            _eta += t1 - t2
+        self.quadrature_order = kwargs.get('quadrature_order', None)
 
-        return _eta
+    @property
+    def _radial_extent(self):
+        """Return the inner and outer radius of the winding pack."""
+        if self.r_min and self.r_max:
+            return self.r_min, self.r_max
+        return self.r, self.r
 
     @property
-    def sum_element_y(self):
-        """Compute the summation for the y direction.
+    def _winding_pitch(self):
+        """Return the distance between two neighbouring windings."""
+        return (self.wire_d or 0) + (self.wire_spacing or 0)
+
+    def _number_of_axial_windings(self):
+        """Return the number of winding positions along the coil."""
+        if not self._winding_pitch:
+            return 1
+        return max(1, int(round(self.length / self._winding_pitch)))
+
+    def _number_of_radial_layers(self):
+        """Return the number of radial winding layers."""
+        r_min, r_max = self._radial_extent
+        if self.radial_layers:
+            return self.radial_layers
+        if not self._winding_pitch or r_max == r_min:
+            return 1
+        return max(1, int(round((r_max - r_min) / self._winding_pitch)))
+
+    def shells(self):
+        """Return the thin solenoid shells the winding pack is made of.
 
         Returns
         -------
-        out: float
+        out: tuple of ndarray
+            The x offsets of the shell centres with respect to the coil position, the shell radii, the shell lengths
+            and the prefactor of each shell.
         """
-        _eta = 0
-        for alpha in np.arange(1, 5):
-            alpha_index = alpha - 1
+        r_min, r_max = self._radial_extent
 
-            try:
-                _eta += ((-1)**(alpha+1)) * self.z / (self.r_values[alpha_index] * (self.r_values[alpha_index]
-                                                      + ((-1) ** (alpha+1)) * self.c[alpha_index]))
-            except RuntimeWarning:
-                _eta = 0
+        if self.quadrature_order and r_max > r_min:
+            nodes, weights = np.polynomial.legendre.leggauss(self.quadrature_order)
+            radii = (r_min + r_max) / 2 + (r_max - r_min) / 2 * nodes
+            prefactors = self.prefactor * weights / 2
 
-        return _eta
+            return np.zeros_like(radii), radii, np.full_like(radii, self.length), prefactors
 
-    @property
-    def sum_element_x(self):
-        """Compute the summation for the x direction.
+        n_axial = self._number_of_axial_windings()
+        n_radial = self._number_of_radial_layers()
+
+        segment_length = self.length / n_axial
+        x_positions = -self.length / 2 + (np.arange(n_axial) + 0.5) * segment_length
+        radii = r_min + (np.arange(n_radial) + 0.5) * (r_max - r_min) / n_radial
+
+        x_positions, radii = (item.ravel() for item in np.meshgrid(x_positions, radii))
+
+        # Each segment carries the share 1 / (n_axial * n_radial) of the ampere-turns over a length segment_length
+        prefactor = self.prefactor / n_radial
+
+        return (x_positions, radii, np.full_like(radii, segment_length), np.full_like(radii, prefactor))
+
+    def b_field_x(self, x, rho=0):
+        """Compute the magnetic field in x direction of the winding pack."""
+        return self.b_field_x_rho(x, rho)[0]
+
+    def b_field_rho(self, x, rho):
+        """Compute the magnetic field in rho (radial) direction of the winding pack."""
+        return self.b_field_x_rho(x, rho)[1]
+
+
+class RectangularCoil(BaseCoil):
+    """Class that implements a rectangular coil."""
+
+    mirror_parities = {'y': (-1, 1, -1), 'z': (-1, 1, 1)}
+
+    def __init__(self, position, name, **kwargs):
+        """Simulate physical geometry of the coil."""
+
+        super(RectangularCoil, self).__init__(position, name, **kwargs)
+
+        self.width = kwargs.get('width', None)
+        self.height = kwargs.get('height', None)
+        self.length = kwargs.get('length', None)
+
+        self._update_prefactor()
+
+    def _update_prefactor(self):
+        """Compute the prefactor of the field from the coil parameters and the current."""
+        self.prefactor = MU_0 / (4 * np.pi) * self.windings * self.current / self.length
+
+    def check_physical_coil_overlap(self, x, y):
+        """Deal with division by 0.
+
+        If the magnetic field has to be numerically computed at the position of the coil, this implies a division by
+        0 leading to numerical errors. Such points are masked, such that their magnetic field is set to 0.
+
+        Parameters
+        ----------
+        x: ndarray
+            Positions along the coil height, in the coordinates of the coil.
+        y: ndarray
+            Positions along the coil width, in the coordinates of the coil.
 
         Returns
         -------
-        out: float
+        out: ndarray
+            Mask of the points overlapping with the windings.
         """
-        _eta = 0
-        for alpha in np.arange(1, 5):
-            alpha_index = alpha - 1
+        numerical_error_acceptance = min(self.width, self.height) * 1e-2
 
-            try:
-                _eta += ((-1) ** (alpha + 1)) * self.z / (
-                            self.r_values[alpha_index] * (self.r_values[alpha_index] + self.d[alpha_index]))
-            except RuntimeWarning:
-                _eta = 0
-        return _eta
+        overlap_y = (np.abs(y - self.width) < numerical_error_acceptance) \
+            | (np.abs(y + self.width) < numerical_error_acceptance)
+        overlap_x = (np.abs(x - self.height) < numerical_error_acceptance) \
+            | (np.abs(x + self.height) < numerical_error_acceptance)
 
-    @property
-    def c(self):
-        """Compute height parameter from the actual coil"""
-        return np.array([self.height + self.x,
-                         self.height - self.x,
-                         -self.height + self.x,
-                         -self.height - self.x])
+        return overlap_y | overlap_x
 
-    @property
-    def d(self):
-        """Compute width parameter from the actual coil."""
-        return np.array([self.y + self.width,
-                         self.y + self.width,
-                         self.y - self.width,
-                         self.y - self.width])
+    @staticmethod
+    def _change_coordinates(x, y, z):
+        """Fix coordinates for the equations.
 
-    @property
-    def r_values(self):
-        """Compute the distance from the actual coil."""
-        return np.array([
-            np.sqrt((self.width + self.y) ** 2 + (self.height + self.x) ** 2 + self.z ** 2),
-            np.sqrt((self.width + self.y) ** 2 + (self.height - self.x) ** 2 + self.z ** 2),
-            np.sqrt((self.width - self.y) ** 2 + (self.height - self.x) ** 2 + self.z ** 2),
-            np.sqrt((self.width - self.y) ** 2 + (self.height + self.x) ** 2 + self.z ** 2)]
-        )
+         The equations taken from the paper have axes pointing differently compared to the experimental_setup."""
+        return np.array([-z, x, -y])
+
+    def b_field_batch(self, points):
+        """Compute the magnetic field for an (N, 3) array of positions in cartesian coordinates.
+
+        The coil instance is only read, such that the field can be evaluated from several threads at once.
+
+        Parameters
+        ----------
+        points: ndarray
+            Array of shape (N, 3) containing the (x, y, z) positions.
+
+        Returns
+        -------
+        out: ndarray
+            Array of shape (N, 3) containing the magnetic field vectors.
+        """
+        x, y, z = np.atleast_2d(np.asarray(points, dtype=float)).T
+
+        x, y, z = self._change_coordinates(self._rectify_x_position(x), y, z)
+
+        sums = rectangular_coil_sums(x, y, z, self.width, self.height)
+        field = self.prefactor * adjust_field(sums)
+
+        # Remove numerical singularities, and the points overlapping with the windings
+        invalid = ~np.all(np.isfinite(field), axis=0) | self.check_physical_coil_overlap(x, y)
+        field[:, invalid] = 0
+
+        return factor_T_to_G * self._change_coordinates(*field).T
+
+    def b_field(self, r: '(x, y, z)'):
+        """Compute the magnetic field.
+
+        Returns
+        -------
+        magnetic field in cartesian coordinates
+        """
+        return self.b_field_batch([r])[0]
+
+    def evaluation_cost(self, points):
+        """Estimate the relative cost of computing the field at each of the points, i.e. the four corner terms."""
+        return np.full(len(points), 4.)
+
+
+def rectangular_coil_sums(x, y, z, width, height):
+    """Compute the sums over the four corners of a rectangular coil, for arrays of positions.
+
+    The positions are given in the coordinates of the coil. The terms which are singular at a position, e.g. on the
+    extension of a coil edge, are set to 0 for that position.
+
+    Parameters
+    ----------
+    x: ndarray
+        Positions along the coil height.
+    y: ndarray
+        Positions along the coil width.
+    z: ndarray
+        Positions perpendicular to the coil plane.
+    width: float
+        Half width of the coil.
+    height: float
+        Half height of the coil.
+
+    Returns
+    -------
+    out: ndarray
+        Array of shape (3, N) containing the sums for the x, y and z directions.
+    """
+    c = np.array([height + x, height - x, -height + x, -height - x])
+    d = np.array([y + width, y + width, y - width, y - width])
+    r_values = np.sqrt(d ** 2 + c ** 2 + z ** 2)
+
+    # (-1) ** alpha and (-1) ** (alpha + 1) for alpha = 1, ..., 4
+    sign = np.array([-1., 1., -1., 1.])[:, np.newaxis]
+
+    with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+        t1 = sign * d / (r_values * (r_values - sign * c))
+        t2 = c / (r_values * (r_values + d))
+        t_x = - sign * z / (r_values * (r_values + d))
+        t_y = - sign * z / (r_values * (r_values - sign * c))
+
+    sums = list()
+    for terms in (t_x, t_y, t1 - t2):
+        sums.append(np.where(np.isfinite(terms), terms, 0.).sum(axis=0))
+
+    return np.array(sums)
@@ -0,0 +1,179 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of MIEZE simulation.
+# Copyright (C) 2019, 2020 TUM FRM2 E21 Research Group.
+#
+# This is free software; you can redistribute it and/or modify it
+# under the terms of the MIT License; see LICENSE file for more details.
+
+"""Lookup tables for the magnetic field of axisymmetric elements.
+
+The field of an axisymmetric element only depends on the axial position relative to the element and on the distance
+rho to the beam axis. It is therefore tabulated once on a uniform (x, rho) grid and interpolated with bicubic
+(Catmull-Rom) interpolation. The table is stored per unit current and in coordinates relative to the element, such
+that it can be reused for any grid and any element with the same geometry.
+"""
+
+import logging
+import numpy as np
+
+# Create a custom logger
+logger = logging.getLogger(__name__)
+
+
+def _cubic_weights(t):
+    """Return the Catmull-Rom weights of the four stencil points for the fractional positions t."""
+    t2 = t * t
+    t3 = t2 * t
+    return np.array(((-t3 + 2 * t2 - t) / 2,
+                     (3 * t3 - 5 * t2 + 2) / 2,
+                     (-3 * t3 + 4 * t2 + t) / 2,
+                     (t3 - t2) / 2))
+
+
+class AxisymmetricFieldTable:
+    """Class that implements a (x, rho) lookup table of an axisymmetric magnetic field."""
+
+    def __init__(self, x_min, x_max, rho_max, b_x, b_rho):
+        """Store the tabulated field.
+
+        Parameters
+        ----------
+        x_min: float
+            Lower edge of the tabulated domain, relative to the element position.
+        x_max: float
+            Upper edge of the tabulated domain, relative to the element position.
+        rho_max: float
+            Largest tabulated distance to the beam axis.
+        b_x: ndarray
+            Axial field per unit current, of shape (nx + 2, nrho + 1). The grid includes one additional cell
+            beyond each edge in x and beyond rho_max, such that the cubic stencil is complete everywhere.
+        b_rho: ndarray
+            Radial field per unit current, of the same shape as b_x.
+        """
+        self.x_min = x_min
+        self.x_max = x_max
+        self.rho_max = rho_max
+
+        self.values = np.stack((b_x, b_rho), axis=-1)
+
+        number_x, number_rho = b_x.shape
+        self.x_step = (x_max - x_min) / (number_x - 3)
+        self.rho_step = rho_max / (number_rho - 2)
+
+    @staticmethod
+    def grid(x_min, x_max, rho_max, number_x, number_rho):
+        """Return the (x, rho) grid for a table with the given number of points inside the domain."""
+        x_step = (x_max - x_min) / (number_x - 1)
+        rho_step = rho_max / (number_rho - 1)
+        x_values = x_min + x_step * np.arange(-1, number_x + 1)
+        rho_values = rho_step * np.arange(number_rho + 1)
+        return np.meshgrid(x_values, rho_values, indexing='ij')
+
+    @classmethod
+    def build(cls, field_function, x_min, x_max, rho_max, tolerance=1e-6, initial_points=(9, 5), max_points=2 ** 20):
+        """Build a table, refining it until the interpolation error is below the tolerance.
+
+        At each refinement step the number of cells is doubled in both directions. The interpolation error of the
+        coarse table is estimated at the new points of the fine table, relative to the maximal field value.
+
+        Parameters
+        ----------
+        field_function: callable
+            Function returning the axial and radial field per unit current for arrays of relative x and rho.
+        x_min: float
+            Lower edge of the tabulated domain, relative to the element position.
+        x_max: float
+            Upper edge of the tabulated domain, relative to the element position.
+        rho_max: float
+            Largest tabulated distance to the beam axis.
+        tolerance: float, optional
+            Relative interpolation error target.
+            Defaults to 1e-6.
+        initial_points: tuple, optional
+            Number of points in x and rho of the coarsest table.
+            Defaults to (9, 5).
+        max_points: int, optional
+            Maximal number of table points. The refinement stops there even if the tolerance is not reached.
+            Defaults to 2 ** 20.
+
+        Returns
+        -------
+        out: AxisymmetricFieldTable
+        """
+        number_x, number_rho = initial_points
+
+        table = cls._evaluate(field_function, x_min, x_max, rho_max, number_x, number_rho)
+
+        while True:
+            number_x, number_rho = 2 * number_x - 1, 2 * number_rho - 1
+            if number_x * number_rho > max_points:
+                logger.warning(f'Field table stopped refining at {table.values.shape[:2]} points before reaching '
+                               f'the tolerance {tolerance}.')
+                return table
+
+            fine_table = cls._evaluate(field_function, x_min, x_max, rho_max, number_x, number_rho)
+
+            x, rho = cls.grid(x_min, x_max, rho_max, number_x, number_rho)
+            x, rho = x[1:-1, :-1].ravel(), rho[1:-1, :-1].ravel()
+
+            b_x, b_rho = table.interpolate(x, rho)
+            reference = fine_table.values[1:-1, :-1].reshape(-1, 2)
+
+            scale = np.max(np.abs(reference))
+            error = np.max(np.abs(np.column_stack((b_x, b_rho)) - reference)) / scale if scale else 0.
+
+            table = fine_table
+            if error < tolerance:
+                return table
+
+    @classmethod
+    def _evaluate(cls, field_function, x_min, x_max, rho_max, number_x, number_rho):
+        """Evaluate the field on the table grid."""
+        x, rho = cls.grid(x_min, x_max, rho_max, number_x, number_rho)
+        b_x, b_rho = field_function(x.ravel(), rho.ravel())
+        return cls(x_min, x_max, rho_max, b_x.reshape(x.shape), b_rho.reshape(x.shape))
+
+    def contains(self, x, rho):
+        """Return a mask of the points within the tabulated domain."""
+        return (x >= self.x_min) & (x <= self.x_max) & (rho <= self.rho_max)
+
+    def interpolate(self, x, rho):
+        """Interpolate the field per unit current at points within the tabulated domain.
+
+        Parameters
+        ----------
+        x: ndarray
+            Positions on the x axis, relative to the element position.
+        rho: ndarray
+            Distances to the beam axis.
+
+        Returns
+        -------
+        out: tuple of ndarray
+            The axial and radial field per unit current.
+        """
+        number_x, number_rho = self.values.shape[:2]
+
+        position_x = (x - self.x_min) / self.x_step + 1
+        index_x = np.clip(np.floor(position_x).astype(int), 1, number_x - 3)
+        weights_x = _cubic_weights(position_x - index_x)
+
+        position_rho = rho / self.rho_step
+        index_rho = np.clip(np.floor(position_rho).astype(int), 0, number_rho - 3)
+        weights_rho = _cubic_weights(position_rho - index_rho)
+
+        result = np.zeros(x.shape + (2,))
+        for a in range(4):
+            rows = index_x + a - 1
+            for b in range(4):
+                columns = index_rho + b - 1
+
+                # The field at negative rho follows from the symmetry, with the radial component changing sign
+                mirrored = columns < 0
+                values = self.values[rows, np.abs(columns)]
+                values[mirrored, 1] *= -1
+
+                result += (weights_x[a] * weights_rho[b])[:, np.newaxis] * values
+
+        return result[:, 0], result[:, 1]
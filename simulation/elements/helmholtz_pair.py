@@ -10,8 +10,11 @@
 
 from experiments.mieze.parameters import HelmholtzSpinFlipper_position_HSF1
 
+from numpy import asarray, column_stack, zeros_like
+
+from simulation.elements import coil_templates
 from simulation.elements.base import BasicElement
-from simulation.elements.coils import Coil
+from simulation.elements.coils import Coil, EVALUATION_KEYWORDS
 
 
 class HelmholtzPair(BasicElement):
@@ -19,6 +22,7 @@ class HelmholtzPair(BasicElement):
 
     adjustment_factor = 1
     class_name = 'HelmholtzPair'
+    mirror_parities = {'y': (1, -1, 1), 'z': (1, 1, -1)}
 
     def __init__(self, position=(HelmholtzSpinFlipper_position_HSF1, 0, 0), **kwargs):
         """Inherit init from base class and define additional parameters."""
@@ -29,23 +33,52 @@ class HelmholtzPair(BasicElement):
         width = kwargs.get('width',  0.01)  # width of each coil
         windings = kwargs.get('windings', 33)
         radius = kwargs.get('radius', 0.055)  # Positions.R_HSF # Radius of each coil
-        current = kwargs.get('current', 1.6)
+        self.current = kwargs.get('current', 1.6)
+
+        # Options on how to evaluate the field, passed on to each coil
+        coil_options = {key: value for key, value in kwargs.items() if key in EVALUATION_KEYWORDS}
 
         pos1 = (self.position_x - radius / 2.0, 0, 0)
         pos2 = (self.position_x + radius / 2.0, 0, 0)
 
-        self.coil1 = self.coil_type(name='HSF1', current=current, length=width, position=pos1, r_eff=radius,
-                                    windings=windings, wire_d=0)
+        self.coil1 = self.coil_type(name='HSF1', current=self.current, length=width, position=pos1, r_eff=radius,
+                                    windings=windings, wire_d=0, **coil_options)
 
-        self.coil2 = self.coil_type(name='HSF2', current=current, length=width, position=pos2, r_eff=radius,
-                                    windings=windings, wire_d=0)
+        self.coil2 = self.coil_type(name='HSF2', current=self.current, length=width, position=pos2, r_eff=radius,
+                                    windings=windings, wire_d=0, **coil_options)
 
     def meta_data(self):
         """Return object metadata."""
         return {"position": self.position_x, "coil_type": self.coil_type.name}
 
+    def change_current(self, current):
+        """Change the current of both coils."""
+        self.current = current
+        self.coil1.change_current(current)
+        self.coil2.change_current(current)
+
     def b_field(self, r: '(x, y, z)'):
         """Compute the magnetic field given the position."""
         b1 = self.coil1.b_field(r)
         b2 = self.coil2.b_field(r)
         return (b1 + b2) * self.adjustment_factor
+
+    def b_field_batch(self, points):
+        """Compute the magnetic field for an (N, 3) array of positions.
+
+        Both coils have the same geometry, so they are evaluated once through their geometry template.
+        """
+        return coil_templates.b_field_batch([self.coil1, self.coil2], points) * self.adjustment_factor
+
+    def b_field_on_axis(self, x_positions):
+        """Compute the magnetic field along the beam axis, i.e. for y = z = 0."""
+        x_positions = asarray(x_positions, dtype=float).ravel()
+        return self.b_field_batch(column_stack((x_positions, zeros_like(x_positions), zeros_like(x_positions))))
+
+    def evaluation_cost(self, points):
+        """Estimate the relative cost of computing the field at each of the points, summed over the coils."""
+        return sum(element.evaluation_cost(points) for element in (self.coil1, self.coil2))
+
+    def build_field_table(self, x_start, x_end, rho_max, tolerance=1e-6):
+        """Tabulate the field of both coils on an (x, rho) grid, with one table shared by the two coils."""
+        coil_templates.build_field_tables([self.coil1, self.coil2], x_start, x_end, rho_max, tolerance)
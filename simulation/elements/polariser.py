@@ -20,11 +20,38 @@ from utils.physics_constants import MU_0, factor_T_to_G
 # Create a custom logger
 logger = logging.getLogger(__name__)
 
+# Power law parameters of the least squares fit to the measured field, see analysises/polariser_adjustment
+FITTED_POWER = 2.383
+FITTED_AMPLITUDE = 4227.
+
+MODELS = ('dipole', 'fitted')
+
 
 class Polariser(BasicElement):
 
-    def __init__(self, position=(POLARISATOR, 0, 0), **kwargs):
+    # The absolute value of the field is even in y and z
+    mirror_parities = {'y': (1, 1, 1), 'z': (1, 1, 1)}
 
+    def __init__(self, position=(POLARISATOR, 0, 0), **kwargs):
+        """Create the polariser.
+
+        Parameters
+        ----------
+        position: float, tuple
+            The position of the polariser.
+        Keyword Arguments:
+            c: float
+                Shift of the field origin along x, from the right side of the polariser. Defaults to 0.05.
+            m: tuple
+                Magnetic dipole moment, in A m^2. Defaults to (0, 90, 0).
+            model: str
+                Either 'dipole' (default) for the ideal dipole, or 'fitted' for the power law fitted to the measured
+                field, pointing along the dipole moment.
+            power: float
+                Exponent of the fitted power law. Defaults to FITTED_POWER.
+            amplitude: float
+                Amplitude of the fitted power law. Defaults to FITTED_AMPLITUDE.
+        """
         super(Polariser, self).__init__(position, name='Polariser')
 
         self.position = position
@@ -35,47 +62,90 @@ class Polariser(BasicElement):
         # Pointing in the z upwards directions # Todo: check z or y
         self.m = kwargs.get('m', (0, 90, 0))
 
+        self.model = kwargs.get('model', 'dipole')
+        self.power = kwargs.get('power', FITTED_POWER)
+        self.amplitude = kwargs.get('amplitude', FITTED_AMPLITUDE)
+
+        if self.model not in MODELS:
+            raise ValueError(f'Unknown polariser model: {self.model}. Use one of {", ".join(MODELS)}.')
+
     def meta_data(self):
-        return {"position": self.position, "c": self.c, "m": self.m}
+        return {"position": self.position, "c": self.c, "m": self.m, "model": self.model, "power": self.power,
+                "amplitude": self.amplitude}
 
     def _rectify_x_position(self, x):
         """Take into account the position and the shift on the x axis.
 
         The shift is that the magnetic field is measured/computed starting from the right side of the polarise.r
         """
-        x -= self.position_x
-        x += self.c
-        return x
+        return x - self.position_x + self.c
 
     def b_field(self, r: '(x, y, z)'):
-        """Compute the magnetic field."""
+        """Compute the magnetic field.
+
+        For an array of x positions, the absolute value of the y component on the beam axis is returned instead.
+        """
         x, y, z = r
         if type(x) not in (int, float, np.float64):
-            b_field = list()
-            for item in x:
-                b_field.append(np.abs(self.b_field([item, 0, 0])[1]))
-            return np.asarray(b_field)
-        else:
-            x = self._rectify_x_position(x)
+            x = np.asarray(x, dtype=float).ravel()
+            return self.b_field_batch(np.column_stack((x, np.zeros_like(x), np.zeros_like(x))))[:, 1]
 
-            r_vec = np.array((x, y, z))
+        return self.b_field_batch([r])[0]
 
-            return self.b_field_theoretical(r_vec)
+    def b_field_batch(self, points):
+        """Compute the magnetic field for an (N, 3) array of positions, with the model of the polariser.
+
+        Parameters
+        ----------
+        points: ndarray
+            Array of shape (N, 3) containing the (x, y, z) positions.
+
+        Returns
+        -------
+        out: ndarray
+            Array of shape (N, 3) containing the absolute values of the magnetic field components.
+        """
+        r_vec = np.array(points, dtype=float, ndmin=2)
+        r_vec[:, 0] = self._rectify_x_position(r_vec[:, 0])
+
+        if self.model == 'fitted':
+            m_unit_vec = np.asarray(self.m, dtype=float) / np.linalg.norm(self.m)
+            with np.errstate(divide='ignore'):
+                magnitude = self.amplitude * np.power(np.linalg.norm(r_vec, axis=1), -self.power) * 1e-4
+            return np.abs(magnitude[:, np.newaxis] * m_unit_vec)
+
+        return self.b_field_theoretical(r_vec)
 
     def b_field_fitted(self, x_data, power, amplitude):
         """Compute the magnetic field as a power law, with parameters obtained from measured data."""
-        x = self._rectify_x_position(np.asarray(x_data))
+        x = self._rectify_x_position(np.asarray(x_data, dtype=float))
         return amplitude * np.power(x, -power) * 1e-4
 
     def b_field_theoretical(self, r_vec):
-        """Compute the magnetic field from the equations of a magnetic dipole."""
-        r = np.linalg.norm(r_vec)
-        r_unit_vec = r_vec / r
+        """Compute the magnetic field from the equations of a magnetic dipole.
+
+        Parameters
+        ----------
+        r_vec: ndarray
+            Position relative to the dipole, or an (N, 3) array of them.
+
+        Returns
+        -------
+        out: ndarray
+            The absolute values of the field components, of the shape of r_vec.
+        """
+        r_vec = np.asarray(r_vec, dtype=float)
+        r = np.linalg.norm(r_vec, axis=-1, keepdims=True)
+        m = np.asarray(self.m, dtype=float)
 
         prefactor = MU_0 / (4 * np.pi)
-        elem1 = 3 * r_unit_vec * np.asarray(self.m) * r_unit_vec
-        elem2 = np.asarray(self.m)
 
         # Modelled as an ideal dipole magnetic field (note: it is divergent at 0)
-        b = prefactor * (elem1 - elem2) / r**3
+        with np.errstate(divide='ignore', invalid='ignore'):
+            r_unit_vec = r_vec / r
+            b = prefactor * (3 * r_unit_vec * m * r_unit_vec - m) / r ** 3
         return np.abs(b * factor_T_to_G)
+
+    def evaluation_cost(self, points):
+        """Estimate the relative cost of computing the field at each of the points, one closed form term."""
+        return np.ones(len(points))
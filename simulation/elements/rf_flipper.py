@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of MIEZE simulation.
+# Copyright (C) 2019, 2020 TUM FRM2 E21 Research Group.
+#
+# This is free software; you can redistribute it and/or modify it
+# under the terms of the MIT License; see LICENSE file for more details.
+
+"""An implementation of the RF Spin Flipper."""
+
+import copy
+
+from experiments.mieze.parameters import SpinFlipper_position1
+
+from simulation.elements.spin_flipper import SpinFlipper
+from simulation.fields.rf import waveform_values
+
+
+class RFSpinFlipper(SpinFlipper):
+    """Class that implements a spin flipper driven by an RF current, on top of an optional static current."""
+
+    class_name = 'RFSpinFlipper'
+
+    def __init__(self, name='RFSpinFlipper', position=(SpinFlipper_position1, 0, 0), **kwargs):
+        """Simulate the RF spin flipper.
+
+        Parameters
+        ----------
+        Keyword Arguments:
+            rf_current: float
+                Amplitude of the RF current.
+            frequency: float
+                Frequency of the RF current, in Hz.
+            phase: float
+                Phase of the RF current at t = 0, in rad. Defaults to 0.
+            waveform: str
+                Shape of the RF current, one of simulation.fields.rf.WAVEFORMS. Defaults to 'sine'.
+            All keyword arguments of SpinFlipper, where current is the static current.
+        """
+        super(RFSpinFlipper, self).__init__(name=name, position=position, **kwargs)
+
+        self.rf_current = kwargs.get('rf_current', 0)
+        self.frequency = kwargs.get('frequency', 0)
+        self.phase = kwargs.get('phase', 0)
+        self.waveform = kwargs.get('waveform', 'sine')
+
+    def meta_data(self):
+        """Return meta data."""
+        return {"position": self.position_x, "coil_type": "RectangularCoil", "rf_current": self.rf_current,
+                "frequency": self.frequency, "phase": self.phase, "waveform": self.waveform}
+
+    def rf_amplitude_batch(self, points):
+        """Compute the field of the RF current amplitude for an (N, 3) array of positions."""
+        rf_coil = copy.copy(self)
+        rf_coil.change_current(self.rf_current)
+        return rf_coil.b_field_batch(points)
+
+    def rf_time_factor(self, times):
+        """Return the RF current at the times, relative to its amplitude."""
+        return waveform_values(self.waveform, self.frequency, self.phase, times)
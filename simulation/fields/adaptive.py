@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of MIEZE simulation.
+# Copyright (C) 2019, 2020 TUM FRM2 E21 Research Group.
+#
+# This is free software; you can redistribute it and/or modify it
+# under the terms of the MIT License; see LICENSE file for more details.
+
+"""Error driven, non-uniform sampling of the field along the beam axis.
+
+Starting from a coarse uniform sampling, every interval is checked at its midpoint: it is split if the field there
+differs from the linear interpolation of its ends by more than atol + rtol * |B|, or if the field direction turns by
+more than max_angle over the interval. All intervals to be split at one refinement level are evaluated at once, such
+that the field function is called with arrays. The sampling stays coarse where the field varies slowly, e.g. in the
+drift regions, and is dense near the windings and the polariser.
+"""
+
+import logging
+import numpy as np
+
+# Create a custom logger
+logger = logging.getLogger(__name__)
+
+
+def _angle(b_1, b_2):
+    """Return the angle between the field vectors of each row, zero for vanishing fields."""
+    norm = np.linalg.norm(b_1, axis=-1) * np.linalg.norm(b_2, axis=-1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        cosine = np.where(norm > 0, np.sum(b_1 * b_2, axis=-1) / norm, 1.)
+    return np.arccos(np.clip(cosine, -1., 1.))
+
+
+def adaptive_samples(field_function, x_start, x_end, rtol=1e-3, atol=1e-3, max_angle=0.05, initial_points=17,
+                     min_step=1e-5, max_points=100000):
+    """Sample the field along x, refining the intervals until the interpolation error is below the tolerance.
+
+    Parameters
+    ----------
+    field_function: callable
+        Function returning the field of shape (N, ..., 3) for an array of N positions along x. The trailing
+        dimensions may hold several lines, e.g. different (y, z), which are all checked.
+    x_start: float
+        First position.
+    x_end: float
+        Last position.
+    rtol: float, optional
+        Interpolation error target relative to the field magnitude.
+        Defaults to 1e-3.
+    atol: float, optional
+        Absolute interpolation error target, in G.
+        Defaults to 1e-3.
+    max_angle: float, optional
+        Largest change of the field direction over one interval, in rad.
+        Defaults to 0.05.
+    initial_points: int, optional
+        Number of points of the initial uniform sampling.
+        Defaults to 17.
+    min_step: float, optional
+        Intervals shorter than twice this step are not split.
+        Defaults to 1e-5.
+    max_points: int, optional
+        Maximal number of points. The refinement stops there even if the tolerance is not reached.
+        Defaults to 100000.
+
+    Returns
+    -------
+    out: tuple of ndarray
+        The sorted positions and the field there.
+    """
+    x = np.linspace(x_start, x_end, initial_points)
+    values = np.asarray(field_function(x), dtype=float)
+
+    # Intervals that still have to be checked, by the index of their left end
+    candidates = np.arange(len(x) - 1)
+
+    while len(candidates):
+        too_short = x[candidates + 1] - x[candidates] < 2 * min_step
+        candidates = candidates[~too_short]
+        if not len(candidates):
+            break
+
+        if len(x) + len(candidates) > max_points:
+            logger.warning(f'Adaptive sampling stopped at {len(x)} points before reaching the tolerance.')
+            break
+
+        midpoints = (x[candidates] + x[candidates + 1]) / 2
+        midpoint_values = np.asarray(field_function(midpoints), dtype=float)
+
+        interpolated = (values[candidates] + values[candidates + 1]) / 2
+        error = np.linalg.norm(midpoint_values - interpolated, axis=-1)
+        bound = atol + rtol * np.linalg.norm(midpoint_values, axis=-1)
+        turn = _angle(values[candidates], values[candidates + 1])
+
+        split = ((error > bound) | (turn > max_angle)).reshape(len(candidates), -1).any(axis=1)
+
+        # Insert the midpoints of the intervals that are split, and check both of their halves
+        x = np.concatenate((x, midpoints[split]))
+        values = np.concatenate((values, midpoint_values[split]))
+        order = np.argsort(x, kind='stable')
+        x, values = x[order], values[order]
+
+        position = np.empty(len(order), dtype=int)
+        position[order] = np.arange(len(order))
+        left_ends = position[candidates[split]]
+        candidates = np.sort(np.concatenate((left_ends, left_ends + 1)))
+
+    logger.info(f'Adaptive sampling of [{x_start}, {x_end}] with {len(x)} points.')
+    return x, values
@@ -0,0 +1,184 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of MIEZE simulation.
+# Copyright (C) 2019, 2020 TUM FRM2 E21 Research Group.
+#
+# This is free software; you can redistribute it and/or modify it
+# under the terms of the MIT License; see LICENSE file for more details.
+
+"""Magnetic field values on the grid points inside the beam envelope only.
+
+The neutrons start within the beam size around the beam axis and diverge at most by the angular distribution, so
+that they stay inside a cone. A SparseFieldGrid keeps the rectilinear axes of the full box, but stores the values
+of the supported grid points only, as one compact (M, 3) array. The grid indices of a position are mapped to the
+compact index through an integer array of the box shape, which is -1 outside of the support.
+"""
+
+import logging
+import numpy as np
+
+from simulation.beamline.beamline_properties import BEAM_PROPERTIES
+from simulation.fields.field_grid import FieldGrid
+
+# Create a custom logger
+logger = logging.getLogger(__name__)
+
+
+def beam_envelope(x_range, y_range, z_range, beamsize=None, angle=None, x_origin=None, margin=0.):
+    """Return the support of the grid points inside the cone reachable by the neutrons.
+
+    At the position x along the beam axis, the cone has the radius beamsize / 2 + |x - x_origin| tan(angle).
+
+    Parameters
+    ----------
+    x_range: ndarray
+        Grid positions along the beam axis.
+    y_range: ndarray
+        Grid positions along the y axis.
+    z_range: ndarray
+        Grid positions along the z axis.
+    beamsize: float, optional
+        Diameter of the beam at its origin.
+        Defaults to the beam size of BEAM_PROPERTIES.
+    angle: float, optional
+        Largest divergence of the neutrons from the beam axis, in rad.
+        Defaults to the angular distribution of BEAM_PROPERTIES.
+    x_origin: float, optional
+        Position of the beam origin along the beam axis.
+        Defaults to the first grid position.
+    margin: float, optional
+        Distance added to the radius of the cone.
+        Defaults to 0.
+
+    Returns
+    -------
+    out: ndarray
+        Boolean array of shape (nx, ny, nz), True for the grid points inside the envelope.
+    """
+    beamsize = BEAM_PROPERTIES['beamsize'] if beamsize is None else beamsize
+    angle = BEAM_PROPERTIES['angular_distribution'] if angle is None else angle
+
+    x_range, y_range, z_range = (np.atleast_1d(np.asarray(axis, dtype=float)) for axis in (x_range, y_range, z_range))
+    x_origin = x_range[0] if x_origin is None else x_origin
+
+    radius = beamsize / 2 + np.abs(x_range - x_origin) * np.tan(angle) + margin
+    distance = np.hypot(*np.meshgrid(y_range, z_range, indexing='ij'))
+
+    return distance[np.newaxis] <= radius[:, np.newaxis, np.newaxis]
+
+
+class SparseFieldGrid(FieldGrid):
+    """Class that implements a vector field on the supported points of a rectilinear (x, y, z) grid."""
+
+    def __init__(self, x_range, y_range, z_range, support, values=None):
+        """Store the grid axes, the support and the field values.
+
+        Parameters
+        ----------
+        x_range: ndarray
+            Grid positions along the beam axis.
+        y_range: ndarray
+            Grid positions along the y axis.
+        z_range: ndarray
+            Grid positions along the z axis.
+        support: ndarray
+            Boolean array of shape (nx, ny, nz), True for the grid points with a field value.
+        values: ndarray, optional
+            Field values of the supported points, of shape (M, 3), in the order of the points.
+            Defaults to zeros.
+        """
+        self.axes = tuple(np.atleast_1d(np.asarray(axis, dtype=float)) for axis in (x_range, y_range, z_range))
+        self._steps = tuple(self._uniform_step(axis) for axis in self.axes)
+
+        self.support = np.asarray(support, dtype=bool).reshape(self.shape)
+
+        self._compact_index = np.full(self.shape, -1)
+        self._compact_index[self.support] = np.arange(np.count_nonzero(self.support))
+
+        if values is None:
+            self.values = np.zeros((len(self), 3))
+        elif isinstance(values, np.memmap):
+            # Mapped values are kept in the file, instead of being copied to the memory
+            self.values = values.reshape(len(self), 3)
+        else:
+            self.values = np.ascontiguousarray(values, dtype=float).reshape(len(self), 3)
+
+    @property
+    def flat(self):
+        """Return the values as an (M, 3) array, in the order of the points."""
+        return self.values
+
+    def __len__(self):
+        return int(np.count_nonzero(self.support))
+
+    @property
+    def fill_fraction(self):
+        """Return the fraction of the grid points of the box that are supported."""
+        return len(self) / max(int(np.prod(self.shape)), 1)
+
+    def points(self):
+        """Return the (M, 3) array of the supported grid positions."""
+        indices = np.nonzero(self.support)
+        return np.column_stack([axis[index] for axis, index in zip(self.axes, indices)])
+
+    def copy(self):
+        """Return a copy of the grid, with its own values."""
+        return SparseFieldGrid(*self.axes, support=self.support, values=self.values.copy())
+
+    def _gather(self, compact_index):
+        """Return the values at the compact indices, NaN for the indices -1 of unsupported points."""
+        return np.where(compact_index[..., np.newaxis] >= 0, self.values[np.maximum(compact_index, 0)], np.nan)
+
+    def contains(self, position):
+        """Return whether the grid point closest to the position, or to each of an (N, 3) array, is supported."""
+        return self._compact_index[self.index(position)] >= 0
+
+    def value_at(self, position):
+        """Return the field value at the grid point closest to the position, or to each of an (N, 3) array.
+
+        The value is NaN for positions closest to a grid point outside of the support.
+        """
+        compact_index = self._compact_index[self.index(position)]
+        return self._gather(compact_index)
+
+    def dense(self):
+        """Return the field on the full box, with NaN values outside of the support."""
+        grid = FieldGrid(*self.axes, values=np.full(self.shape + (3,), np.nan))
+        grid.values[self.support] = self.values
+        return grid
+
+    def plane(self, component, plane_position):
+        """Return the values in the plane perpendicular to the axis, closest to the position, NaN outside the support.
+
+        Unlike for a FieldGrid, the plane is a copy.
+        """
+        axis = 'xyz'.index(component)
+        index = int(self._axis_index(axis, plane_position))
+        compact_index = self._compact_index[(slice(None),) * axis + (index,)]
+        return self._gather(compact_index)
+
+    def line(self, y=0., z=0.):
+        """Return the values along the beam axis at the grid point closest to (y, z), NaN outside the support."""
+        compact_index = self._compact_index[:, int(self._axis_index(1, y)), int(self._axis_index(2, z))]
+        return self._gather(compact_index)
+
+    @classmethod
+    def from_grid(cls, grid, support=None):
+        """Create a sparse grid from a FieldGrid.
+
+        Parameters
+        ----------
+        grid: FieldGrid
+            The grid.
+        support: ndarray, optional
+            Boolean array of the grid shape.
+            Defaults to the points with a value, i.e. not NaN.
+        """
+        if support is None:
+            support = ~np.isnan(grid.values).any(axis=-1)
+        return cls(*grid.axes, support=support, values=grid.values[support])
+
+    @classmethod
+    def from_dict(cls, data):
+        """Create a sparse grid supported on the points of the legacy dictionary mapping (x, y, z) tuples to values."""
+        return cls.from_grid(FieldGrid.from_dict(data))
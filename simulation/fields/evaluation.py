@@ -0,0 +1,222 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of MIEZE simulation.
+# Copyright (C) 2019, 2020 TUM FRM2 E21 Research Group.
+#
+# This is free software; you can redistribute it and/or modify it
+# under the terms of the MIT License; see LICENSE file for more details.
+
+"""Evaluation of the magnetic field of several elements on many points, serially or in parallel.
+
+In parallel, the points are split into slabs of contiguous points, and each (element, slab) pair is one work unit.
+The slabs are chosen with the cost model of the elements (evaluation_cost), such that all work units have a similar
+cost, and the most expensive units are submitted first. The workers write their results straight into one output
+array, which is shared memory for process pools.
+
+The field of each point only depends on that point, so that the results are bit-identical to the serial evaluation.
+
+Elements with mirror symmetries are evaluated in the fundamental domain of their reflections only, see
+simulation/fields/symmetry.py. With an influence index, each element is only evaluated inside its influence
+interval along the beam axis, and its field is zero elsewhere, see simulation/fields/influence.py.
+"""
+
+import logging
+import numpy as np
+
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from multiprocessing import shared_memory
+
+from simulation.fields.symmetry import element_reflections, expand_field, reduce_points
+
+# Create a custom logger
+logger = logging.getLogger(__name__)
+
+# Number of work units per worker, allowing the pool to balance the load
+_units_per_worker = 4
+
+# State of the process pool workers, set once by _initialize_worker
+_worker_state = dict()
+
+
+def _initialize_worker(elements, points, memory_name, shape):
+    """Store the elements, the points and the shared output array in the worker process."""
+    memory = shared_memory.SharedMemory(name=memory_name)
+    _worker_state['memory'] = memory
+    _worker_state['output'] = np.ndarray(shape, dtype=float, buffer=memory.buf)
+    _worker_state['elements'] = elements
+    _worker_state['points'] = points
+
+
+def _evaluate_unit_in_worker(unit):
+    """Evaluate one work unit in a process pool worker."""
+    element_index, start, stop = unit
+    _evaluate_unit(_worker_state['elements'], _worker_state['points'], _worker_state['output'],
+                   element_index, start, stop)
+
+
+def _evaluate_unit(elements, points, output, element_index, start, stop):
+    """Evaluate the field of one element on one slab of points."""
+    output[element_index, start:stop] = elements[element_index].b_field_batch(points[start:stop])
+
+
+def split_into_slabs(cost, number_of_slabs):
+    """Split the points into contiguous slabs of about the same total cost.
+
+    Parameters
+    ----------
+    cost: ndarray
+        Relative cost of each point.
+    number_of_slabs: int
+        Requested number of slabs.
+
+    Returns
+    -------
+    out: list of tuple
+        The (start, stop) indices of the slabs.
+    """
+    number_of_points = len(cost)
+    number_of_slabs = max(1, min(number_of_slabs, number_of_points))
+
+    cumulative_cost = np.cumsum(cost)
+    targets = cumulative_cost[-1] * np.arange(1, number_of_slabs) / number_of_slabs
+    boundaries = np.unique(np.concatenate(([0], np.searchsorted(cumulative_cost, targets) + 1, [number_of_points])))
+
+    return [(int(start), int(stop)) for start, stop in zip(boundaries[:-1], boundaries[1:]) if stop > start]
+
+
+def plan_work_units(elements, points, workers):
+    """Split the evaluation into (element, slab) work units of similar cost, the most expensive first.
+
+    Parameters
+    ----------
+    elements: list
+        The elements to be evaluated.
+    points: ndarray
+        Array of shape (N, 3) containing the (x, y, z) positions.
+    workers: int
+        Number of workers of the pool.
+
+    Returns
+    -------
+    out: list of tuple
+        The work units as (element index, start, stop), sorted by decreasing cost.
+    """
+    costs = [np.asarray(element.evaluation_cost(points), dtype=float) for element in elements]
+    target_cost = sum(cost.sum() for cost in costs) / (workers * _units_per_worker)
+
+    units = list()
+    for element_index, cost in enumerate(costs):
+        number_of_slabs = int(np.ceil(cost.sum() / target_cost)) if target_cost else 1
+        for start, stop in split_into_slabs(cost, number_of_slabs):
+            units.append((cost[start:stop].sum(), element_index, start, stop))
+
+    units.sort(key=lambda unit: -unit[0])
+    return [unit[1:] for unit in units]
+
+
+def evaluate_elements(elements, points, workers=None, pool='process', symmetry=True, influence=None, tolerances=None):
+    """Compute the magnetic field of each element on the points.
+
+    Parameters
+    ----------
+    elements: list
+        The elements to be evaluated.
+    points: ndarray
+        Array of shape (N, 3) containing the (x, y, z) positions.
+    workers: int, optional
+        Number of parallel workers. If None or 1, the elements are evaluated serially.
+        Defaults to None.
+    pool: str, optional
+        Either 'process' or 'thread'.
+        Defaults to 'process'.
+    symmetry: bool, optional
+        Flag indicating whether to evaluate the elements with mirror symmetries in their fundamental domain only.
+        Defaults to True.
+    influence: InfluenceIndex, optional
+        Index of the influence intervals, outside of which the field of an element is not evaluated but set to zero.
+        Defaults to None, evaluating all elements on all points.
+    tolerances: list, optional
+        Tolerance of the influence interval of each element, in G.
+        Defaults to the tolerance of the influence index.
+
+    Returns
+    -------
+    out: ndarray
+        Array of shape (number of elements, N, 3) containing the magnetic field of each element.
+    """
+    points = np.ascontiguousarray(np.atleast_2d(np.asarray(points, dtype=float)))
+
+    if influence is not None:
+        selections = influence.selections(elements, points, tolerances)
+        logger.info(f'Evaluating {sum(len(selection) for selection in selections)} of {len(elements) * len(points)} '
+                    f'(element, position) pairs inside the influence intervals.')
+
+        output = np.zeros((len(elements), len(points), 3))
+        for element_index, selection in enumerate(selections):
+            if len(selection):
+                output[element_index, selection] = evaluate_elements([elements[element_index]], points[selection],
+                                                                     workers, pool, symmetry)[0]
+        return output
+
+    if not symmetry:
+        return _evaluate_elements(elements, points, workers, pool)
+
+    # Group the elements by their reflections, each group sharing the points of its fundamental domain
+    reflections = [element_reflections(element) for element in elements]
+    groups = dict()
+    for element_index, element_reflection in enumerate(reflections):
+        groups.setdefault(tuple(sorted(element_reflection)), []).append(element_index)
+
+    output = np.empty((len(elements), len(points), 3))
+    for axes, element_indices in groups.items():
+        group_elements = [elements[element_index] for element_index in element_indices]
+        if not axes:
+            output[element_indices] = _evaluate_elements(group_elements, points, workers, pool)
+            continue
+
+        reduced_points, inverse, reflected = reduce_points(points, axes)
+        logger.info(f'Evaluating {len(group_elements)} elements with the reflections {", ".join(axes)} on '
+                    f'{len(reduced_points)} of {len(points)} positions.')
+
+        reduced_output = _evaluate_elements(group_elements, reduced_points, workers, pool)
+        for element_index, values in zip(element_indices, reduced_output):
+            output[element_index] = expand_field(values, inverse, reflected, reflections[element_index])
+
+    return output
+
+
+def _evaluate_elements(elements, points, workers, pool):
+    """Compute the magnetic field of each element on all points."""
+    points = np.ascontiguousarray(points)
+    shape = (len(elements), len(points), 3)
+
+    if not workers or workers == 1 or not elements:
+        output = np.empty(shape)
+        for element_index in range(len(elements)):
+            _evaluate_unit(elements, points, output, element_index, 0, len(points))
+        return output
+
+    units = plan_work_units(elements, points, workers)
+    logger.info(f'Evaluating {len(elements)} elements in {len(units)} work units with {workers} {pool} workers.')
+
+    if pool == 'thread':
+        output = np.empty(shape)
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(_evaluate_unit, elements, points, output, *unit) for unit in units]
+            for future in futures:
+                future.result()
+        return output
+
+    if pool != 'process':
+        raise ValueError(f'Unknown pool: {pool}. Use either "process" or "thread".')
+
+    memory = shared_memory.SharedMemory(create=True, size=max(1, int(np.prod(shape)) * 8))
+    try:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_initialize_worker,
+                                 initargs=(elements, points, memory.name, shape)) as executor:
+            for _ in executor.map(_evaluate_unit_in_worker, units):
+                pass
+        return np.ndarray(shape, dtype=float, buffer=memory.buf).copy()
+    finally:
+        memory.close()
+        memory.unlink()
@@ -0,0 +1,178 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of MIEZE simulation.
+# Copyright (C) 2019, 2020 TUM FRM2 E21 Research Group.
+#
+# This is free software; you can redistribute it and/or modify it
+# under the terms of the MIT License; see LICENSE file for more details.
+
+"""Persistent on-disk cache of the magnetic field of individual elements.
+
+Each entry is the field array of one element on one set of points. Its key is a stable hash of the element class,
+all its parameters (including nested elements such as the coils of a coil set) and the points, so that an entry
+can never be used for another configuration. The least recently used entries are removed once the cache exceeds its
+maximal size.
+"""
+
+import hashlib
+import json
+import logging
+import numpy as np
+import os
+
+from simulation.parameters_simulation import field_cache_directory, field_cache_max_size
+
+# Create a custom logger
+logger = logging.getLogger(__name__)
+
+# Increase whenever the computed field values change, to invalidate the existing cache entries
+CACHE_VERSION = 1
+
+
+def _canonical(value):
+    """Convert a value into a JSON serializable structure that only depends on its content."""
+    if isinstance(value, (str, bool, int)) or value is None:
+        return value
+    if isinstance(value, (float, np.floating)):
+        return repr(float(value))
+    if isinstance(value, np.integer):
+        return int(value)
+    if isinstance(value, np.ndarray):
+        return {'dtype': str(value.dtype), 'shape': value.shape,
+                'sha256': hashlib.sha256(np.ascontiguousarray(value).tobytes()).hexdigest()}
+    if isinstance(value, dict):
+        return {str(key): _canonical(item) for key, item in sorted(value.items(), key=lambda item: str(item[0]))}
+    if isinstance(value, (list, tuple)):
+        return [_canonical(item) for item in value]
+    if isinstance(value, type):
+        return f'{value.__module__}.{value.__qualname__}'
+    if hasattr(value, '__dict__'):
+        state = {key: item for key, item in vars(value).items() if not key.startswith('_')}
+        return {'class': _canonical(type(value)), 'state': _canonical(state)}
+    return repr(value)
+
+
+def element_state(element):
+    """Return a digest of the element class and all its parameters, which changes whenever its field changes.
+
+    Parameters
+    ----------
+    element: BasicElement
+        The element, with all its parameters including the current.
+
+    Returns
+    -------
+    out: str
+        Hexadecimal SHA-256 digest.
+    """
+    return hashlib.sha256(json.dumps(_canonical(element), sort_keys=True).encode()).hexdigest()
+
+
+def element_key(element, points, tolerance=None):
+    """Return the cache key of the field of the element on the points.
+
+    Parameters
+    ----------
+    element: BasicElement
+        The element, with all its parameters including the current.
+    points: ndarray
+        Array of shape (N, 3) containing the (x, y, z) positions.
+    tolerance: float, optional
+        Tolerance of the influence interval outside of which the field was skipped.
+        Defaults to None, for a field computed on all points.
+
+    Returns
+    -------
+    out: str
+        Hexadecimal SHA-256 digest.
+    """
+    description = {'version': CACHE_VERSION,
+                   'element': element_state(element),
+                   'points': _canonical(np.asarray(points, dtype=float))}
+    if tolerance is not None:
+        description['influence_tolerance'] = float(tolerance)
+    return hashlib.sha256(json.dumps(description, sort_keys=True).encode()).hexdigest()
+
+
+class FieldCache:
+    """Class that implements a size-bounded, least recently used cache of field arrays on disk."""
+
+    def __init__(self, directory=None, max_size=None):
+        """Open the cache, creating its directory if needed.
+
+        Parameters
+        ----------
+        directory: str, optional
+            Directory of the cache files.
+            Defaults to field_cache_directory of the simulation parameters.
+        max_size: int, optional
+            Maximal total size of the cache files in bytes.
+            Defaults to field_cache_max_size of the simulation parameters.
+        """
+        self.directory = os.path.expanduser(directory or field_cache_directory)
+        self.max_size = field_cache_max_size if max_size is None else max_size
+
+        os.makedirs(self.directory, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.directory, f'{key}.npy')
+
+    def get(self, key):
+        """Return the cached array for the key, or None if it is not cached."""
+        path = self._path(key)
+        try:
+            values = np.load(path)
+        except (FileNotFoundError, ValueError, OSError):
+            return None
+
+        # Mark the entry as recently used
+        os.utime(path)
+        return values
+
+    def put(self, key, values):
+        """Store the array for the key, then evict the least recently used entries beyond the maximal size."""
+        path = self._path(key)
+        temporary_path = f'{path}.{os.getpid()}.tmp'
+
+        with open(temporary_path, 'wb') as f:
+            np.save(f, np.asarray(values))
+        os.replace(temporary_path, path)
+
+        self.evict()
+
+    def entries(self):
+        """Return the cache files as (last use, size, path), the least recently used first."""
+        entries = list()
+        for name in os.listdir(self.directory):
+            if name.endswith('.npy'):
+                path = os.path.join(self.directory, name)
+                try:
+                    status = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                entries.append((status.st_mtime, status.st_size, path))
+        return sorted(entries)
+
+    def size(self):
+        """Return the total size of the cache files in bytes."""
+        return sum(size for _, size, _ in self.entries())
+
+    def evict(self):
+        """Remove the least recently used entries until the cache fits into its maximal size."""
+        entries = self.entries()
+        total_size = sum(size for _, size, _ in entries)
+
+        for _, size, path in entries:
+            if total_size <= self.max_size:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total_size -= size
+            logger.debug(f'Evicted {path} from the field cache.')
+
+    def clear(self):
+        """Remove all entries."""
+        for _, _, path in self.entries():
+            os.remove(path)
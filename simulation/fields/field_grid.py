@@ -0,0 +1,319 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of MIEZE simulation.
+# Copyright (C) 2019, 2020 TUM FRM2 E21 Research Group.
+#
+# This is free software; you can redistribute it and/or modify it
+# under the terms of the MIT License; see LICENSE file for more details.
+
+"""Magnetic field values on a rectilinear grid.
+
+The field is stored as one contiguous array of shape (nx, ny, nz, 3) together with the three axes. The points are
+ordered as by itertools.product(x_range, y_range, z_range), which is the order of the data files.
+
+Grids too large for the memory are kept in field files and memory-mapped. A field file starts with a small header
+holding the axes and metadata as JSON, followed by the values as little-endian doubles in the same order. Several
+processes can map one field file read-only. For a field restricted to a support, such as the beam envelope, the
+header is followed by the support packed to bits, and only the values of the supported points are stored.
+"""
+
+import json
+import logging
+import numpy as np
+import struct
+
+from utils.helper_functions import load_obj
+
+# Create a custom logger
+logger = logging.getLogger(__name__)
+
+_field_file_signature = b'MIEZEFLD'
+
+# The values start at a multiple of this offset in the field files
+_field_file_alignment = 64
+
+
+class FieldGrid:
+    """Class that implements a vector field on a rectilinear (x, y, z) grid."""
+
+    def __init__(self, x_range, y_range, z_range, values=None):
+        """Store the grid axes and the field values.
+
+        Parameters
+        ----------
+        x_range: ndarray
+            Grid positions along the beam axis.
+        y_range: ndarray
+            Grid positions along the y axis.
+        z_range: ndarray
+            Grid positions along the z axis.
+        values: ndarray, optional
+            Field values, of shape (nx, ny, nz, 3) or (nx * ny * nz, 3).
+            Defaults to zeros.
+        """
+        self.axes = tuple(np.atleast_1d(np.asarray(axis, dtype=float)) for axis in (x_range, y_range, z_range))
+
+        # Step of each uniform axis, used to find grid points with index arithmetic, or None for irregular axes
+        self._steps = tuple(self._uniform_step(axis) for axis in self.axes)
+
+        if values is None:
+            self.values = np.zeros(self.shape + (3,))
+        elif isinstance(values, np.memmap):
+            # Mapped values are kept in the file, instead of being copied to the memory
+            self.values = values.reshape(self.shape + (3,))
+        else:
+            self.values = np.ascontiguousarray(values, dtype=float).reshape(self.shape + (3,))
+
+    @property
+    def x_range(self):
+        """Grid positions along the beam axis."""
+        return self.axes[0]
+
+    @property
+    def y_range(self):
+        """Grid positions along the y axis."""
+        return self.axes[1]
+
+    @property
+    def z_range(self):
+        """Grid positions along the z axis."""
+        return self.axes[2]
+
+    @property
+    def shape(self):
+        """Return the number of grid points along each axis."""
+        return tuple(len(axis) for axis in self.axes)
+
+    @property
+    def flat(self):
+        """Return a view of the values as an (N, 3) array, in the order of the points."""
+        return self.values.reshape(-1, 3)
+
+    def __len__(self):
+        return int(np.prod(self.shape))
+
+    def points(self):
+        """Return the (N, 3) array of the grid positions."""
+        mesh = np.meshgrid(*self.axes, indexing='ij')
+        return np.column_stack([item.ravel() for item in mesh])
+
+    def columns(self):
+        """Return the x, y, z, Bx, By and Bz columns, as written to the data files."""
+        return tuple(self.points().T) + tuple(self.flat.T)
+
+    def flush(self):
+        """Write the changes of values mapped from a field file to the file."""
+        if isinstance(self.values, np.memmap):
+            self.values.flush()
+
+    def copy(self):
+        """Return a copy of the grid, with its own values."""
+        return FieldGrid(*self.axes, values=self.values.copy())
+
+    @staticmethod
+    def _uniform_step(axis):
+        """Return the step of a uniform axis, or None if the axis is irregular."""
+        if len(axis) < 2:
+            return None
+        step = axis[1] - axis[0]
+        return step if np.allclose(np.diff(axis), step) else None
+
+    def _axis_index(self, axis_number, value):
+        """Return the index of the grid position closest to the value along one axis."""
+        axis = self.axes[axis_number]
+        step = self._steps[axis_number]
+
+        if len(axis) == 1:
+            return np.zeros(np.shape(value), dtype=int)
+
+        if step is not None:
+            index = np.rint((np.asarray(value) - axis[0]) / step).astype(int)
+            return np.clip(index, 0, len(axis) - 1)
+
+        # Irregular axis
+        index = np.clip(np.searchsorted(axis, value), 1, len(axis) - 1)
+        return np.where(np.abs(value - axis[index - 1]) <= np.abs(value - axis[index]), index - 1, index)
+
+    def index(self, position):
+        """Return the indices of the grid point closest to the position.
+
+        Parameters
+        ----------
+        position: ndarray
+            A position (x, y, z), or an (N, 3) array of positions.
+
+        Returns
+        -------
+        out: tuple
+            The indices along x, y and z, as integers or arrays of integers.
+        """
+        position = np.asarray(position, dtype=float)
+        return tuple(self._axis_index(i, position[..., i]) for i in range(3))
+
+    def value_at(self, position):
+        """Return the field value at the grid point closest to the position, or to each of an (N, 3) array."""
+        return self.values[self.index(position)]
+
+    def plane(self, component, plane_position):
+        """Return a view of the values in the plane perpendicular to the axis, closest to the position.
+
+        Parameters
+        ----------
+        component: str
+            The axis perpendicular to the plane, either 'x', 'y' or 'z'.
+        plane_position: float
+            Position of the plane along the axis.
+        """
+        axis = 'xyz'.index(component)
+        index = int(self._axis_index(axis, plane_position))
+        return self.values[(slice(None),) * axis + (index,)]
+
+    def line(self, y=0., z=0.):
+        """Return a view of the values along the beam axis at the grid point closest to (y, z)."""
+        return self.values[:, int(self._axis_index(1, y)), int(self._axis_index(2, z))]
+
+    @classmethod
+    def from_dict(cls, data):
+        """Create a grid from the legacy dictionary mapping (x, y, z) tuples to field vectors.
+
+        Points missing in the dictionary are set to NaN.
+        """
+        positions = np.array(list(data.keys()), dtype=float).reshape(-1, 3)
+        values = np.array([np.asarray(value, dtype=float) * np.ones(3) for value in data.values()]).reshape(-1, 3)
+
+        axes = [np.unique(positions[:, i]) for i in range(3)]
+        grid = cls(*axes, values=np.full((len(axes[0]), len(axes[1]), len(axes[2]), 3), np.nan))
+
+        indices = tuple(np.searchsorted(axis, positions[:, i]) for i, axis in enumerate(axes))
+        grid.values[indices] = values
+
+        return grid
+
+    def to_dict(self):
+        """Return the legacy dictionary mapping (x, y, z) tuples to field vectors."""
+        return dict(zip(map(tuple, self.points()), self.flat.copy()))
+
+
+def as_field_grid(data):
+    """Return the data as FieldGrid, converting the legacy dictionaries keyed by (x, y, z) tuples.
+
+    Other fields providing value_at, such as a LazyFieldGrid, are returned unchanged.
+    """
+    if data is None or isinstance(data, FieldGrid) or hasattr(data, 'value_at'):
+        return data
+    return FieldGrid.from_dict(data)
+
+
+def load_field_grid(name):
+    """Load a field saved with save_obj, either as FieldGrid or as a legacy dictionary."""
+    return as_field_grid(load_obj(name))
+
+
+def _read_field_file_header(file_name):
+    """Return the header of a field file and the offset of the values."""
+    with open(file_name, 'rb') as file:
+        if file.read(len(_field_file_signature)) != _field_file_signature:
+            raise ValueError(f'{file_name} is not a field file.')
+        header_length, = struct.unpack('<Q', file.read(8))
+        header = json.loads(file.read(header_length).decode())
+
+    offset = len(_field_file_signature) + 8 + header_length
+    return header, offset
+
+
+def _packed_support_size(shape):
+    """Return the number of bytes of a support of the shape packed to bits, padded to the alignment."""
+    size = (int(np.prod(shape)) + 7) // 8
+    return size + (-size % _field_file_alignment)
+
+
+def create_field_file(file_name, x_range, y_range, z_range, metadata=None, support=None):
+    """Create a field file and return its grid, with the values mapped from the file and initialised to zeros.
+
+    Parameters
+    ----------
+    file_name: str
+        Path of the field file.
+    x_range: ndarray
+        Grid positions along the beam axis.
+    y_range: ndarray
+        Grid positions along the y axis.
+    z_range: ndarray
+        Grid positions along the z axis.
+    metadata: dict, optional
+        JSON serialisable metadata stored in the header.
+        Defaults to None.
+    support: ndarray, optional
+        Boolean array of shape (nx, ny, nz), True for the grid points with a field value.
+        Defaults to None, for values on all grid points.
+
+    Returns
+    -------
+    out: FieldGrid, SparseFieldGrid
+        The sparse grid if a support is given.
+    """
+    axes = [np.atleast_1d(np.asarray(axis, dtype=float)) for axis in (x_range, y_range, z_range)]
+    shape = tuple(len(axis) for axis in axes)
+    header = {'axes': [axis.tolist() for axis in axes], 'metadata': metadata or dict(), 'support': support is not None}
+
+    encoded_header = json.dumps(header).encode()
+    offset = len(_field_file_signature) + 8 + len(encoded_header)
+    encoded_header += b' ' * (-offset % _field_file_alignment)
+    offset += -offset % _field_file_alignment
+
+    with open(file_name, 'wb') as file:
+        file.write(_field_file_signature)
+        file.write(struct.pack('<Q', len(encoded_header)))
+        file.write(encoded_header)
+
+        number_of_points = int(np.prod(shape))
+        if support is not None:
+            support = np.asarray(support, dtype=bool).reshape(shape)
+            packed_support = np.packbits(support.ravel()).tobytes()
+            file.write(packed_support + bytes(_packed_support_size(shape) - len(packed_support)))
+            offset += _packed_support_size(shape)
+            number_of_points = int(np.count_nonzero(support))
+
+        # The values are allocated as zeros, sparsely where the file system allows
+        file.truncate(offset + number_of_points * 3 * 8)
+
+    return open_field_file(file_name, mode='r+')
+
+
+def open_field_file(file_name, mode='r'):
+    """Return the grid of a field file, with the values mapped from the file instead of being read.
+
+    Parameters
+    ----------
+    file_name: str
+        Path of the field file.
+    mode: str, optional
+        Access mode of the mapping, 'r' for read-only, 'r+' for writing to the file or 'c' for copy on write.
+        Defaults to 'r'.
+
+    Returns
+    -------
+    out: FieldGrid, SparseFieldGrid
+        The sparse grid if the file stores a support.
+    """
+    header, offset = _read_field_file_header(file_name)
+    shape = tuple(len(axis) for axis in header['axes'])
+
+    if not header.get('support'):
+        values = np.memmap(file_name, dtype='<f8', mode=mode, offset=offset, shape=shape + (3,))
+        return FieldGrid(*header['axes'], values=values)
+
+    # Imported here, since the sparse grid builds on this module
+    from simulation.fields.envelope import SparseFieldGrid
+
+    packed_support = np.fromfile(file_name, dtype=np.uint8, count=(int(np.prod(shape)) + 7) // 8, offset=offset)
+    support = np.unpackbits(packed_support, count=int(np.prod(shape))).astype(bool).reshape(shape)
+    values = np.memmap(file_name, dtype='<f8', mode=mode, offset=offset + _packed_support_size(shape),
+                       shape=(int(np.count_nonzero(support)), 3))
+    return SparseFieldGrid(*header['axes'], support=support, values=values)
+
+
+def field_file_metadata(file_name):
+    """Return the metadata stored in the header of a field file."""
+    header, _ = _read_field_file_header(file_name)
+    return header['metadata']
@@ -0,0 +1,149 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of MIEZE simulation.
+# Copyright (C) 2019, 2020 TUM FRM2 E21 Research Group.
+#
+# This is free software; you can redistribute it and/or modify it
+# under the terms of the MIT License; see LICENSE file for more details.
+
+"""Influence intervals of the elements along the beam axis, beyond which their field is negligible.
+
+The influence interval of an element is the range of x outside of which its field stays below a tolerance, found
+by probing the field on lines parallel to the beam axis at geometrically growing distances from the element. The
+field of the coils decays as that of a dipole, so that it is largest on the lines at a given distance along x.
+
+The points are sorted by x once, such that the points inside the interval of an element are one contiguous range
+found by bisection, and each element is only evaluated there. Given the tolerance per element, the error of the
+total field at any point stays below the sum of the tolerances of the elements. No correction is added for the
+skipped pairs, the tolerances are the error budget.
+"""
+
+import logging
+import numpy as np
+
+from simulation.fields.field_cache import element_state
+
+# Create a custom logger
+logger = logging.getLogger(__name__)
+
+
+def influence_interval(element, tolerance, lateral_extent=0., min_distance=1e-3, max_distance=100.,
+                       ratio=2 ** 0.25):
+    """Return the interval along x outside of which the field of the element is below the tolerance.
+
+    Parameters
+    ----------
+    element: BasicElement
+        The element.
+    tolerance: float
+        The field magnitude regarded as negligible, in G.
+    lateral_extent: float, optional
+        Largest distance of the points from the beam axis, covered by the probe lines.
+        Defaults to 0.
+    min_distance: float, optional
+        Smallest probed distance from the element along x.
+        Defaults to 1e-3.
+    max_distance: float, optional
+        Largest probed distance from the element along x. If the field is not negligible there, the interval is
+        unbounded.
+        Defaults to 100.
+    ratio: float, optional
+        Ratio of successive probed distances.
+        Defaults to 2 ** 0.25.
+
+    Returns
+    -------
+    out: tuple
+        The lower and upper end of the interval.
+    """
+    number_of_distances = int(np.ceil(np.log(max_distance / min_distance) / np.log(ratio))) + 1
+    distances = min_distance * ratio ** np.arange(number_of_distances)
+
+    # Probe lines on the axis, and at half and the full lateral extent in four directions
+    radii = np.unique([0., lateral_extent / 2, lateral_extent])
+    angles = np.arange(4) * np.pi / 2
+    lines = np.unique(np.array([(radius * np.cos(angle), radius * np.sin(angle)) for radius in radii
+                                for angle in angles]).round(12), axis=0)
+
+    interval = list()
+    for sign in (-1, 1):
+        x = element.position_x + sign * distances
+        points = np.column_stack((np.repeat(x, len(lines)), np.tile(lines, (len(x), 1))))
+        magnitude = np.linalg.norm(element.b_field_batch(points), axis=1).reshape(len(x), len(lines))
+
+        # Non finite values, e.g. at singularities, count as not negligible
+        significant = np.flatnonzero(~(magnitude < tolerance).all(axis=1))
+        if not len(significant):
+            reach = distances[0]
+        elif significant[-1] == len(distances) - 1:
+            reach = np.inf
+        else:
+            reach = distances[significant[-1] + 1]
+        interval.append(element.position_x + sign * reach)
+
+    return tuple(interval)
+
+
+class InfluenceIndex:
+    """Class that implements the influence intervals of the elements, and the points inside of them."""
+
+    def __init__(self, tolerance):
+        """Set the tolerance.
+
+        Parameters
+        ----------
+        tolerance: float
+            The field magnitude of a single element regarded as negligible, in G.
+        """
+        self.tolerance = tolerance
+
+        # Influence interval of each element, keyed by the element state and the lateral extent
+        self._intervals = dict()
+
+    def interval(self, element, lateral_extent=0., tolerance=None):
+        """Return the influence interval of the element, computing it only for new element states and tolerances.
+
+        The tolerance defaults to the one of the index.
+        """
+        tolerance = self.tolerance if tolerance is None else tolerance
+        key = (element_state(element), round(float(lateral_extent), 12), float(tolerance))
+        if key not in self._intervals:
+            self._intervals[key] = influence_interval(element, tolerance, lateral_extent=lateral_extent)
+            logger.info(f'Influence interval of {element.name} for {tolerance} G: '
+                        f'[{self._intervals[key][0]:.3f}, {self._intervals[key][1]:.3f}]')
+        return self._intervals[key]
+
+    def selections(self, elements, points, tolerances=None):
+        """Return for each element the indices of the points inside its influence interval, sorted along x.
+
+        Parameters
+        ----------
+        elements: list
+            The elements.
+        points: ndarray
+            Array of shape (N, 3) containing the (x, y, z) positions.
+        tolerances: list, optional
+            Tolerance of each element, in G.
+            Defaults to the tolerance of the index for all elements.
+
+        Returns
+        -------
+        out: list of ndarray
+            The indices of the points for each element.
+        """
+        points = np.atleast_2d(np.asarray(points, dtype=float))
+        order = np.argsort(points[:, 0], kind='stable')
+        sorted_x = points[order, 0]
+
+        if tolerances is None:
+            tolerances = [self.tolerance] * len(elements)
+
+        selections = list()
+        for element, tolerance in zip(elements, tolerances):
+            lateral_extent = np.max(np.hypot(points[:, 1] - element.position_y, points[:, 2] - element.position_z),
+                                    initial=0.)
+            x_min, x_max = self.interval(element, lateral_extent, tolerance)
+            start = np.searchsorted(sorted_x, x_min, side='left')
+            stop = np.searchsorted(sorted_x, x_max, side='right')
+            selections.append(order[start:stop])
+        return selections
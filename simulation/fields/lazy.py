@@ -0,0 +1,133 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of MIEZE simulation.
+# Copyright (C) 2019, 2020 TUM FRM2 E21 Research Group.
+#
+# This is free software; you can redistribute it and/or modify it
+# under the terms of the MIT License; see LICENSE file for more details.
+
+"""Field on an unbounded uniform grid, computed on demand in blocks of grid points.
+
+Instead of precomputing a bounding box, the grid is split into blocks of neighbouring grid points. A block is
+computed in one vectorized call the first time a position in it is looked up, and kept in a least recently used
+cache of bounded size. Memory and computation thus scale with the region the neutrons actually visit.
+"""
+
+import logging
+import numpy as np
+
+from collections import OrderedDict
+
+# Create a custom logger
+logger = logging.getLogger(__name__)
+
+
+class LazyFieldGrid:
+    """Class that implements a field on a uniform grid, evaluated block by block on first use."""
+
+    def __init__(self, field_function, steps, origin=(0., 0., 0.), block_shape=(16, 4, 4), max_size=2 ** 28):
+        """Set the grid and the block cache.
+
+        Parameters
+        ----------
+        field_function: callable
+            Function returning the field of shape (N, 3) for an (N, 3) array of positions.
+        steps: tuple
+            Grid steps along x, y and z.
+        origin: tuple, optional
+            A grid position.
+            Defaults to (0, 0, 0).
+        block_shape: tuple, optional
+            Number of grid points of one block along x, y and z.
+            Defaults to (16, 4, 4).
+        max_size: int, optional
+            Maximal size of the cached blocks in bytes.
+            Defaults to 2 ** 28.
+        """
+        self.field_function = field_function
+        self.steps = np.asarray(steps, dtype=float)
+        self.origin = np.asarray(origin, dtype=float)
+        self.block_shape = np.asarray(block_shape, dtype=int)
+
+        block_size = int(np.prod(self.block_shape)) * 3 * 8
+        self.max_blocks = max(1, max_size // block_size)
+
+        self._blocks = OrderedDict()
+
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        """Return the number of computed grid points held in the cache."""
+        return len(self._blocks) * int(np.prod(self.block_shape))
+
+    def index(self, position):
+        """Return the indices of the grid point closest to the position, or to each of an (N, 3) array."""
+        return np.rint((np.asarray(position, dtype=float) - self.origin) / self.steps).astype(int)
+
+    def _block_points(self, block):
+        """Return the (M, 3) positions of the grid points of the block, in C order of the block indices."""
+        first_index = np.asarray(block) * self.block_shape
+        axes = [self.origin[i] + self.steps[i] * (first_index[i] + np.arange(self.block_shape[i])) for i in range(3)]
+        mesh = np.meshgrid(*axes, indexing='ij')
+        return np.column_stack([item.ravel() for item in mesh])
+
+    def _compute_blocks(self, blocks):
+        """Compute the missing blocks in one call of the field function, evicting the least recently used ones."""
+        points = np.concatenate([self._block_points(block) for block in blocks])
+        logger.debug(f'Computing {len(blocks)} field blocks with {len(points)} positions.')
+
+        values = np.asarray(self.field_function(points), dtype=float)
+        values = values.reshape((len(blocks),) + tuple(self.block_shape) + (3,))
+
+        for block, block_values in zip(blocks, values):
+            self._blocks[block] = block_values
+        while len(self._blocks) > self.max_blocks:
+            self._blocks.popitem(last=False)
+
+    def value_at(self, position):
+        """Return the field at the grid point closest to the position, or to each of an (N, 3) array.
+
+        Parameters
+        ----------
+        position: ndarray
+            A position (x, y, z), or an (N, 3) array of positions.
+
+        Returns
+        -------
+        out: ndarray
+            The field of shape (3,), or (N, 3).
+        """
+        indices = np.atleast_2d(self.index(position))
+        block_indices = indices // self.block_shape
+        local_indices = indices - block_indices * self.block_shape
+
+        # Rows of the positions in each block
+        rows = OrderedDict()
+        for row, block in enumerate(tuple(int(i) for i in block) for block in block_indices):
+            rows.setdefault(block, []).append(row)
+
+        missing = [block for block in rows if block not in self._blocks]
+        self.misses += len(missing)
+        self.hits += len(rows) - len(missing)
+
+        values = np.empty((len(block_indices), 3))
+
+        def fill(block):
+            self._blocks.move_to_end(block)
+            block_rows = rows[block]
+            values[block_rows] = self._blocks[block][tuple(local_indices[block_rows].T)]
+
+        # The cached blocks are read first, as computing the missing ones may evict them
+        for block in rows:
+            if block in self._blocks:
+                fill(block)
+
+        # More missing blocks than the cache holds are computed in several batches
+        for start in range(0, len(missing), self.max_blocks):
+            batch = missing[start:start + self.max_blocks]
+            self._compute_blocks(batch)
+            for block in batch:
+                fill(block)
+
+        return values[0] if np.ndim(position) == 1 else values
@@ -0,0 +1,164 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of MIEZE simulation.
+# Copyright (C) 2019, 2020 TUM FRM2 E21 Research Group.
+#
+# This is free software; you can redistribute it and/or modify it
+# under the terms of the MIT License; see LICENSE file for more details.
+
+"""Periodic magnetic field tabulated at K phase samples over one period.
+
+With fixed RF frequencies the total field is periodic in time, with the common period of all frequencies. The field
+is evaluated at K equidistant times over one period, and any time is answered by periodic Lagrange interpolation in
+the phase. K is doubled until the interpolation error is below the tolerance, reusing the samples of the coarser
+table, or until the table reaches its maximal size.
+"""
+
+import logging
+import numpy as np
+
+from fractions import Fraction
+from math import gcd
+
+from simulation.fields.translation import lagrange_weights
+
+# Create a custom logger
+logger = logging.getLogger(__name__)
+
+
+def common_period(frequencies, max_denominator=10 ** 6):
+    """Return the common period of the frequencies, the inverse of their greatest common divisor.
+
+    Parameters
+    ----------
+    frequencies: list
+        Frequencies in Hz. Zero frequencies are ignored.
+    max_denominator: int, optional
+        Largest denominator of the rational approximation of the frequencies.
+        Defaults to 10 ** 6.
+
+    Returns
+    -------
+    out: float
+        The period in s.
+    """
+    fractions = [Fraction(abs(frequency)).limit_denominator(max_denominator) for frequency in frequencies]
+    fractions = [fraction for fraction in fractions if fraction]
+    if not fractions:
+        raise ValueError('A common period requires at least one non-zero frequency.')
+
+    numerator, denominator = fractions[0].numerator, fractions[0].denominator
+    for fraction in fractions[1:]:
+        numerator, denominator = (gcd(numerator * fraction.denominator, fraction.numerator * denominator),
+                                  denominator * fraction.denominator)
+
+    return float(Fraction(denominator, numerator))
+
+
+class RFPhaseTable:
+    """Class that implements a periodic field, tabulated over one period."""
+
+    def __init__(self, period, values, order=6):
+        """Store the samples.
+
+        Parameters
+        ----------
+        period: float
+            The period in s.
+        values: ndarray
+            Field at the times k * period / K for k = 0, ..., K - 1, of shape (K, N, 3).
+        order: int, optional
+            Number of interpolation nodes.
+            Defaults to 6.
+        """
+        self.period = period
+        self.values = values
+        self.order = order
+
+    @property
+    def number_of_samples(self):
+        """Return the number of phase samples K."""
+        return len(self.values)
+
+    @classmethod
+    def build(cls, field_function, period, tolerance=1e-6, initial_samples=8, max_size=2 ** 30, order=6):
+        """Build a table, doubling the number of samples until the interpolation error is below the tolerance.
+
+        The interpolation error of the coarse table is estimated at the new samples of the fine table, relative to
+        the largest variation of the field over the period.
+
+        Parameters
+        ----------
+        field_function: callable
+            Function returning the field of shape (T, N, 3) for an array of T times.
+        period: float
+            The period in s.
+        tolerance: float, optional
+            Relative interpolation error target.
+            Defaults to 1e-6.
+        initial_samples: int, optional
+            Number of samples of the coarsest table.
+            Defaults to 8.
+        max_size: int, optional
+            Maximal size of the table in bytes. The refinement stops there even if the tolerance is not reached.
+            Defaults to 2 ** 30.
+        order: int, optional
+            Number of interpolation nodes.
+            Defaults to 6.
+
+        Returns
+        -------
+        out: RFPhaseTable
+        """
+        number_of_samples = max(initial_samples, order)
+        table = cls(period, field_function(period * np.arange(number_of_samples) / number_of_samples), order)
+
+        while True:
+            if 2 * table.values.nbytes > max_size:
+                logger.warning(f'RF phase table stopped refining at {table.number_of_samples} samples before reaching '
+                               f'the tolerance {tolerance}.')
+                return table
+
+            # The new samples lie halfway between the present ones
+            new_times = period * (np.arange(number_of_samples) + 0.5) / number_of_samples
+            new_values = field_function(new_times)
+
+            interpolated = np.array([table.b_field(t) for t in new_times])
+            variation = np.concatenate((table.values, new_values))
+            scale = np.max(np.abs(variation - variation.mean(axis=0)))
+            error = np.max(np.abs(interpolated - new_values)) / scale if scale else 0.
+
+            values = np.empty((2 * number_of_samples,) + table.values.shape[1:])
+            values[0::2] = table.values
+            values[1::2] = new_values
+            number_of_samples *= 2
+
+            table = cls(period, values, order)
+            if error < tolerance:
+                logger.info(f'RF phase table with {number_of_samples} samples, estimated error {error:.3g}.')
+                return table
+
+    def b_field(self, t):
+        """Return the field at the time t, interpolated in the phase.
+
+        Parameters
+        ----------
+        t: float
+            Time in s.
+
+        Returns
+        -------
+        out: ndarray
+            Array of shape (N, 3).
+        """
+        position = (t % self.period) / self.period * self.number_of_samples
+
+        nearest_index = int(np.rint(position))
+        if abs(position - nearest_index) < 1e-9:
+            return self.values[nearest_index % self.number_of_samples].copy()
+
+        start = int(np.floor(position)) - self.order // 2 + 1
+        weights = lagrange_weights(position - start, self.order)
+        indices = np.arange(start, start + self.order) % self.number_of_samples
+
+        return np.einsum('k,kpc->pc', weights, self.values[indices])
@@ -0,0 +1,131 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of MIEZE simulation.
+# Copyright (C) 2019, 2020 TUM FRM2 E21 Research Group.
+#
+# This is free software; you can redistribute it and/or modify it
+# under the terms of the MIT License; see LICENSE file for more details.
+
+"""Time dependent (RF) magnetic field of the RF elements.
+
+Each RF element k contributes a spatial amplitude map A_k(r), the field at the RF current amplitude, times a periodic
+waveform f_k(t) = waveform(2 pi frequency t + phase). The RF field is B_rf(r, t) = sum_k A_k(r) f_k(t), such that the
+amplitude maps are computed once for a set of points, and every time sample only costs one weighted sum.
+
+An element is RF capable if it implements rf_amplitude_batch(points) and rf_time_factor(times), and has a frequency.
+"""
+
+import hashlib
+import logging
+import numpy as np
+
+from simulation.fields.field_cache import element_state
+
+# Create a custom logger
+logger = logging.getLogger(__name__)
+
+WAVEFORMS = {
+    'sine': np.sin,
+    'cosine': np.cos,
+    'square': lambda phase: np.where(np.sin(phase) < 0, -1., 1.),
+}
+
+
+def waveform_values(waveform, frequency, phase, times):
+    """Return the waveform of the given frequency (in Hz) and phase (in rad) at the times (in s).
+
+    Parameters
+    ----------
+    waveform: str
+        Name of the waveform, one of WAVEFORMS.
+    frequency: float
+        The frequency.
+    phase: float
+        The phase at t = 0.
+    times: float, ndarray
+        Time samples.
+
+    Returns
+    -------
+    out: ndarray
+        The waveform values, of the shape of the times.
+    """
+    try:
+        function = WAVEFORMS[waveform]
+    except KeyError:
+        raise ValueError(f'Unknown waveform: {waveform}. Use one of {", ".join(WAVEFORMS)}.')
+    return function(2 * np.pi * frequency * np.asarray(times, dtype=float) + phase)
+
+
+def rf_elements(elements):
+    """Return the RF capable elements."""
+    return [element for element in elements if hasattr(element, 'rf_amplitude_batch')]
+
+
+class RFField:
+    """Class that implements the RF field of a set of elements, keeping the amplitude maps of the last points."""
+
+    def __init__(self):
+        # Amplitude map of each element on each set of points, keyed by the element state and the points digest
+        self._amplitudes = dict()
+
+    @staticmethod
+    def _points_digest(points):
+        return hashlib.sha256(np.ascontiguousarray(points).tobytes()).hexdigest()
+
+    def amplitude_maps(self, elements, points):
+        """Return the amplitude maps of the RF elements on the points, computing only the missing ones.
+
+        Parameters
+        ----------
+        elements: list
+            The elements, of which only the RF capable ones contribute.
+        points: ndarray
+            Array of shape (N, 3) containing the (x, y, z) positions.
+
+        Returns
+        -------
+        out: ndarray
+            Array of shape (number of RF elements, N, 3).
+        """
+        points = np.atleast_2d(np.asarray(points, dtype=float))
+        digest = self._points_digest(points)
+
+        keys = [(element_state(element), digest) for element in rf_elements(elements)]
+        for element, key in zip(rf_elements(elements), keys):
+            if key not in self._amplitudes:
+                logger.info(f'Computing the RF amplitude map of {element.name} on {len(points)} positions.')
+                self._amplitudes[key] = element.rf_amplitude_batch(points)
+
+        # Only keep the maps of the present elements and points
+        self._amplitudes = {key: self._amplitudes[key] for key in keys}
+
+        return np.array([self._amplitudes[key] for key in keys]).reshape(-1, len(points), 3)
+
+    @staticmethod
+    def time_factors(elements, times):
+        """Return the waveforms of the RF elements at the times, of shape times.shape + (number of RF elements,)."""
+        times = np.asarray(times, dtype=float)
+        factors = [element.rf_time_factor(times) for element in rf_elements(elements)]
+        if not factors:
+            return np.zeros(times.shape + (0,))
+        return np.stack(factors, axis=-1)
+
+    def b_field(self, elements, points, times):
+        """Compute the RF field of the elements at the points, for one or several times.
+
+        Parameters
+        ----------
+        elements: list
+            The elements, of which only the RF capable ones contribute.
+        points: ndarray
+            Array of shape (N, 3) containing the (x, y, z) positions.
+        times: float, ndarray
+            Time, or array of shape (T,) of times.
+
+        Returns
+        -------
+        out: ndarray
+            The RF field of shape (N, 3), or (T, N, 3) for an array of times.
+        """
+        return np.einsum('kpc,...k->...pc', self.amplitude_maps(elements, points), self.time_factors(elements, times))
@@ -0,0 +1,120 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of MIEZE simulation.
+# Copyright (C) 2019, 2020 TUM FRM2 E21 Research Group.
+#
+# This is free software; you can redistribute it and/or modify it
+# under the terms of the MIT License; see LICENSE file for more details.
+
+"""Mirror symmetries of the element fields with respect to the planes y = 0 and z = 0.
+
+Elements declare in mirror_parities how their field transforms under the reflection of one coordinate, as the signs
+P of the components in B(x, -y, z) = P * B(x, y, z). The axisymmetric coils have the parities (1, -1, 1) for y and
+(1, 1, -1) for z, the rectangular coils (-1, 1, -1) and (-1, 1, 1). A reflection only applies to elements centred on
+the beam axis and not tilted by angle_y or angle_z.
+
+The field of such an element is computed in the fundamental domain only, i.e. for the distinct points with the
+reflected coordinates replaced by their absolute values, and filled in by reflection with the sign flips. Since the
+grids usually cover both signs of y and z, this cuts the number of evaluations by up to four.
+"""
+
+import logging
+import numpy as np
+
+# Create a custom logger
+logger = logging.getLogger(__name__)
+
+# Coordinates closer than this distance (in m) are considered the same, such that the grid values of both signs meet
+_position_resolution = 1e-12
+
+_axes = {'y': 1, 'z': 2}
+
+
+def element_reflections(element):
+    """Return the parities of the reflections that are symmetries of the element field.
+
+    Parameters
+    ----------
+    element: BasicElement
+        The element.
+
+    Returns
+    -------
+    out: dict
+        Mapping from the reflected coordinate, 'y' or 'z', to the signs of the field components.
+    """
+    if getattr(element, 'position_y', 0) or getattr(element, 'position_z', 0):
+        return dict()
+    # The rotation of a tilted element mixes the field components
+    if getattr(element, 'angle_y', 0) or getattr(element, 'angle_z', 0):
+        return dict()
+    return {axis: np.asarray(parity, dtype=float) for axis, parity in getattr(element, 'mirror_parities', {}).items()}
+
+
+def symmetry_group(elements):
+    """Return the reflections that are symmetries of the total field of the elements, with their parities."""
+    reflections = [element_reflections(element) for element in elements]
+    if not reflections:
+        return dict()
+
+    group = dict()
+    for axis, parity in reflections[0].items():
+        if all(axis in other and np.array_equal(other[axis], parity) for other in reflections[1:]):
+            group[axis] = parity
+    return group
+
+
+def reduce_points(points, axes):
+    """Map the points into the fundamental domain of the reflections, keeping the distinct points only.
+
+    Parameters
+    ----------
+    points: ndarray
+        Array of shape (N, 3) containing the (x, y, z) positions.
+    axes: iterable
+        The reflected coordinates, 'y' and/or 'z'.
+
+    Returns
+    -------
+    out: tuple
+        The distinct points of the fundamental domain, the index of each point among them, and for each reflected
+        coordinate the mask of the points with a negative coordinate.
+    """
+    reduced_points = np.array(points, dtype=float)
+
+    # Only the reflected coordinates are rounded, such that the values of both signs coincide
+    reflected = dict()
+    for axis in axes:
+        column = _axes[axis]
+        quantised = np.round(reduced_points[:, column] / _position_resolution)
+        reflected[axis] = quantised < 0
+        reduced_points[:, column] = np.abs(quantised) * _position_resolution
+
+    unique_points, inverse = np.unique(reduced_points, axis=0, return_inverse=True)
+
+    return unique_points, inverse.ravel(), reflected
+
+
+def expand_field(values, inverse, reflected, parities):
+    """Fill in the field of all points from the field in the fundamental domain.
+
+    Parameters
+    ----------
+    values: ndarray
+        The field at the distinct points of the fundamental domain, of shape (M, 3).
+    inverse: ndarray
+        The index of each point among the distinct points.
+    reflected: dict
+        For each reflected coordinate the mask of the points with a negative coordinate.
+    parities: dict
+        For each reflected coordinate the signs of the field components.
+
+    Returns
+    -------
+    out: ndarray
+        The field of shape (N, 3).
+    """
+    field = values[inverse]
+    for axis, mask in reflected.items():
+        field[mask] *= parities[axis]
+    return field
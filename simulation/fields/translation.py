@@ -0,0 +1,120 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of MIEZE simulation.
+# Copyright (C) 2019, 2020 TUM FRM2 E21 Research Group.
+#
+# This is free software; you can redistribute it and/or modify it
+# under the terms of the MIT License; see LICENSE file for more details.
+
+"""Field of an element moved along the beam axis, obtained from one evaluation on an extended grid.
+
+Moving an element by an offset d along x only translates its field: B_moved(x, y, z) = B(x - d, y, z). On a grid
+with a uniform x axis, the field is evaluated once on the grid extended by the range of the offsets. Offsets that are
+multiples of the step are then a shift of the x index, and other offsets are interpolated along x with Lagrange
+polynomials, whose error is estimated from the difference to the interpolation of lower order.
+"""
+
+import logging
+import numpy as np
+
+from simulation.fields.field_grid import FieldGrid
+
+# Create a custom logger
+logger = logging.getLogger(__name__)
+
+# Offsets closer than this fraction of the step to a multiple of the step are exact index shifts
+_shift_resolution = 1e-9
+
+
+def lagrange_weights(t, number_of_nodes):
+    """Return the weights of the Lagrange interpolation at t between the nodes 0, 1, ..., number_of_nodes - 1."""
+    nodes = np.arange(number_of_nodes)
+    weights = np.ones(number_of_nodes)
+    for j in nodes:
+        for m in nodes:
+            if m != j:
+                weights[j] *= (t - m) / (j - m)
+    return weights
+
+
+class TranslatedField:
+    """Class that implements the field of one element for any position along the beam axis within a range."""
+
+    def __init__(self, grid, b_field_batch, offset_min, offset_max, order=6):
+        """Evaluate the field on the grid extended by the range of the offsets.
+
+        Parameters
+        ----------
+        grid: FieldGrid
+            The grid the translated field is computed for. Its x axis has to be uniform.
+        b_field_batch: callable
+            Function computing the field of the element at its present position for an (N, 3) array of positions.
+        offset_min: float
+            Smallest offset along x with respect to the present position.
+        offset_max: float
+            Largest offset along x with respect to the present position.
+        order: int, optional
+            Number of interpolation nodes for offsets that are not multiples of the step. Has to be even.
+            Defaults to 6.
+        """
+        if grid._steps[0] is None:
+            raise ValueError('The shift reuse requires a uniform grid along the beam axis.')
+        if order < 4 or order % 2:
+            raise ValueError(f'The interpolation order has to be even and at least 4, not {order}.')
+
+        self.x_range, self.y_range, self.z_range = grid.axes
+        self.step = grid._steps[0]
+        self.offset_min = offset_min
+        self.offset_max = offset_max
+        self.order = order
+
+        # Index range of the extended grid relative to the first grid point, including the interpolation nodes
+        margin = order // 2
+        self.first_index = int(np.floor(-offset_max / self.step)) - margin
+        last_index = len(self.x_range) - 1 + int(np.ceil(-offset_min / self.step)) + margin
+
+        extended_x_range = self.x_range[0] + self.step * np.arange(self.first_index, last_index + 1)
+        self.extended_grid = FieldGrid(extended_x_range, self.y_range, self.z_range)
+
+        logger.info(f'Evaluating the translated field on {len(self.extended_grid)} positions.')
+        self.extended_grid.flat[:] = b_field_batch(self.extended_grid.points())
+
+    def field(self, offset):
+        """Return the field of the element moved by the offset, on the grid.
+
+        Parameters
+        ----------
+        offset: float
+            Offset along x with respect to the position the field was evaluated for.
+
+        Returns
+        -------
+        out: tuple
+            The field values of shape (nx, ny, nz, 3), and the estimated maximal absolute interpolation error, which
+            is zero for offsets that are multiples of the step.
+        """
+        if not self.offset_min - _shift_resolution * self.step <= offset <= self.offset_max + \
+                _shift_resolution * self.step:
+            raise ValueError(f'The offset {offset} is outside of the prepared range '
+                             f'[{self.offset_min}, {self.offset_max}].')
+
+        # B_moved(x_i) = B(x_i - offset), at the fractional index i - offset / step of the extended grid
+        position = -offset / self.step - self.first_index
+        number_of_points = len(self.x_range)
+        values = self.extended_grid.values
+
+        nearest_index = int(np.rint(position))
+        if abs(position - nearest_index) < _shift_resolution:
+            return values[nearest_index:nearest_index + number_of_points].copy(), 0.
+
+        interpolated = dict()
+        for number_of_nodes in (self.order, self.order - 2):
+            start = int(np.floor(position)) - number_of_nodes // 2 + 1
+            weights = lagrange_weights(position - start, number_of_nodes)
+            interpolated[number_of_nodes] = sum(weight * values[start + j:start + j + number_of_points]
+                                                for j, weight in enumerate(weights))
+
+        error = float(np.max(np.abs(interpolated[self.order] - interpolated[self.order - 2])))
+        logger.info(f'Interpolated the field moved by {offset} m, estimated error {error:.3g} G.')
+
+        return interpolated[self.order], error
@@ -1,4 +1,5 @@
 import numpy as np
+import os
 
 from simulation.beamline.beamline_properties import neutron_speed
 
@@ -15,3 +16,7 @@ default_beam_grid = {'x_start': startpoint, 'x_end': beamend, 'x_step': step_x,
                      'y_start': -0.0, 'y_end': 0.0, 'z_start': -0.0, 'z_end': 0.0, 'yz_step': 0.1}
 
 total_simulation_time = beamend / neutron_speed
+
+# Persistent cache of the magnetic field of the elements, see simulation/fields/field_cache.py
+field_cache_directory = os.environ.get('MIEZE_FIELD_CACHE', os.path.join('~', '.cache', 'mieze-simulation', 'fields'))
+field_cache_max_size = 2 * 1024 ** 3  # [bytes]
@@ -19,8 +19,12 @@ from utils.helper_functions import read_data_from_file, find_list_length_of_diff
 
 class Plotter:
 
-    def __init__(self, filename='../../data/data_magnetic_field.csv'):
-        self.x_range, self.y_range, self.z_range, self.bx, self.by, self.bz = read_data_from_file(filename)
+    def __init__(self, filename='../../data/data_magnetic_field.csv', field_grid=None):
+        """Read the magnetic field from the data file, or take it from the given FieldGrid."""
+        if field_grid is not None:
+            self.x_range, self.y_range, self.z_range, self.bx, self.by, self.bz = field_grid.columns()
+        else:
+            self.x_range, self.y_range, self.z_range, self.bx, self.by, self.bz = read_data_from_file(filename)
         # self.preadjust_values()
 
     def preadjust_values(self):
@@ -11,6 +11,7 @@
 import numpy as np
 
 from simulation.beamline.beam import NeutronBeam
+from simulation.fields.field_cache import FieldCache
 from analysises.adiabatic_polarisation.scripts.adiabacity_parameter_plot import compute_polarisation
 from analysises.neutron_polarisation_simulation.scripts.plotting_scripts import plot_polarisation_vector, \
     plot_polatisation_absolute_value
@@ -25,7 +26,8 @@ def simulate(experiment_class, experiment_parameters):
     # Initialize an object from the MIEZE class
     experiment = experiment_class(spin_flipper_distance=experiment_parameters["spin_flipper_distance"],
                                   coil_set_distance=experiment_parameters["coil_set_distance"],
-                                  save_individual_data_sets=False)
+                                  save_individual_data_sets=False,
+                                  field_cache=FieldCache())
 
     # Create the components of the beamline with their parameters
     experiment.create_setup()
@@ -34,6 +36,10 @@ def simulate(experiment_class, experiment_parameters):
     experiment.initialize_computational_space(**default_beam_grid)
     experiment.calculate_static_b_field()
 
+    # With RF elements, tabulate the field over one RF period, such that each time step is an interpolation
+    if experiment.rf_elements():
+        experiment.prepare_rf_phase_table()
+
     # Initialize the neutron beam
     simulation = NeutronBeam(beamsize=BEAM_PROPERTIES['beamsize'],
                              speed=BEAM_PROPERTIES['neutron_speed'],
@@ -48,13 +54,15 @@ def simulate(experiment_class, experiment_parameters):
 
     for time_increment in np.linspace(0, total_simulation_time, num=1):
         positions = list(absolute_x_position)
+
+        # Compute varying magnetic field
+        experiment.calculate_varying_magnetic_field(time_increment)
+
         for position_x in absolute_x_position:
 
             # Show progress
             print(f'Computing for position: {position_x}')
 
-            # Compute varying magnetic field
-            experiment.calculate_varying_magnetic_field(time_increment)
             simulation.load_magnetic_field(b_map=experiment.b)
 
             # Create neutrons at each time step for the neutron beam
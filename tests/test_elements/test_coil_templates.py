@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of MIEZE simulation.
+# Copyright (C) 2019, 2020 TUM FRM2 E21 Research Group.
+#
+# This is free software; you can redistribute it and/or modify it
+# under the terms of the MIT License; see LICENSE file for more details.
+
+"""Numerical tests for the codebase."""
+
+from numpy import array, linspace, zeros
+from numpy.testing import assert_allclose
+from unittest import TestCase
+
+from simulation.elements import coil_templates
+from simulation.elements.coil_set import CoilSet
+from simulation.elements.coils import RealCoil
+
+
+class TestCoilTemplates(TestCase):
+
+    def setUp(self) -> None:
+        coil_templates.clear_templates()
+        self.coil_set = CoilSet(name='CoilSet', position=0.3, coil_type=RealCoil, quadrature_order=4)
+        self.points = array([[x, 0.01, -0.005] for x in linspace(0, 0.6, 31)])
+
+    def test_matches_individual_coils(self):
+        """Test that the template evaluation matches the sum of the individually evaluated coils."""
+        reference_values = zeros(self.points.shape)
+        for element in self.coil_set.elements:
+            reference_values += element.b_field_batch(self.points)
+
+        # Evaluate
+        test_values = self.coil_set.b_field_batch(self.points)
+
+        # Assert
+        assert_allclose(test_values, reference_values, rtol=1e-10, atol=1e-12)
+
+    def test_one_template_per_geometry(self):
+        """Test that the inner and outer coil pairs each share one template."""
+        self.coil_set.b_field_batch(self.points)
+
+        # Assert
+        self.assertEqual(len(coil_templates._templates), 2)
+
+    def test_current_scan_reuses_results(self):
+        """Test that changing the current scales the cached unit-current field."""
+        reference_values = self.coil_set.b_field_batch(self.points)
+
+        for element in self.coil_set.elements:
+            element.change_current(2 * element.current)
+
+        # Evaluate
+        test_values = self.coil_set.b_field_batch(self.points)
+
+        # Assert
+        assert_allclose(test_values, 2 * reference_values, rtol=1e-12)
@@ -8,7 +8,10 @@
 
 """Numerical tests for the codebase."""
 
-from numpy import sqrt, pi
+import warnings
+
+from numpy import array, sqrt, pi
+from numpy.testing import assert_allclose
 from unittest import TestCase
 
 from simulation.elements.coils import Coil, RealCoil, RectangularCoil
@@ -78,6 +81,53 @@ class TestSimpleCoil(TestCase):
             self.assertEqual(test_value[1], 0)
             self.assertEqual(test_value[2], 0)
 
+    def test_batch_matches_scalar_components(self):
+        """Test the batch evaluation against the scalar field components."""
+        points = array([[0, 0, 0], [0.2, 0.3, 0], [-0.4, 0, 0.5], [1.5, 0.3, 0.4], [0.1, 2, 1]])
+
+        # Evaluate
+        test_values = self.coil.b_field_batch(points)
+
+        for point, test_value in zip(points, test_values):
+            x, y, z = point
+            rho = sqrt(y ** 2 + z ** 2)
+
+            b_x = self.coil.b_field_x(x, rho)
+            b_rho = self.coil.b_field_rho(x, rho)
+            reference_value = 1e4 * array([b_x,
+                                           b_rho * (y / rho if rho else 0),
+                                           b_rho * (z / rho if rho else 0)])
+
+            # Assert
+            assert_allclose(test_value, reference_value, rtol=1e-12, atol=1e-12)
+
+    def test_singular_point_on_winding(self):
+        """Test that a point on the winding gives 0 without changing the global warning filters."""
+        with warnings.catch_warnings():
+            warnings.simplefilter('error')
+
+            # Evaluate
+            b_x = self.coil.b_field_x(self.coil.length / 2, self.coil.r)
+
+        # Assert
+        self.assertEqual(b_x, 0)
+        self.assertNotIn('error', [item[0] for item in warnings.filters])
+
+    def test_close_to_winding(self):
+        """Test that the field stays finite and continuous next to the winding, without warnings."""
+        distances = array([1e-7, 1e-9, 1e-11, 1e-13])
+        points = array([[0.2, self.coil.r + sign * distance, 0] for sign in (-1, 1) for distance in distances])
+
+        with warnings.catch_warnings():
+            warnings.simplefilter('error')
+
+            # Evaluate
+            test_values = self.coil.b_field_batch(points).reshape(2, len(distances), 3)
+
+        # Assert
+        for side_values in test_values:
+            assert_allclose(side_values, side_values[[0]].repeat(len(distances), axis=0), rtol=1e-5)
+
 
 class TestRealCoil(TestCase):
 
@@ -111,3 +161,114 @@ class TestRealCoil(TestCase):
             assert abs(reference_value - test_value[0]) < numerical_error_acceptance
             self.assertEqual(test_value[1], 0)
             self.assertEqual(test_value[2], 0)
+
+    def test_quadrature_matches_winding_lattice(self):
+        """Test the Gauss-Legendre quadrature against a fine lattice of windings."""
+        parameters = dict(length=0.086, r_min=0.05, r_max=0.126, windings=168, wire_d=5e-3, wire_spacing=1e-3,
+                          current=5)
+        lattice_coil = RealCoil(name='TestCoil', position=(0, 0, 0), radial_layers=200, **parameters)
+        quadrature_coil = RealCoil(name='TestCoil', position=(0, 0, 0), quadrature_order=6, **parameters)
+
+        points = array([[x, 0.01, 0.02] for x in (-0.3, -0.1, 0, 0.05, 0.2)])
+
+        # Evaluate
+        reference_values = lattice_coil.b_field_batch(points)
+        test_values = quadrature_coil.b_field_batch(points)
+
+        # Assert
+        assert_allclose(test_values, reference_values, rtol=1e-4, atol=1e-4 * abs(reference_values).max())
+
+    def test_on_axis_matches_elliptic_kernel(self):
+        """Test the closed form on axis expression against the general elliptic kernel."""
+        coil = RealCoil(name='TestCoil', position=(0.1, 0, 0), length=0.086, r_min=0.05, r_max=0.126, windings=168,
+                        wire_d=5e-3, wire_spacing=1e-3, current=5)
+        x_positions = array([-0.3, -0.05, 0, 0.1, 0.13, 0.4])
+
+        # Evaluate
+        offsets, radii, lengths, prefactors = coil.shells()
+        reference_values = list()
+        for x in x_positions - coil.position_x:
+            sum_upper, _ = coil._sum_elements(0, x - offsets, 1, radii, lengths)
+            sum_lower, _ = coil._sum_elements(0, x - offsets, -1, radii, lengths)
+            reference_values.append(1e4 * sum(prefactors * (sum_upper - sum_lower)))
+
+        test_values = coil.b_field_on_axis(x_positions)
+
+        # Assert
+        assert_allclose(test_values[:, 0], reference_values, rtol=1e-12)
+        assert_allclose(coil.b_field_batch([[x, 0, 0] for x in x_positions]), test_values, rtol=0, atol=0)
+        self.assertEqual(abs(test_values[:, 1:]).max(), 0)
+
+    def test_paraxial_matches_exact_kernel(self):
+        """Test the paraxial expansion against the exact kernel close to the beam axis."""
+        parameters = dict(length=0.086, r_min=0.05, r_max=0.126, windings=168, wire_d=5e-3, wire_spacing=1e-3,
+                          current=5, quadrature_order=4)
+        exact_coil = RealCoil(name='TestCoil', position=(0, 0, 0), **parameters)
+        paraxial_coil = RealCoil(name='TestCoil', position=(0, 0, 0), field_evaluation='paraxial', **parameters)
+
+        points = array([[x, y, z] for x in (-0.2, -0.04, 0, 0.043, 0.1) for y in (-0.01, 0, 0.01) for z in (0, 0.01)])
+
+        # Evaluate
+        reference_values = exact_coil.b_field_batch(points)
+        test_values = paraxial_coil.b_field_batch(points)
+
+        # Assert
+        assert_allclose(test_values, reference_values, rtol=0, atol=1e-7 * abs(reference_values).max())
+
+    def test_fidelity_models(self):
+        """Test the solenoid and dipole models far from the winding pack against the full model."""
+        parameters = dict(length=0.05, r_min=0.06, r_max=0.08, radial_layers=5, windings=200, wire_d=2e-3,
+                          wire_spacing=5e-4, current=2)
+        full_coil = RealCoil(name='TestCoil', position=(0.5, 0, 0), **parameters)
+        fast_coil = RealCoil(name='TestCoil', position=(0.5, 0, 0), fidelity_tolerance=1e-4, **parameters)
+
+        solenoid_distance, dipole_distance = fast_coil.fidelity_distances()
+        points = array([[0.5 + distance * c, distance * s, 0.] for distance in (0.05, 0.3, 2, 6, 12)
+                        for c, s in ((1, 0), (0.6, 0.8), (0, 1))])
+
+        # Evaluate
+        reference_values = full_coil.b_field_batch(points)
+        test_values = fast_coil.b_field_batch(points)
+
+        # Assert
+        self.assertLess(solenoid_distance, dipole_distance)
+        self.assertLess(dipole_distance, 12)
+        relative_error = sqrt(((test_values - reference_values) ** 2).sum(axis=1) / (reference_values ** 2).sum(axis=1))
+        self.assertLess(relative_error.max(), 1e-4)
+        assert_allclose(test_values[:3], reference_values[:3], rtol=0, atol=0)
+
+
+class TestFieldTable(TestCase):
+
+    def setUp(self) -> None:
+        self.parameters = dict(length=0.05, r_eff=0.13, windings=48, wire_d=5e-3)
+        self.coil = Coil(name='TestCoil', position=(0.1, 0, 0), current=2, **self.parameters)
+
+    def test_table_matches_exact_kernel(self):
+        """Test the interpolated field against the exact kernel."""
+        tolerance = 1e-5
+        points = array([[x, y, z] for x in (-0.15, 0, 0.08, 0.1, 0.31) for y in (-0.02, 0, 0.013) for z in (0, 0.02)])
+
+        # Evaluate
+        reference_values = self.coil.b_field_batch(points)
+        self.coil.build_field_table(x_start=-0.2, x_end=0.4, rho_max=0.04, tolerance=tolerance)
+        test_values = self.coil.b_field_batch(points)
+
+        # Assert
+        assert_allclose(test_values, reference_values, rtol=0, atol=tolerance * abs(reference_values).max())
+
+    def test_table_reused_by_other_coil(self):
+        """Test that a table can be used by a coil with the same geometry, but another position and current."""
+        tolerance = 1e-5
+        table = self.coil.build_field_table(x_start=-0.2, x_end=0.4, rho_max=0.04, tolerance=tolerance)
+
+        other_coil = Coil(name='OtherCoil', position=(0.25, 0, 0), current=-3, **self.parameters)
+        points = array([[x, 0.01, -0.01] for x in (0.0, 0.2, 0.25, 0.3)])
+
+        # Evaluate
+        reference_values = other_coil.b_field_batch(points)
+        other_coil.use_field_table(table)
+        test_values = other_coil.b_field_batch(points)
+
+        # Assert
+        assert_allclose(test_values, reference_values, rtol=0, atol=tolerance * abs(reference_values).max())
@@ -8,7 +8,8 @@
 
 """Numerical tests for the codebase."""
 
-from numpy import array
+from numpy import array, column_stack, linspace, zeros
+from numpy.testing import assert_allclose, assert_array_equal
 from unittest import TestCase
 
 from simulation.elements.polariser import Polariser
@@ -35,3 +36,30 @@ class Test(TestCase):
             # Assert numerical value
             self.assertEqual(list(reference_value), list(b_field_value))
 
+    def test_batch(self):
+        """Test the vectorized dipole field against single positions, and that the positions are not modified."""
+        points = array([[0.1, 0., 0.], [0.3, 0.02, -0.01], [-0.2, 0.05, 0.03]])
+        positions = points.copy()
+
+        # Evaluate
+        b_field_values = self.polariser.b_field_batch(points)
+
+        # Assert
+        assert_array_equal(points, positions)
+        for position, b_field_value in zip(positions, b_field_values):
+            assert_allclose(b_field_value, self.polariser.b_field(tuple(position)), rtol=1e-12)
+        on_axis = column_stack((points[:, 0], zeros((len(points), 2))))
+        assert_array_equal(self.polariser.b_field((points[:, 0], 0, 0)), self.polariser.b_field_batch(on_axis)[:, 1])
+
+    def test_fitted_model(self):
+        """Test that the fitted model follows the fitted power law on the beam axis, along the dipole moment."""
+        polariser = Polariser(position=0, model='fitted', power=2.5, amplitude=4000.)
+        x = linspace(0.1, 2, 20)
+
+        # Evaluate
+        b_field_values = polariser.b_field_batch(column_stack((x, zeros(len(x)), zeros(len(x)))))
+
+        # Assert
+        assert_allclose(b_field_values[:, 1], polariser.b_field_fitted(x, power=2.5, amplitude=4000.), rtol=1e-12)
+        assert_array_equal(b_field_values[:, [0, 2]], 0.)
+        self.assertRaises(ValueError, Polariser, model='unknown')
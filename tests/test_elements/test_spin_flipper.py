@@ -8,6 +8,9 @@
 
 """Numerical tests for the codebase."""
 
+from concurrent.futures import ThreadPoolExecutor
+from numpy import array, concatenate, linspace
+from numpy.testing import assert_array_equal
 from unittest import TestCase
 
 from simulation.elements.spin_flipper import SpinFlipper
@@ -30,3 +33,25 @@ class Test(TestCase):
 
             # Assert numerical value
             self.assertEqual(reference_value, b_field_value[0])
+
+    def test_batch_matches_single_points(self):
+        """Test that the batch evaluation matches the evaluation point by point, including singular points."""
+        points = array([[x, y, 0.3] for x in linspace(-2, 2, 9) for y in (-1, 0, 0.5)])
+
+        # Evaluate
+        b_field_values = self.spin_flipper.b_field_batch(points)
+
+        # Assert
+        for point, b_field_value in zip(points, b_field_values):
+            assert_array_equal(self.spin_flipper.b_field(point), b_field_value)
+
+    def test_threaded_evaluation(self):
+        """Test that evaluating the same instance from several threads gives the serial result."""
+        chunks = [array([[x, 0.2, z] for x in linspace(-2, 2, 50)]) for z in linspace(-0.5, 0.5, 8)]
+
+        # Evaluate
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            b_field_values = list(executor.map(self.spin_flipper.b_field_batch, chunks))
+
+        # Assert
+        assert_array_equal(concatenate(b_field_values), self.spin_flipper.b_field_batch(concatenate(chunks)))
@@ -0,0 +1,147 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of MIEZE simulation.
+# Copyright (C) 2019, 2020 TUM FRM2 E21 Research Group.
+#
+# This is free software; you can redistribute it and/or modify it
+# under the terms of the MIT License; see LICENSE file for more details.
+
+"""Numerical tests for the codebase."""
+
+from numpy import array, stack
+from numpy.testing import assert_allclose, assert_array_equal
+from unittest import TestCase
+
+from experiments.experimental_setup.setup import Setup
+from simulation.elements.coil_set import CoilSet
+from simulation.elements.coils import RealCoil
+from simulation.elements.helmholtz_pair import HelmholtzPair
+from simulation.elements.polariser import Polariser
+from simulation.elements.spin_flipper import SpinFlipper
+
+
+class TestResponseMatrix(TestCase):
+
+    def setUp(self) -> None:
+        self.setup = Setup()
+        self.setup.create_element(HelmholtzPair, position=(0.1, 0, 0), current=1.6)
+        self.setup.create_element(CoilSet, name='CoilSet', position=0.6, current=3.)
+        self.setup.initialize_computational_space(x_start=0, x_end=0.8, x_step=0.1, y_start=0, y_end=0.01,
+                                                  z_start=0, z_end=0.01, yz_step=0.01)
+        self.setup.calculate_static_b_field()
+
+    def _direct_b_field(self):
+        """Evaluate the elements directly at the grid positions."""
+        points = self.setup.response_points
+        return sum(element.b_field_batch(points) for element in self.setup.elements)
+
+    def test_change_currents(self):
+        """Test the field from the response matrix against a direct evaluation for new currents."""
+        self.setup.change_currents({'CoilSet': -2.5})
+
+        # Evaluate
+        test_values = self.setup.b_static.flat
+
+        # Assert
+        assert_allclose(test_values, self._direct_b_field(), rtol=1e-10, atol=1e-12)
+
+    def test_batch_of_currents(self):
+        """Test that a batch of current vectors gives the field for each current vector."""
+        currents = array([[1.6, 3.], [0., 1.], [-2., 0.5]])
+
+        # Evaluate
+        test_values = self.setup.b_field_from_currents(currents)
+
+        reference_values = list()
+        for current_vector in currents:
+            self.setup.change_currents(current_vector)
+            reference_values.append(self._direct_b_field())
+
+        # Assert
+        assert_allclose(test_values, stack(reference_values), rtol=1e-10, atol=1e-12)
+
+
+class TestParallelEvaluation(TestCase):
+
+    @staticmethod
+    def _static_b_field(**kwargs):
+        """Compute the static field of a setup with all kinds of elements."""
+        setup = Setup(**kwargs)
+        setup.create_element(Polariser, position=(0, 0, 0))
+        setup.create_element(HelmholtzPair, position=(0.2, 0, 0), current=1.6)
+        setup.create_element(SpinFlipper, position=(0.5, 0, 0), current=1, windings=10, length=0.1, width=0.1,
+                             height=0.1, r_eff=1)
+        setup.create_element(CoilSet, name='CoilSet', position=1.0, current=3., coil_type=RealCoil)
+        setup.initialize_computational_space(x_start=0.1, x_end=1.5, x_step=0.05, y_start=-0.01, y_end=0.01,
+                                             z_start=0, z_end=0.01, yz_step=0.005)
+        setup.calculate_static_b_field()
+        return setup.b_static.values
+
+    def test_bit_identical_to_serial(self):
+        """Test that the thread and process pools give exactly the serial result."""
+        reference_values = self._static_b_field()
+
+        for pool in ('thread', 'process'):
+            # Evaluate
+            test_values = self._static_b_field(workers=3, pool=pool)
+
+            # Assert
+            assert_array_equal(test_values, reference_values)
+
+
+class TestIncrementalRecomputation(TestCase):
+
+    @staticmethod
+    def _setup(coil_set_position=1.0, polariser_c=0.05, x_step=0.05):
+        """Create a setup with current channels and elements independent of the currents."""
+        setup = Setup()
+        setup.create_element(Polariser, position=(0, 0, 0), c=polariser_c)
+        setup.create_element(HelmholtzPair, position=(0.2, 0, 0), current=1.6)
+        setup.create_element(CoilSet, name='CoilSet', position=coil_set_position, current=3.)
+        setup.initialize_computational_space(x_start=0.1, x_end=1.5, x_step=x_step, y_start=-0.01, y_end=0.01,
+                                             z_start=0, z_end=0.01, yz_step=0.005)
+        setup.calculate_static_b_field()
+        return setup
+
+    def test_only_changed_elements_are_computed(self):
+        """Test that moving one element keeps the field of the others, and gives the field of a new setup."""
+        setup = self._setup()
+        unchanged_b_fields = [setup._element_b_field(element) / getattr(element, 'current', 1.)
+                              for element in setup.elements[:2]]
+
+        # Evaluate
+        setup.replace_element('CoilSet', CoilSet, name='CoilSet', position=1.2, current=3.)
+        setup.calculate_static_b_field()
+
+        # Assert
+        for element, b_field in zip(setup.elements[:2], unchanged_b_fields):
+            assert_array_equal(setup._element_b_field(element) / getattr(element, 'current', 1.), b_field)
+        self.assertEqual(len(setup._element_fields), len(setup.elements))
+        assert_allclose(setup.b_static.values, self._setup(coil_set_position=1.2).b_static.values,
+                        rtol=1e-12, atol=1e-12)
+
+    def test_background_update(self):
+        """Test that changing an element independent of the currents updates the background field."""
+        setup = self._setup()
+
+        # Evaluate
+        setup.replace_element('Polariser', Polariser, position=(0, 0, 0), c=0.1)
+        setup.calculate_static_b_field()
+
+        # Assert
+        assert_allclose(setup.b_static.values, self._setup(polariser_c=0.1).b_static.values, rtol=1e-12, atol=1e-9)
+
+    def test_translated_element(self):
+        """Test that moving a prepared element takes its translated field, without evaluating it again."""
+        setup = self._setup(x_step=0.005)
+        setup.prepare_translation('CoilSet', offset_min=-0.1, offset_max=0.2)
+
+        for position in (1.1, 1.0123):
+            # Evaluate
+            setup.replace_element('CoilSet', CoilSet, name='CoilSet', position=position, current=3.)
+            setup.calculate_static_b_field()
+
+            # Assert
+            expected_values = self._setup(coil_set_position=position, x_step=0.005).b_static.values
+            assert_allclose(setup.b_static.values, expected_values, rtol=0,
+                            atol=max(1e-9, setup.translation_errors['CoilSet']))
@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of MIEZE simulation.
+# Copyright (C) 2019, 2020 TUM FRM2 E21 Research Group.
+#
+# This is free software; you can redistribute it and/or modify it
+# under the terms of the MIT License; see LICENSE file for more details.
+
+"""Numerical tests for the codebase."""
+
+from numpy import column_stack, diff, interp, linspace, zeros_like
+from numpy.linalg import norm
+from unittest import TestCase
+
+from experiments.experimental_setup.setup import Setup
+from simulation.beamline.beam import NeutronBeam
+from simulation.elements.coil_set import CoilSet
+from simulation.elements.helmholtz_pair import HelmholtzPair
+from simulation.fields.adaptive import adaptive_samples
+
+
+def peaked_field(x):
+    """Field with a narrow peak at 0.3 on a slowly varying background."""
+    return column_stack((1 / (1 + ((x - 0.3) / 0.005) ** 2), 0.1 + x, zeros_like(x)))
+
+
+class TestAdaptiveSampling(TestCase):
+
+    def test_interpolation_error(self):
+        """Test the linear interpolation error of the adaptive sampling, and its density near the peak."""
+        rtol, atol = 1e-3, 1e-4
+
+        # Evaluate
+        x, values = adaptive_samples(peaked_field, 0, 1, rtol=rtol, atol=atol)
+
+        dense_x = linspace(0, 1, 100001)
+        dense_values = peaked_field(dense_x)
+        interpolated = column_stack([interp(dense_x, x, values[:, i]) for i in range(3)])
+        error = norm(interpolated - dense_values, axis=1) / (atol + rtol * norm(dense_values, axis=1))
+
+        # Assert
+        self.assertLess(error.max(), 2.)
+        self.assertLess(diff(x).min() * 20, diff(x).max())
+        self.assertLess(len(x), 2000)
+
+    def test_setup_grid(self):
+        """Test the static field of a setup on the adaptive grid, and a beam consuming that grid."""
+        setup = Setup()
+        setup.create_element(HelmholtzPair, position=(0.2, 0, 0), current=1.6)
+        setup.create_element(CoilSet, name='CoilSet', position=0.6, current=3.)
+
+        # Evaluate
+        x_range = setup.adaptive_x_range(0, 0.8, rtol=1e-3)
+        setup.initialize_computational_space(x_range=x_range, y_start=0, y_end=0, z_start=0, z_end=0)
+        setup.calculate_static_b_field()
+
+        beam = NeutronBeam(beamsize=0.01, speed=1000, total_simulation_time=1e-3)
+        beam.initialize_computational_space(x_range=x_range, y_start=0, y_end=0, z_start=0, z_end=0)
+        beam.load_magnetic_field(b_map=setup.b_static)
+
+        # Assert
+        self.assertEqual(setup.b_static.shape, (len(x_range), 1, 1))
+        for index in (0, len(x_range) // 3, len(x_range) - 2):
+            self.assertAlmostEqual(beam._time_in_field(1000, x_range[index]),
+                                   (x_range[index + 1] - x_range[index]) / 1000)
+            self.assertEqual(beam.get_magnetic_field((x_range[index], 0, 0)).tolist(),
+                             setup.b_static.values[index, 0, 0].tolist())
@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of MIEZE simulation.
+# Copyright (C) 2019, 2020 TUM FRM2 E21 Research Group.
+#
+# This is free software; you can redistribute it and/or modify it
+# under the terms of the MIT License; see LICENSE file for more details.
+
+"""Numerical tests for the codebase."""
+
+from numpy import array, isnan, linspace, tan
+from numpy.testing import assert_array_equal
+from unittest import TestCase
+
+from experiments.experimental_setup.setup import Setup
+from simulation.elements.helmholtz_pair import HelmholtzPair
+from simulation.fields.envelope import SparseFieldGrid, beam_envelope
+
+
+class TestBeamEnvelope(TestCase):
+
+    def setUp(self) -> None:
+        self.grid_size = dict(x_start=0, x_end=0.4, x_step=0.05, y_start=-0.05, y_end=0.05, z_start=-0.05,
+                              z_end=0.05, yz_step=0.01)
+
+    def test_cone(self):
+        """Test that the envelope widens along the beam axis by the divergence angle."""
+        x_range, yz_range = linspace(0, 2, 5), linspace(-0.1, 0.1, 41)
+
+        # Evaluate
+        support = beam_envelope(x_range, yz_range, yz_range, beamsize=0.02, angle=0.02)
+
+        # Assert
+        middle = len(yz_range) // 2
+        for index, position_x in enumerate(x_range):
+            radius = 0.01 + position_x * tan(0.02)
+            half_width = support[index, :, middle].sum() // 2
+            self.assertLessEqual(half_width * 0.005, radius + 1e-12)
+            self.assertGreater((half_width + 1) * 0.005, radius)
+        assert_array_equal(support, support.transpose(0, 2, 1))
+
+    def test_setup_field(self):
+        """Test the static field restricted to the envelope against the field on the full box."""
+        setup = Setup()
+        setup.create_element(HelmholtzPair, position=(0.2, 0, 0), current=1.6)
+
+        setup.initialize_computational_space(**self.grid_size)
+        setup.calculate_static_b_field()
+        box = setup.b_static
+
+        # Evaluate
+        setup.initialize_computational_space(envelope=True, envelope_margin=0.005, **self.grid_size)
+        setup.calculate_static_b_field()
+        sparse_grid = setup.b_static
+
+        # Assert
+        self.assertIsInstance(sparse_grid, SparseFieldGrid)
+        self.assertLess(sparse_grid.fill_fraction, 0.2)
+        self.assertEqual(len(sparse_grid), len(sparse_grid.points()))
+        for position in ((0.2, 0, 0), (0.35, 0.01, -0.01), (0.05, 0, 0.01)):
+            self.assertTrue(sparse_grid.contains(position))
+            assert_array_equal(sparse_grid.value_at(position), box.value_at(position))
+        self.assertFalse(sparse_grid.contains((0.2, 0.05, 0.05)))
+        self.assertTrue(isnan(sparse_grid.value_at((0.2, 0.05, 0.05))).all())
+        assert_array_equal(sparse_grid.line(), box.line())
+
+    def test_legacy_dictionary(self):
+        """Test that a legacy dictionary with missing points is supported on its points only."""
+        positions = [(0., 0., 0.), (0.1, 0., 0.), (0.1, 0.1, 0.)]
+        data = {position: array(position) + 1 for position in positions}
+
+        # Evaluate
+        grid = SparseFieldGrid.from_dict(data)
+
+        # Assert
+        self.assertEqual(grid.shape, (2, 2, 1))
+        self.assertEqual(len(grid), 3)
+        assert_array_equal(grid.points(), array(positions))
+        assert_array_equal(grid.value_at((0.1, 0.1, 0.)), [1.1, 1.1, 1.])
+        self.assertTrue(isnan(grid.value_at((0., 0.1, 0.))).all())
@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of MIEZE simulation.
+# Copyright (C) 2019, 2020 TUM FRM2 E21 Research Group.
+#
+# This is free software; you can redistribute it and/or modify it
+# under the terms of the MIT License; see LICENSE file for more details.
+
+"""Numerical tests for the codebase."""
+
+import os
+import tempfile
+
+from numpy import arange, column_stack, zeros
+from numpy.testing import assert_array_equal
+from unittest import TestCase
+
+from experiments.experimental_setup.setup import Setup
+from simulation.elements.coil_set import CoilSet
+from simulation.elements.coils import RealCoil
+from simulation.elements.helmholtz_pair import HelmholtzPair
+from simulation.fields.field_cache import FieldCache, element_key
+
+
+class TestFieldCache(TestCase):
+
+    def setUp(self) -> None:
+        self.directory = tempfile.TemporaryDirectory()
+        self.cache = FieldCache(directory=self.directory.name)
+
+        self.points = column_stack((arange(0, 1, 0.1), zeros(10), zeros(10)))
+
+    def tearDown(self) -> None:
+        self.directory.cleanup()
+
+    @staticmethod
+    def _coil(length=0.05):
+        return RealCoil(name='coil', position=0.5, current=1., length=length, r_min=0.06, r_max=0.07,
+                        radial_layers=3, windings=100, wire_d=0.002, wire_spacing=0.002)
+
+    def test_element_key(self):
+        """Test that the key depends on the parameters, the current and the points only."""
+        coil = self._coil()
+        key = element_key(coil, self.points)
+
+        # Assert
+        self.assertEqual(element_key(self._coil(), self.points), key)
+        self.assertNotEqual(element_key(self._coil(length=0.06), self.points), key)
+        self.assertNotEqual(element_key(coil, self.points + 1e-9), key)
+
+        coil.change_current(2.)
+        self.assertNotEqual(element_key(coil, self.points), key)
+
+    def test_round_trip(self):
+        """Test that a stored array is returned unchanged."""
+        values = self.points * 3.7
+
+        # Evaluate
+        self.cache.put('key', values)
+
+        # Assert
+        assert_array_equal(self.cache.get('key'), values)
+        self.assertIsNone(self.cache.get('other key'))
+
+    def test_least_recently_used_eviction(self):
+        """Test that the least recently used entries are evicted once the cache is too large."""
+        values = zeros((100, 3))
+        for index, key in enumerate(('first', 'second', 'third')):
+            self.cache.put(key, values)
+            os.utime(self.cache._path(key), (index, index))
+
+        entry_size = self.cache.size() // 3
+        self.cache.max_size = 2 * entry_size
+
+        # Use the first entry, such that the second one is the least recently used
+        self.cache.get('first')
+        self.cache.put('fourth', values)
+
+        # Assert
+        self.assertIsNone(self.cache.get('second'))
+        self.assertIsNotNone(self.cache.get('first'))
+        self.assertIsNotNone(self.cache.get('fourth'))
+        self.assertLessEqual(self.cache.size(), self.cache.max_size)
+
+    def test_setup_uses_cache(self):
+        """Test that a setup with the cache computes the same field, and stores one entry per element."""
+        def static_b_field(field_cache):
+            setup = Setup(field_cache=field_cache)
+            setup.create_element(HelmholtzPair, position=(0.1, 0, 0), current=1.6)
+            setup.create_element(CoilSet, name='CoilSet', position=0.6, current=3.)
+            setup.initialize_computational_space(x_start=0, x_end=0.8, x_step=0.1, y_start=0, y_end=0.01,
+                                                 z_start=0, z_end=0.01, yz_step=0.01)
+            setup.calculate_static_b_field()
+            return setup.b_static.values
+
+        reference_values = static_b_field(field_cache=None)
+
+        # Evaluate
+        first_values = static_b_field(field_cache=self.cache)
+        number_of_entries = len(self.cache.entries())
+        second_values = static_b_field(field_cache=self.cache)
+
+        # Assert
+        self.assertEqual(number_of_entries, 2)
+        self.assertEqual(len(self.cache.entries()), number_of_entries)
+        assert_array_equal(first_values, reference_values)
+        assert_array_equal(second_values, reference_values)
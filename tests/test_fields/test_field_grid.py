@@ -0,0 +1,155 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of MIEZE simulation.
+# Copyright (C) 2019, 2020 TUM FRM2 E21 Research Group.
+#
+# This is free software; you can redistribute it and/or modify it
+# under the terms of the MIT License; see LICENSE file for more details.
+
+"""Numerical tests for the codebase."""
+
+import itertools
+import os
+import tempfile
+
+from numpy import arange, array, memmap, shares_memory
+from numpy.testing import assert_allclose, assert_array_equal
+from unittest import TestCase
+
+from experiments.experimental_setup.setup import Setup
+from simulation.elements.helmholtz_pair import HelmholtzPair
+from simulation.elements.rf_flipper import RFSpinFlipper
+from simulation.fields.envelope import SparseFieldGrid
+from simulation.fields.field_grid import FieldGrid, create_field_file, field_file_metadata, open_field_file
+
+
+class TestFieldGrid(TestCase):
+
+    def setUp(self) -> None:
+        self.x_range = arange(0, 1.05, 0.1)
+        self.y_range = arange(-0.02, 0.025, 0.01)
+        self.z_range = arange(0, 0.025, 0.01)
+
+        self.positions = list(itertools.product(self.x_range, self.y_range, self.z_range))
+        self.legacy_data = {position: array(position) * [1, 2, 3] for position in self.positions}
+
+        self.grid = FieldGrid.from_dict(self.legacy_data)
+
+    def test_points_order(self):
+        """Test that the grid points are ordered as the legacy data files."""
+        assert_array_equal(self.grid.points(), array(self.positions))
+        assert_array_equal(self.grid.flat, array(list(self.legacy_data.values())))
+
+    def test_legacy_dictionary_round_trip(self):
+        """Test the conversion from and to the legacy dictionary."""
+        data = self.grid.to_dict()
+
+        # Assert
+        self.assertEqual(list(data.keys()), self.positions)
+        for position, value in self.legacy_data.items():
+            assert_array_equal(data[position], value)
+
+    def test_nearest_value(self):
+        """Test the lookup of positions that differ from the grid points by rounding errors."""
+        for position, value in list(self.legacy_data.items())[::7]:
+            perturbed_position = array(position) + 1e-12
+
+            # Assert
+            assert_array_equal(self.grid.value_at(perturbed_position), value)
+
+    def test_plane_is_view(self):
+        """Test that planes are views of the grid values."""
+        plane = self.grid.plane('x', 0.3)
+
+        # Assert
+        self.assertEqual(plane.shape, (len(self.y_range), len(self.z_range), 3))
+        self.assertTrue(shares_memory(plane, self.grid.values))
+        assert_array_equal(plane, self.grid.values[3])
+
+
+class TestFieldFile(TestCase):
+
+    def setUp(self) -> None:
+        self.directory = tempfile.TemporaryDirectory()
+        self.file_name = os.path.join(self.directory.name, 'field.bin')
+
+    def tearDown(self) -> None:
+        self.directory.cleanup()
+
+    def test_round_trip(self):
+        """Test that the axes, metadata and values written to a field file are mapped back read-only."""
+        grid = create_field_file(self.file_name, arange(0, 1.05, 0.1), [-0.01, 0, 0.01], [0.], metadata={'a': 1})
+        grid.values[...] = arange(grid.values.size).reshape(grid.values.shape)
+        grid.flush()
+
+        # Evaluate
+        mapped_grid = open_field_file(self.file_name)
+
+        # Assert
+        self.assertIsInstance(mapped_grid.values, memmap)
+        self.assertEqual(field_file_metadata(self.file_name), {'a': 1})
+        for axis, mapped_axis in zip(grid.axes, mapped_grid.axes):
+            assert_array_equal(axis, mapped_axis)
+        assert_array_equal(mapped_grid.values, grid.values)
+        assert_array_equal(mapped_grid.plane('x', 0.3), grid.values[3])
+        assert_array_equal(mapped_grid.value_at((0.52, 0.01, 0.)), grid.values[5, 2, 0])
+        with self.assertRaises(ValueError):
+            mapped_grid.values[0, 0, 0] = 1.
+
+    def test_setup_slabs(self):
+        """Test the field computed slab by slab into a field file against the field computed at once."""
+        setup = Setup()
+        setup.create_element(HelmholtzPair, position=(0.2, 0, 0), current=1.6)
+        setup.initialize_computational_space(x_start=0, x_end=0.4, x_step=0.05, y_start=-0.01, y_end=0.01,
+                                             z_start=-0.01, z_end=0.01, yz_step=0.01)
+
+        # Evaluate
+        setup.calculate_static_b_field_to_file(self.file_name, max_slab_size=2 * 9 * 3 * 8)
+        mapped_grid = open_field_file(self.file_name)
+        setup.calculate_static_b_field()
+
+        # Assert
+        assert_allclose(mapped_grid.values, setup.b_static.values, rtol=1e-12, atol=1e-12)
+        self.assertEqual(field_file_metadata(self.file_name), setup.meta_data)
+
+    def test_setup_envelope(self):
+        """Test the field computed into a field file on the grid points inside the beam envelope only."""
+        setup = Setup()
+        setup.create_element(HelmholtzPair, position=(0.2, 0, 0), current=1.6)
+        setup.initialize_computational_space(x_start=0, x_end=0.4, x_step=0.05, y_start=-0.05, y_end=0.05,
+                                             z_start=-0.05, z_end=0.05, yz_step=0.01, envelope=True,
+                                             envelope_margin=0.005)
+
+        # Evaluate
+        setup.calculate_static_b_field_to_file(self.file_name, max_slab_size=2 * 121 * 3 * 8)
+        mapped_grid = open_field_file(self.file_name)
+        setup.calculate_static_b_field()
+
+        # Assert
+        self.assertIsInstance(mapped_grid, SparseFieldGrid)
+        self.assertIsInstance(mapped_grid.values, memmap)
+        assert_array_equal(mapped_grid.support, setup.b_static.support)
+        assert_allclose(mapped_grid.values, setup.b_static.values, rtol=1e-12, atol=1e-12)
+        self.assertLess(os.path.getsize(self.file_name), len(setup.b_static.support.ravel()) * 3 * 8)
+
+    def test_setup_varying_field(self):
+        """Test the RF field added slab by slab to a static field in a field file."""
+        setup = Setup()
+        setup.create_element(HelmholtzPair, position=(0.2, 0, 0), current=1.6)
+        setup.create_element(RFSpinFlipper, position=(0.3, 0, 0), current=0.5, rf_current=2., windings=10,
+                             length=0.1, width=0.1, height=0.1, frequency=1e5, phase=0.3)
+        setup.initialize_computational_space(x_start=0, x_end=0.4, x_step=0.05, y_start=-0.01, y_end=0.01,
+                                             z_start=-0.01, z_end=0.01, yz_step=0.01)
+        t_j = 1.3e-6
+
+        # Evaluate
+        setup.calculate_static_b_field_to_file(self.file_name, max_slab_size=2 * 9 * 3 * 8)
+        setup.calculate_varying_magnetic_field(t_j)
+        b_mapped = setup.b
+        setup.calculate_static_b_field()
+        setup.calculate_varying_magnetic_field(t_j)
+
+        # Assert
+        self.assertIsInstance(b_mapped.values, memmap)
+        self.assertTrue(b_mapped.values.filename.endswith('.varying'))
+        assert_allclose(b_mapped.values, setup.b.values, rtol=1e-12, atol=1e-12)
@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of MIEZE simulation.
+# Copyright (C) 2019, 2020 TUM FRM2 E21 Research Group.
+#
+# This is free software; you can redistribute it and/or modify it
+# under the terms of the MIT License; see LICENSE file for more details.
+
+"""Numerical tests for the codebase."""
+
+from numpy import abs, column_stack, linspace, zeros
+from numpy.linalg import norm
+from unittest import TestCase
+
+from experiments.experimental_setup.setup import Setup
+from simulation.elements.coil_set import CoilSet
+from simulation.elements.helmholtz_pair import HelmholtzPair
+from simulation.fields.influence import influence_interval
+
+
+class TestInfluence(TestCase):
+
+    def test_interval(self):
+        """Test that the field is negligible outside of the influence interval, and not everywhere inside."""
+        element = HelmholtzPair(position=(0.2, 0, 0), current=1.6)
+        tolerance = 1e-3
+
+        # Evaluate
+        x_min, x_max = influence_interval(element, tolerance, lateral_extent=0.02)
+
+        # Assert
+        x = linspace(x_max, x_max + 10, 101)
+        for y in (0, 0.02):
+            outside = element.b_field_batch(column_stack((x, zeros(len(x)) + y, zeros(len(x)))))
+            self.assertLess(norm(outside, axis=1).max(), tolerance)
+        self.assertAlmostEqual(x_min - 0.2, 0.2 - x_max)
+        self.assertGreater(norm(element.b_field_batch([[x_max / 1.2, 0, 0]])), tolerance)
+
+    def test_setup_error(self):
+        """Test the error of the total field from skipping the elements outside of their influence intervals."""
+        grid_size = dict(x_start=0, x_end=3, x_step=0.01, y_start=-0.01, y_end=0.01, z_start=-0.01, z_end=0.01,
+                         yz_step=0.01)
+        tolerance = 1e-3
+
+        b_static = list()
+        for influence_tolerance in (None, tolerance):
+            setup = Setup(influence_tolerance=influence_tolerance)
+            setup.create_element(HelmholtzPair, position=(0.2, 0, 0), current=1.)
+            setup.create_element(CoilSet, name='CoilSet', position=2.8, current=1.)
+            setup.initialize_computational_space(**grid_size)
+
+            # Evaluate
+            setup.calculate_static_b_field()
+            b_static.append(setup.b_static)
+
+        selections = setup._influence_index().selections(setup.elements, b_static[1].points())
+
+        # Assert
+        self.assertLess(abs(b_static[1].values - b_static[0].values).max(), tolerance)
+        self.assertLess(sum(len(selection) for selection in selections), 2 * len(b_static[1]) * 0.9)
+
+    def test_error_at_large_currents(self):
+        """Test the bound of the total error for currents far from 1 A, also after increasing them."""
+        grid_size = dict(x_start=0, x_end=20, x_step=0.05, y_start=-0.01, y_end=0.01, z_start=-0.01, z_end=0.01,
+                         yz_step=0.01)
+        tolerance = 1e-3
+
+        setups = list()
+        for influence_tolerance in (None, tolerance):
+            setup = Setup(influence_tolerance=influence_tolerance)
+            setup.create_element(HelmholtzPair, position=(0.2, 0, 0), current=1.6)
+            setup.create_element(CoilSet, name='CoilSet', position=2.8, current=100.)
+            setup.initialize_computational_space(**grid_size)
+            setup.calculate_static_b_field()
+            setups.append(setup)
+
+        # Evaluate
+        errors = [abs(setups[1].b_static.values - setups[0].b_static.values).max()]
+        for setup in setups:
+            setup.change_currents({'CoilSet': 1e4})
+        errors.append(abs(setups[1].b_static.values - setups[0].b_static.values).max())
+
+        # Assert
+        for error in errors:
+            self.assertLessEqual(error, tolerance)
+        self.assertGreater(abs(setups[0].b_static.values).max(), 1e3 * tolerance)
@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of MIEZE simulation.
+# Copyright (C) 2019, 2020 TUM FRM2 E21 Research Group.
+#
+# This is free software; you can redistribute it and/or modify it
+# under the terms of the MIT License; see LICENSE file for more details.
+
+"""Numerical tests for the codebase."""
+
+from numpy import array, column_stack, linspace, sum, zeros_like
+from numpy.testing import assert_allclose
+from unittest import TestCase
+
+from experiments.experimental_setup.setup import Setup
+from simulation.beamline.beam import NeutronBeam
+from simulation.elements.helmholtz_pair import HelmholtzPair
+from simulation.fields.evaluation import evaluate_elements
+from simulation.fields.lazy import LazyFieldGrid
+
+
+class CountingField:
+    """Linear field recording the number of evaluated positions."""
+
+    def __init__(self):
+        self.evaluated = 0
+
+    def __call__(self, points):
+        self.evaluated += len(points)
+        return column_stack((points[:, 0], 2 * points[:, 1], zeros_like(points[:, 2]) + 3))
+
+
+class TestLazyFieldGrid(TestCase):
+
+    def test_nearest_grid_point(self):
+        """Test the values at the closest grid points, for single positions and arrays, also for negative indices."""
+        field = CountingField()
+        grid = LazyFieldGrid(field, (0.1, 0.05, 0.05), block_shape=(4, 2, 2))
+
+        positions = array([[0.31, 0.02, 0.], [-0.74, -0.13, 0.06], [12.04, 0.26, -0.1]])
+
+        # Evaluate
+        values = grid.value_at(positions)
+
+        # Assert
+        assert_allclose(values, [[0.3, 0., 3.], [-0.7, -0.3, 3.], [12., 0.5, 3.]], atol=1e-12)
+        assert_allclose(grid.value_at(positions[1]), values[1])
+        self.assertEqual(field.evaluated, 3 * 4 * 2 * 2)
+        self.assertEqual((grid.misses, grid.hits), (3, 1))
+
+    def test_bounded_cache(self):
+        """Test the eviction of the least recently used blocks, and lookups touching more blocks than it holds."""
+        field = CountingField()
+        grid = LazyFieldGrid(field, (1., 1., 1.), block_shape=(2, 1, 1), max_size=3 * 2 * 3 * 8)
+
+        positions = column_stack((linspace(0, 9, 10), zeros_like(linspace(0, 9, 10)), zeros_like(linspace(0, 9, 10))))
+
+        # Evaluate
+        values = grid.value_at(positions)
+        grid.value_at(positions[-1])
+        evaluated = field.evaluated
+        grid.value_at(positions[0])
+
+        # Assert
+        assert_allclose(values[:, 0], positions[:, 0])
+        self.assertEqual(grid.max_blocks, 3)
+        self.assertEqual(len(grid), 3 * 2)
+        self.assertEqual(evaluated, 10)
+        self.assertEqual(field.evaluated, 12)
+
+    def test_setup_field(self):
+        """Test a beam reading a setup field outside of any precomputed computational space."""
+        setup = Setup()
+        setup.create_element(HelmholtzPair, position=(0.2, 0, 0), current=1.6)
+
+        beam = NeutronBeam(beamsize=0.01, speed=1000, total_simulation_time=1e-3)
+        beam.load_magnetic_field(b_map=setup.lazy_field(0.01, 0.01))
+
+        position = (0.23, 0.02, -0.01)
+
+        # Evaluate
+        b_field = beam.get_magnetic_field(position)
+
+        # Assert
+        expected = sum(evaluate_elements(setup.elements, array([position])), axis=0)[0]
+        assert_allclose(b_field, expected, rtol=1e-12)
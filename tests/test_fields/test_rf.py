@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of MIEZE simulation.
+# Copyright (C) 2019, 2020 TUM FRM2 E21 Research Group.
+#
+# This is free software; you can redistribute it and/or modify it
+# under the terms of the MIT License; see LICENSE file for more details.
+
+"""Numerical tests for the codebase."""
+
+from numpy import array, linspace, pi, sin
+from numpy.testing import assert_allclose, assert_array_equal
+from unittest import TestCase
+
+from experiments.experimental_setup.setup import Setup
+from simulation.elements.helmholtz_pair import HelmholtzPair
+from simulation.elements.rf_flipper import RFSpinFlipper
+from simulation.elements.spin_flipper import SpinFlipper
+from simulation.fields.rf import waveform_values
+
+
+class TestRFField(TestCase):
+
+    def setUp(self) -> None:
+        self.frequency = 1e5  # [Hz]
+        self.phase = 0.3
+
+        self.setup = Setup()
+        self.setup.create_element(HelmholtzPair, position=(0.2, 0, 0), current=1.6)
+        self.setup.create_element(RFSpinFlipper, position=(0.5, 0, 0), current=0.5, rf_current=2., windings=10,
+                                  length=0.1, width=0.1, height=0.1, frequency=self.frequency, phase=self.phase)
+        self.setup.initialize_computational_space(x_start=0.1, x_end=0.8, x_step=0.05, y_start=-0.01, y_end=0.01,
+                                                  z_start=0, z_end=0.01, yz_step=0.005)
+        self.setup.calculate_static_b_field()
+
+        self.points = self.setup.b_static.points()
+
+        # Field of the same coil driven by the RF amplitude
+        self.amplitude = SpinFlipper(position=(0.5, 0, 0), current=2., windings=10, length=0.1, width=0.1,
+                                     height=0.1).b_field_batch(self.points)
+
+    def test_waveforms(self):
+        """Test the waveform values and the rejection of unknown waveforms."""
+        # Assert
+        assert_allclose(waveform_values('sine', 2., 0.5, array([0., 0.1])), sin(array([0.5, 0.4 * pi + 0.5])))
+        assert_array_equal(waveform_values('square', 1., 0., array([0.25, 0.75])), array([1., -1.]))
+        with self.assertRaises(ValueError):
+            waveform_values('sawtooth', 1., 0., 0.)
+
+    def test_varying_field(self):
+        """Test the static plus RF field on the grid against the field of the coil at the RF amplitude."""
+        t_j = 1.3e-6
+
+        # Evaluate
+        self.setup.calculate_varying_magnetic_field(t_j)
+
+        # Assert
+        expected_values = self.setup.b_static.flat + self.amplitude * sin(2 * pi * self.frequency * t_j + self.phase)
+        assert_allclose(self.setup.b.flat, expected_values, rtol=1e-12, atol=1e-12)
+
+    def test_time_samples(self):
+        """Test the evaluation at several times and only at the requested points."""
+        times = linspace(0, 1e-5, 7)
+        points = self.points[::5]
+
+        # Evaluate
+        b_field = self.setup.b_field_at(points, times)
+
+        # Assert
+        self.assertEqual(b_field.shape, (len(times), len(points), 3))
+        for t_j, values in zip(times, b_field):
+            self.setup.calculate_varying_magnetic_field(t_j)
+            assert_allclose(values, self.setup.b.flat[::5], rtol=1e-10, atol=1e-12)
+
+    def test_no_rf_elements(self):
+        """Test that the field of a setup without RF elements does not vary."""
+        setup = Setup()
+        setup.create_element(HelmholtzPair, position=(0.2, 0, 0), current=1.6)
+        setup.initialize_computational_space(x_start=0.1, x_end=0.3, x_step=0.05, y_start=0, y_end=0, z_start=0,
+                                             z_end=0, yz_step=0.01)
+        setup.calculate_static_b_field()
+
+        # Evaluate
+        setup.calculate_varying_magnetic_field(1e-3)
+
+        # Assert
+        assert_array_equal(setup.b.values, setup.b_static.values)
+
+    def test_phase_table(self):
+        """Test the field interpolated from the RF phase table against the direct evaluation."""
+        self.setup.create_element(RFSpinFlipper, name='RFSpinFlipper2', position=(0.3, 0, 0), rf_current=1.,
+                                  windings=10, length=0.1, width=0.1, height=0.1, frequency=1.5 * self.frequency)
+        self.setup.calculate_static_b_field()
+
+        times = array([0., 1.3e-6, 7.77e-6, 3.1e-5])
+        expected_values = self.setup.b_field_at(self.points, times)
+
+        # Evaluate
+        self.setup.prepare_rf_phase_table(tolerance=1e-8)
+
+        # Assert
+        self.assertAlmostEqual(self.setup.rf_phase_table.period, 2e-5)
+        scale = abs(expected_values).max()
+        for t_j, values in zip(times, expected_values):
+            self.setup.calculate_varying_magnetic_field(t_j)
+            assert_allclose(self.setup.b.flat, values, rtol=0, atol=1e-7 * scale)
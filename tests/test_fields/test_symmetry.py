@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of MIEZE simulation.
+# Copyright (C) 2019, 2020 TUM FRM2 E21 Research Group.
+#
+# This is free software; you can redistribute it and/or modify it
+# under the terms of the MIT License; see LICENSE file for more details.
+
+"""Numerical tests for the codebase."""
+
+from numpy import array, linspace
+from numpy.random import default_rng
+from numpy.testing import assert_allclose
+from unittest import TestCase
+
+from simulation.elements.coil_set import CoilSet
+from simulation.elements.coils import Coil, RectangularCoil
+from simulation.elements.helmholtz_pair import HelmholtzPair
+from simulation.elements.polariser import Polariser
+from simulation.elements.spin_flipper import SpinFlipper
+from simulation.fields.evaluation import evaluate_elements
+from simulation.fields.field_grid import FieldGrid
+from simulation.fields.symmetry import element_reflections, reduce_points, symmetry_group
+
+
+class TestMirrorSymmetry(TestCase):
+
+    def setUp(self) -> None:
+        self.elements = [Polariser(position=(0, 0, 0)),
+                         HelmholtzPair(position=(0.2, 0, 0), current=1.6),
+                         SpinFlipper(position=(0.5, 0, 0), current=1, windings=10, length=0.1, width=0.1, height=0.1,
+                                     r_eff=1),
+                         CoilSet(name='CoilSet', position=1.0, current=3.)]
+
+        points = default_rng(0).uniform(-0.03, 0.03, (50, 3))
+        points[:, 0] = linspace(0.1, 1.3, 50)
+        self.points = points
+
+    def test_declared_parities(self):
+        """Test the declared parities against the field at the mirrored points."""
+        for element in self.elements:
+            b_field = element.b_field_batch(self.points)
+
+            for axis, parity in element_reflections(element).items():
+                mirrored_points = self.points * array([1, -1, 1] if axis == 'y' else [1, 1, -1])
+
+                # Assert
+                assert_allclose(element.b_field_batch(mirrored_points), parity * b_field, rtol=1e-10, atol=1e-12)
+
+    def test_reduced_points(self):
+        """Test that a grid symmetric in y and z is reduced to one quadrant."""
+        grid = FieldGrid(linspace(0, 1, 5), linspace(-0.02, 0.02, 9), linspace(-0.02, 0.02, 9))
+
+        # Evaluate
+        reduced_points, inverse, reflected = reduce_points(grid.points(), ('y', 'z'))
+
+        # Assert
+        self.assertEqual(len(reduced_points), 5 * 5 * 5)
+        self.assertTrue((reduced_points[:, 1:] >= 0).all())
+        assert_allclose(abs(grid.points()), reduced_points[inverse], atol=1e-12)
+
+    def test_fundamental_domain_evaluation(self):
+        """Test the field computed in the fundamental domain against the field computed on all points."""
+        grid = FieldGrid(linspace(0.1, 1.3, 25), linspace(-0.02, 0.02, 5), linspace(-0.02, 0.01, 4))
+
+        # Evaluate
+        test_values = evaluate_elements(self.elements, grid.points())
+        reference_values = evaluate_elements(self.elements, grid.points(), symmetry=False)
+
+        # Assert
+        assert_allclose(test_values, reference_values, rtol=1e-10, atol=1e-12)
+
+    def test_symmetry_group(self):
+        """Test the symmetry group of sets of elements."""
+        coils = self.elements[1::2]
+
+        # Assert
+        self.assertEqual(sorted(symmetry_group(coils)), ['y', 'z'])
+        self.assertEqual(symmetry_group(self.elements), dict())
+        self.assertEqual(element_reflections(HelmholtzPair(position=(0.2, 0.01, 0), current=1.6)), dict())
+
+    def test_tilted_coils(self):
+        """Test that tilted coils are evaluated on all points, matching the evaluation without symmetries."""
+        coils = [Coil(name='TiltedCoil', position=(0.5, 0, 0), length=0.1, r_eff=0.05, current=1, windings=10,
+                      wire_d=0, angle_y=0.1),
+                 RectangularCoil(name='TiltedRectangularCoil', position=(0.5, 0, 0), length=0.1, windings=10,
+                                 wire_d=0.001, current=1, width=0.1, height=0.1, angle_z=0.1)]
+        grid = FieldGrid(linspace(0.3, 0.7, 9), linspace(-0.02, 0.02, 5), linspace(-0.02, 0.02, 5))
+
+        # Evaluate
+        test_values = evaluate_elements(coils, grid.points())
+        reference_values = evaluate_elements(coils, grid.points(), symmetry=False)
+
+        # Assert
+        assert_allclose(test_values, reference_values, rtol=1e-10, atol=1e-12)
+        for coil in coils:
+            self.assertEqual(element_reflections(coil), dict())
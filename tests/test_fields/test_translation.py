@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of MIEZE simulation.
+# Copyright (C) 2019, 2020 TUM FRM2 E21 Research Group.
+#
+# This is free software; you can redistribute it and/or modify it
+# under the terms of the MIT License; see LICENSE file for more details.
+
+"""Numerical tests for the codebase."""
+
+from numpy import arange, array, sum as np_sum
+from numpy.testing import assert_allclose, assert_array_equal
+from unittest import TestCase
+
+from simulation.fields.field_grid import FieldGrid
+from simulation.fields.translation import TranslatedField, lagrange_weights
+
+
+class TestTranslatedField(TestCase):
+
+    def setUp(self) -> None:
+        self.grid = FieldGrid(arange(0, 1.0001, 0.01), array([-0.01, 0.01]), array([0.]))
+
+        def b_field_batch(points, position=0.5):
+            x, y, z = (points - array([position, 0, 0])).T
+            return array([1 / (1 + 100 * x ** 2), y * x, z + 1]).T
+
+        self.b_field_batch = b_field_batch
+        self.translation = TranslatedField(self.grid, b_field_batch, offset_min=-0.1, offset_max=0.2)
+
+    def test_lagrange_weights(self):
+        """Test that the weights reproduce polynomials up to their degree."""
+        weights = lagrange_weights(2.3, 6)
+
+        # Assert
+        assert_allclose(np_sum(weights * arange(6) ** 5), 2.3 ** 5)
+
+    def test_index_shift(self):
+        """Test that offsets that are multiples of the step are exact."""
+        values, error = self.translation.field(0.07)
+
+        # Evaluate
+        expected_values = self.b_field_batch(self.grid.points(), position=0.57).reshape(values.shape)
+
+        # Assert
+        self.assertEqual(error, 0.)
+        assert_allclose(values, expected_values, rtol=1e-12, atol=1e-14)
+
+    def test_interpolation(self):
+        """Test the interpolation of other offsets and its error estimate."""
+        values, error = self.translation.field(-0.0537)
+
+        # Evaluate
+        expected_values = self.b_field_batch(self.grid.points(), position=0.5 - 0.0537).reshape(values.shape)
+
+        # Assert
+        self.assertLess(error, 1e-3)
+        self.assertLessEqual(abs(values - expected_values).max(), error)
+
+    def test_offset_outside_of_range(self):
+        """Test that offsets outside of the prepared range are rejected."""
+        with self.assertRaises(ValueError):
+            self.translation.field(0.25)
+
+    def test_unchanged_position(self):
+        """Test that the zero offset returns the field at the present position."""
+        values, _ = self.translation.field(0.)
+
+        # Assert
+        assert_array_equal(values, self.b_field_batch(self.grid.points()).reshape(values.shape))
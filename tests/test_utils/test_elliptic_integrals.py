@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of MIEZE simulation.
+# Copyright (C) 2019, 2020 TUM FRM2 E21 Research Group.
+#
+# This is free software; you can redistribute it and/or modify it
+# under the terms of the MIT License; see LICENSE file for more details.
+
+"""Numerical tests for the elliptic integrals."""
+
+import mpmath
+import numpy as np
+from unittest import TestCase
+
+from utils.elliptic_integrals import ellipe, ellipk, ellippi
+
+
+class Test(TestCase):
+
+    def setUp(self) -> None:
+        # Complementary parameters down to the vicinity of the windings, where m -> 1
+        self.mc = np.concatenate((np.linspace(1, 1e-3, 50), np.logspace(-3, -14, 30)))
+        self.m = 1 - self.mc
+        self.n = np.linspace(0, 0.999, len(self.mc))
+
+        self.numerical_error_acceptance = 1e-13
+
+    def _reference(self, function, *args):
+        """Compute reference values with mpmath, using the exact complementary parameter."""
+        with mpmath.workdps(30):
+            return np.array([float(function(*arg)) for arg in zip(*args)])
+
+    def test_first_kind(self):
+        """Test K(m) against mpmath."""
+        reference_values = self._reference(lambda mc: mpmath.ellipk(1 - mpmath.mpf(mc)), self.mc)
+
+        test_values = ellipk(self.m, self.mc)
+
+        np.testing.assert_allclose(test_values, reference_values, rtol=self.numerical_error_acceptance)
+
+    def test_second_kind(self):
+        """Test E(m) against mpmath."""
+        reference_values = self._reference(lambda mc: mpmath.ellipe(1 - mpmath.mpf(mc)), self.mc)
+
+        test_values = ellipe(self.m, self.mc)
+
+        np.testing.assert_allclose(test_values, reference_values, rtol=self.numerical_error_acceptance)
+
+    def test_third_kind(self):
+        """Test Pi(n, m) against mpmath."""
+        reference_values = self._reference(lambda n, mc: mpmath.ellippi(n, mpmath.pi / 2, 1 - mpmath.mpf(mc)),
+                                           self.n, self.mc)
+
+        test_values = ellippi(self.n, self.m, self.mc)
+
+        np.testing.assert_allclose(test_values, reference_values, rtol=self.numerical_error_acceptance)
+
+    def test_third_kind_complementary(self):
+        """Test Pi(n, m) against mpmath for n -> 1, given the complementary characteristic."""
+        nc = np.logspace(-3, -18, len(self.mc))
+        reference_values = self._reference(lambda nc, mc: mpmath.ellippi(1 - mpmath.mpf(nc), mpmath.pi / 2,
+                                                                         1 - mpmath.mpf(mc)), nc, self.mc)
+
+        test_values = ellippi(1 - nc, self.m, self.mc, nc)
+
+        np.testing.assert_allclose(test_values, reference_values, rtol=self.numerical_error_acceptance)
+
+    def test_limits(self):
+        """Test the values at the singular limits."""
+        self.assertEqual(ellipk(1.), np.inf)
+        self.assertEqual(ellipe(1.), 1.)
+        self.assertEqual(ellippi(1., 0.5), np.inf)
+        self.assertAlmostEqual(float(ellipk(0.)), np.pi / 2)
@@ -0,0 +1,217 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of MIEZE simulation.
+# Copyright (C) 2019, 2020 TUM FRM2 E21 Research Group.
+#
+# This is free software; you can redistribute it and/or modify it
+# under the terms of the MIT License; see LICENSE file for more details.
+
+"""Complete elliptic integrals operating on numpy arrays.
+
+The integrals are computed with the general complete elliptic integral of Bulirsch:
+
+    cel(kc, p, a, b) = int_0^{pi/2} (a cos^2 + b sin^2) / ((cos^2 + p sin^2) sqrt(cos^2 + kc^2 sin^2)) dphi
+
+which converges quadratically and stays accurate for m -> 1, as long as the complementary parameter mc = 1 - m is
+passed directly instead of being computed from m. Likewise, Pi(n, m) stays accurate for n -> 1 given the
+complementary characteristic nc = 1 - n.
+
+The parameter convention is the same as for mpmath, i.e. K(m) = ellipk(m), E(m) = ellipe(m) and
+Pi(n, m) = ellippi(n, pi/2, m). The mpmath implementations are kept as a reference backend.
+"""
+
+import mpmath
+import numpy as np
+
+# Relative tolerance of the arithmetic-geometric mean iteration. The convergence is quadratic, so the final result is
+# accurate to machine precision.
+_tolerance = 1e-10
+_max_iterations = 64
+
+
+def cel(kc, p, a, b):
+    """Compute the general complete elliptic integral of Bulirsch.
+
+    Parameters
+    ----------
+    kc: ndarray, float
+        Complementary modulus, kc = sqrt(1 - m).
+    p: ndarray, float
+        Characteristic parameter, p = 1 - n for the third kind.
+    a: ndarray, float
+        Coefficient of the cos^2 term.
+    b: ndarray, float
+        Coefficient of the sin^2 term.
+
+    Returns
+    -------
+    out: ndarray
+        Value of the integral. The limits kc = 0 and p = 0 are handled by the callers.
+
+    >>> float(np.round(cel(1., 1., 1., 1.), 12))
+    1.570796326795
+    """
+    kc, p, a, b = np.broadcast_arrays(*(np.asarray(item, dtype=float) for item in (kc, p, a, b)))
+    shape = kc.shape
+
+    with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+        k = np.abs(kc).ravel()
+        p = p.ravel()
+        cc = a.ravel().copy()
+        ss = b.ravel().copy()
+
+        positive = p > 0
+        pp = np.empty_like(p)
+
+        # p > 0
+        pp[positive] = np.sqrt(p[positive])
+        ss[positive] = ss[positive] / pp[positive]
+
+        # p <= 0
+        negative = ~positive
+        if negative.any():
+            f = k[negative] ** 2
+            q = 1. - f
+            g = 1. - p[negative]
+            f = f - p[negative]
+            q = q * (ss[negative] - cc[negative] * p[negative])
+            pp[negative] = np.sqrt(f / g)
+            cc[negative] = (cc[negative] - ss[negative]) / g
+            ss[negative] = -q / (g * g * pp[negative]) + cc[negative] * pp[negative]
+
+        em = np.ones_like(k)
+
+        f = cc
+        cc = cc + ss / pp
+        g = k / pp
+        ss = 2 * (ss + f * g)
+        pp = g + pp
+        g = em
+        em = k + em
+        kk = k.copy()
+
+        active = np.abs(g - k) > g * _tolerance
+        iteration = 0
+        while active.any() and iteration < _max_iterations:
+            k_a = 2 * np.sqrt(kk[active])
+            kk_a = k_a * em[active]
+            f_a = cc[active]
+            cc[active] = f_a + ss[active] / pp[active]
+            g_a = kk_a / pp[active]
+            ss[active] = 2 * (ss[active] + f_a * g_a)
+            pp[active] = g_a + pp[active]
+            g[active] = em[active]
+            em[active] = k_a + em[active]
+
+            k[active] = k_a
+            kk[active] = kk_a
+
+            active[active] = np.abs(g[active] - k_a) > g[active] * _tolerance
+            iteration += 1
+
+        result = (np.pi / 2) * (ss + cc * em) / (em * (em + pp))
+
+    return result.reshape(shape)
+
+
+def _complementary_modulus(m, mc):
+    """Return the complementary modulus, preferring the complementary parameter if given."""
+    if mc is None:
+        mc = 1. - np.asarray(m, dtype=float)
+    return np.sqrt(np.clip(mc, 0., None))
+
+
+def ellipk(m, mc=None):
+    """Compute the complete elliptic integral of the first kind K(m).
+
+    Parameters
+    ----------
+    m: ndarray, float
+        Parameter of the integral.
+    mc: ndarray, float, optional
+        Complementary parameter 1 - m. Pass it if it can be computed without cancellation.
+
+    >>> float(np.round(ellipk(0.5), 12))
+    1.854074677301
+    """
+    kc = _complementary_modulus(m, mc)
+    return np.where(kc == 0, np.inf, cel(kc, 1., 1., 1.))
+
+
+def ellipe(m, mc=None):
+    """Compute the complete elliptic integral of the second kind E(m).
+
+    Parameters
+    ----------
+    m: ndarray, float
+        Parameter of the integral.
+    mc: ndarray, float, optional
+        Complementary parameter 1 - m. Pass it if it can be computed without cancellation.
+
+    >>> float(np.round(ellipe(0.5), 12))
+    1.350643881048
+    """
+    kc = _complementary_modulus(m, mc)
+    return np.where(kc == 0, 1., cel(kc, 1., 1., kc ** 2))
+
+
+def ellippi(n, m, mc=None, nc=None):
+    """Compute the complete elliptic integral of the third kind Pi(n, m).
+
+    Parameters
+    ----------
+    n: ndarray, float
+        Characteristic of the integral.
+    m: ndarray, float
+        Parameter of the integral.
+    mc: ndarray, float, optional
+        Complementary parameter 1 - m. Pass it if it can be computed without cancellation.
+    nc: ndarray, float, optional
+        Complementary characteristic 1 - n. Pass it if it can be computed without cancellation.
+
+    >>> float(np.round(ellippi(0.25, 0.5), 12))
+    2.167619360766
+    """
+    kc = _complementary_modulus(m, mc)
+    nc = 1. - np.asarray(n, dtype=float) if nc is None else np.asarray(nc, dtype=float)
+    return np.where((kc == 0) | (nc == 0), np.inf, cel(kc, nc, 1., 1.))
+
+
+def ellipk_mpmath(m, mc=None):
+    """Compute K(m) with mpmath, used as reference."""
+    return _ellipk_mpmath(m)
+
+
+def ellipe_mpmath(m, mc=None):
+    """Compute E(m) with mpmath, used as reference."""
+    return _ellipe_mpmath(m)
+
+
+def ellippi_mpmath(n, m, mc=None, nc=None):
+    """Compute Pi(n, m) with mpmath, used as reference."""
+    return _ellippi_mpmath(n, m)
+
+
+_ellipk_mpmath = np.vectorize(lambda m: float(mpmath.ellipk(m)), otypes=[float])
+_ellipe_mpmath = np.vectorize(lambda m: float(mpmath.ellipe(m)), otypes=[float])
+_ellippi_mpmath = np.vectorize(lambda n, m: float(mpmath.ellippi(n, np.pi / 2, m)), otypes=[float])
+
+
+BACKENDS = {
+    'native': (ellipk, ellipe, ellippi),
+    'mpmath': (ellipk_mpmath, ellipe_mpmath, ellippi_mpmath),
+}
+
+
+def get_backend(name):
+    """Return the (K, E, Pi) functions of the backend with the given name.
+
+    Parameters
+    ----------
+    name: str
+        Either 'native' or 'mpmath'.
+    """
+    try:
+        return BACKENDS[name]
+    except KeyError:
+        raise ValueError(f'Unknown elliptic integral backend: {name}. Use one of {list(BACKENDS)}.')
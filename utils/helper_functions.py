@@ -217,14 +217,41 @@ def read_data_from_file(file_name):
         return x, y, z, bx, by, bz
 
 
+def sanitize_array(values, threshold=10e4):
+    """Sanitize an array of values from infinity values.
+
+    This is the array counterpart of the sanitize_output wrapper. Values which are not finite, resulting from
+    numerical singularities, are set to 0 as well.
+
+    Parameters
+    ----------
+    values: ndarray
+        Array of values to be sanitized.
+    threshold: float, optional
+        Absolute values larger than the threshold are set to 0.
+        Defaults to 10e4.
+
+    >>> sanitize_array(np.array([1., -2e5, 3., np.nan, np.inf]))
+    array([1., 0., 3., 0., 0.])
+
+    """
+    values = np.asarray(values, dtype=float)
+    with np.errstate(invalid='ignore'):
+        return np.where(~np.isfinite(values) | (np.abs(values) > threshold), 0., values)
+
+
 def sanitize_output(func):
-    """Define a wrapper to sanitize outputs from infinity values."""
+    """Define a wrapper to sanitize outputs from infinity values.
+
+    The function is evaluated with the floating point warnings silenced, the singular values being masked
+    afterwards with sanitize_array.
+    """
     def wrapper_sanitize_output(*args, **kwargs):
         """General wrapper for a function."""
-        value = func(*args, **kwargs)
-        if abs(value) > 10e4:
-            value = 0
-        return value
+        with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+            value = func(*args, **kwargs)
+        value = sanitize_array(value)
+        return value[()] if value.ndim == 0 else value
     return wrapper_sanitize_output
 
 
@@ -299,7 +326,18 @@ def rotate(vector, phi, axis):
 
 
 def save_data_to_file(data, file_name, extension='.csv'):
-    """Save data to file."""
+    """Save data to file.
+
+    Parameters
+    ----------
+    data: dict, FieldGrid
+        Either a dictionary mapping positions to field values, or a grid with a columns method.
+    file_name: str
+        Name of the file to be written to.
+    extension: str, optional
+        Extension appended to the file name if missing.
+        Defaults to '.csv'.
+    """
     if extension in file_name:
         full_filename = file_name
     else:
@@ -317,14 +355,17 @@ def save_data_to_file(data, file_name, extension='.csv'):
     csv_writer = csv.writer(file, delimiter=',')
     csv_writer.writerow(["x", "y", "z", "Bx", "By", "Bz"])
 
-    for point, field in data.items():
-        # logger.debug(type(point))
-        if type(point) != np.float64:
-            point = list(point)
-            row = point + list((field[0], field[1], field[2]))
-        else:
-            row = list([point, field])
-        csv_writer.writerow(row)
+    if hasattr(data, 'columns'):
+        csv_writer.writerows(np.column_stack(data.columns()).tolist())
+    else:
+        for point, field in data.items():
+            # logger.debug(type(point))
+            if type(point) != np.float64:
+                point = list(point)
+                row = point + list((field[0], field[1], field[2]))
+            else:
+                row = list([point, field])
+            csv_writer.writerow(row)
 
     file.close()
 